@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""控制台日志分类性能测试
+对比get_console_logs原来的逐条分类方式与log_classifier的分类（预编译正则、共享标记检查、按消息缓存）
+
+用法: python bench_log_classifier.py [条目数量，默认100000]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from log_classifier import classify_message, clear_cache
+
+
+def legacy_classify(message):
+    """原get_console_logs中的分类逻辑，作为结果和性能的对照"""
+    has_stack_trace = 'at ' in message or 'Error:' in message or 'TypeError:' in message
+    if 'TypeError:' in message:
+        error_type = 'TypeError'
+    elif 'ReferenceError:' in message:
+        error_type = 'ReferenceError'
+    elif 'SyntaxError:' in message:
+        error_type = 'SyntaxError'
+    elif 'NetworkError:' in message or '404' in message:
+        error_type = 'NetworkError'
+    elif 'console.assert' in message:
+        error_type = 'AssertionError'
+    else:
+        error_type = 'UnknownError'
+    file_info = None
+    line_number = None
+    if ' at ' in message:
+        import re
+        file_match = re.search(r'at\s+.*?\((.*?):(\d+):(\d+)\)', message)
+        if file_match:
+            file_info = file_match.group(1)
+            line_number = int(file_match.group(2))
+    console_method = legacy_detect_console_method(message)
+    return has_stack_trace, error_type, file_info, line_number, console_method
+
+
+def legacy_detect_console_method(message):
+    """原_detect_console_method"""
+    if 'console.error' in message or 'Error:' in message:
+        return 'console.error'
+    elif 'console.warn' in message or 'Warning:' in message:
+        return 'console.warn'
+    elif 'console.info' in message:
+        return 'console.info'
+    elif 'console.debug' in message:
+        return 'console.debug'
+    elif 'console.table' in message:
+        return 'console.table'
+    elif 'console.trace' in message:
+        return 'console.trace'
+    elif 'console.assert' in message:
+        return 'console.assert'
+    elif 'console.log' in message:
+        return 'console.log'
+    else:
+        return 'unknown'
+
+
+TEMPLATES = (
+    'http://localhost:3000/app.js {line}:{col} "render done in {n}ms"',
+    'http://localhost:3000/app.js {line}:{col} "Warning: Each child in a list should have a unique key prop"',
+    'http://localhost:3000/app.js {line}:{col} Uncaught TypeError: Cannot read properties of undefined (reading \'id{n}\')\n'
+    '    at render (http://localhost:3000/app.js:{line}:{col})\n    at commit (http://localhost:3000/vendor.js:1:{n})',
+    'http://localhost:3000/api/items/{n} - Failed to load resource: the server responded with a status of 404 (Not Found)',
+    'http://localhost:3000/app.js {line}:{col} Uncaught ReferenceError: foo{n} is not defined',
+    'http://localhost:3000/app.js {line}:{col} "console.table" Object',
+    'http://localhost:3000/app.js {line}:{col} "Assertion failed: console.assert"',
+)
+
+
+def synthetic_messages(count, distinct=2000, seed=7):
+    """生成带重复的合成日志（真实页面中大量消息会重复出现）"""
+    rng = random.Random(seed)
+    pool = [
+        rng.choice(TEMPLATES).format(line=rng.randint(1, 5000), col=rng.randint(1, 80), n=rng.randint(1, 10 ** 6))
+        for _ in range(distinct)
+    ]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def bench(name, func, messages):
+    started_at = time.perf_counter()
+    for message in messages:
+        func(message)
+    elapsed = time.perf_counter() - started_at
+    print(f"{name:<28} {elapsed * 1000:9.1f} ms  {len(messages) / elapsed:12,.0f} 条/秒")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    messages = synthetic_messages(count)
+    unique = synthetic_messages(count, distinct=count)
+    print(f"合成日志: {count}条（重复消息 / 全部不同）")
+
+    for message in set(messages):
+        assert classify_message(message) == legacy_classify(message), message
+
+    print("-- 重复消息 --")
+    legacy = bench("原逐条分类", legacy_classify, messages)
+    clear_cache()
+    single = bench("预编译分类+缓存", classify_message, messages)
+    print("-- 全部不同（缓存不命中） --")
+    bench("原逐条分类", legacy_classify, unique)
+    clear_cache()
+    bench("预编译分类+缓存", classify_message, unique)
+    print(f"重复消息场景加速: {legacy / single:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
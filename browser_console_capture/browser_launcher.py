@@ -0,0 +1,181 @@
+"""浏览器启动后端发现与缓存
+启动链（指定路径Chrome -> 系统Chrome -> Firefox）只在首次启动时探测一次，
+成功的后端被缓存，之后的启动直接使用，避免每次都重新走一遍失败的回退链
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LaunchBackend:
+    """
+    一种浏览器启动方式
+
+    Args:
+        name: 后端名称
+        browser: 实际启动的浏览器类型（chrome或firefox）
+        binary_path: 浏览器可执行文件路径，None表示由Selenium自动查找
+        driver_path: 驱动可执行文件路径，None表示由Selenium自动查找
+        search_names: 未指定路径时在PATH中查找的可执行文件名
+    """
+
+    def __init__(self, name: str, browser: str,
+                 binary_path: Optional[str] = None,
+                 driver_path: Optional[str] = None,
+                 search_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.browser = browser
+        self.binary_path = binary_path
+        self.driver_path = driver_path
+        self.search_names = search_names
+
+    def probe(self) -> Tuple[bool, str]:
+        """
+        静态检查（不启动浏览器）
+
+        Returns:
+            tuple: (是否可能可用, 说明)
+        """
+        for path in (self.binary_path, self.driver_path):
+            if path and not os.access(path, os.X_OK):
+                return False, f"文件不存在或不可执行: {path}"
+        if self.binary_path or not self.search_names:
+            return True, "路径检查通过"
+        found = [shutil.which(name) for name in self.search_names]
+        found = [path for path in found if path]
+        if found:
+            return True, f"在PATH中找到: {found[0]}"
+        # Selenium Manager仍可能自动下载浏览器和驱动，因此不直接判定为不可用
+        return True, "PATH中未找到，交由Selenium Manager处理"
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "browser": self.browser,
+            "binary_path": self.binary_path,
+            "driver_path": self.driver_path,
+        }
+
+
+class LauncherDiscovery:
+    """
+    按请求的浏览器类型缓存可用的启动后端
+
+    Args:
+        chains: 请求的浏览器类型 -> 按优先级排列的候选后端
+    """
+
+    def __init__(self, chains: Dict[str, List[LaunchBackend]]):
+        self._chains = chains
+        self._resolved: Dict[str, Dict[str, Any]] = {}
+        self._probes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def probe_all(self) -> Dict[str, Dict[str, Any]]:
+        """对所有候选后端做静态检查，用于服务启动时提前发现配置问题"""
+        probes = {}
+        for chain in self._chains.values():
+            for backend in chain:
+                if backend.name in probes:
+                    continue
+                ok, detail = backend.probe()
+                probes[backend.name] = {"available": ok, "detail": detail}
+                logger.info(f"启动后端检查 {backend.name}: {'可用' if ok else '不可用'} ({detail})")
+        with self._lock:
+            self._probes = probes
+        return probes
+
+    def launch(self, browser: str, launch_fn: Callable[[LaunchBackend], Any]):
+        """
+        启动浏览器：优先使用已缓存的后端，失败时重新走回退链
+
+        Args:
+            browser: 请求的浏览器类型
+            launch_fn: 用指定后端启动驱动的函数
+
+        Returns:
+            tuple: (driver, backend)
+        """
+        chain = self._chains.get(browser)
+        if not chain:
+            raise ValueError(f"没有可用的启动链: {browser}")
+
+        with self._lock:
+            cached = self._resolved.get(browser)
+        errors = []
+        failed = None
+        if cached is not None:
+            backend = cached["backend"]
+            try:
+                return launch_fn(backend), backend
+            except Exception as e:
+                logger.warning(f"缓存的启动后端{backend.name}启动失败，重新探测: {e}")
+                self.invalidate(browser)
+                # 刚刚失败的后端不在本次回退链中再启动一次
+                failed = backend
+                errors.append(f"{backend.name}: {e}")
+
+        started_at = time.time()
+        for backend in chain:
+            if backend is failed:
+                continue
+            ok, detail = backend.probe()
+            if not ok:
+                errors.append(f"{backend.name}: {detail}")
+                logger.debug(f"跳过启动后端{backend.name}: {detail}")
+                continue
+            try:
+                driver = launch_fn(backend)
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+                logger.debug(f"启动后端{backend.name}启动失败: {e}")
+                continue
+            capabilities = getattr(driver, "capabilities", {}) or {}
+            with self._lock:
+                self._resolved[browser] = {
+                    "backend": backend,
+                    "browser_version": capabilities.get("browserVersion"),
+                    "validated_at": time.time(),
+                    "discovery_ms": int((time.time() - started_at) * 1000),
+                    "skipped": errors,
+                }
+            if backend.browser != browser:
+                logger.warning(f"请求的{browser}不可用，已回退到{backend.name}")
+            logger.info(f"启动后端已缓存: {browser} -> {backend.name}")
+            return driver, backend
+
+        raise RuntimeError(f"所有启动后端均失败: {'; '.join(errors)}")
+
+    def invalidate(self, browser: Optional[str] = None) -> None:
+        """清除缓存，下次启动重新探测"""
+        with self._lock:
+            if browser is None:
+                self._resolved.clear()
+            else:
+                self._resolved.pop(browser, None)
+
+    def report(self) -> Dict[str, Any]:
+        """返回探测与缓存结果"""
+        with self._lock:
+            resolved = {
+                browser: {
+                    **entry["backend"].describe(),
+                    "browser_version": entry["browser_version"],
+                    "validated_at": entry["validated_at"],
+                    "discovery_ms": entry["discovery_ms"],
+                    "skipped": entry["skipped"],
+                }
+                for browser, entry in self._resolved.items()
+            }
+            probes = dict(self._probes)
+        return {
+            "resolved": resolved,
+            "probes": probes,
+            "chains": {browser: [backend.name for backend in chain] for browser, chain in self._chains.items()},
+        }
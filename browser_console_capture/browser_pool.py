@@ -0,0 +1,308 @@
+"""浏览器预热池
+按启动配置(browser, headless, window_size)缓存预先启动且经过健康检查的WebDriver实例，
+start_browser从池中租用驱动，close_browser把驱动归还到池中，避免每个会话都冷启动浏览器进程
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 启动配置: (browser, headless, window_size)
+Profile = Tuple[Any, ...]
+
+
+def _quit_driver(driver) -> None:
+    """彻底关闭驱动进程"""
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.warning(f"关闭浏览器驱动时出错: {e}")
+
+
+def _is_healthy(driver) -> bool:
+    """健康检查：浏览器进程仍在且能执行脚本"""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception as e:
+        logger.debug(f"浏览器健康检查失败: {e}")
+        return False
+
+
+class BrowserPool:
+    """
+    浏览器预热池
+
+    池内浏览器总数（租出 + 空闲 + 启动中）不超过max_browsers。
+    后台维护线程每cleanup_interval秒运行一次：关闭失效或长时间闲置的驱动，
+    并为最近使用过的启动配置补足warm_size个预热驱动。
+
+    Args:
+        launcher: 按启动配置启动新驱动的函数
+        resetter: 驱动归还时清理页面状态的函数，返回False表示不可复用
+        disposer: 彻底关闭驱动的函数
+        max_browsers: 浏览器进程数量上限
+        cleanup_interval: 维护周期（秒），也是启动配置保持预热的时间窗口
+        warm_size: 每个活跃启动配置保持的空闲驱动数量
+    """
+
+    def __init__(self,
+                 launcher: Callable[[Profile], Any],
+                 resetter: Optional[Callable[[Any], bool]] = None,
+                 disposer: Optional[Callable[[Any], None]] = None,
+                 max_browsers: int = 3,
+                 cleanup_interval: float = 300,
+                 warm_size: int = 1):
+        self._launcher = launcher
+        self._resetter = resetter
+        self._disposer = disposer or _quit_driver
+        self.max_browsers = max(1, int(max_browsers))
+        self.cleanup_interval = max(1.0, float(cleanup_interval))
+        self.warm_size = max(0, int(warm_size))
+
+        self._idle: Dict[Profile, List[Tuple[Any, float]]] = {}
+        self._leased: Dict[int, Tuple[Any, Profile]] = {}
+        self._last_used: Dict[Profile, float] = {}
+        self._launching = 0
+        self.last_launch_ms: Optional[int] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._maintainer: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 租用 / 归还
+    # ------------------------------------------------------------------
+    def acquire(self, profile: Profile):
+        """
+        按启动配置租用一个驱动，优先复用空闲的预热驱动
+
+        Returns:
+            tuple: (driver, reused)
+        """
+        self._ensure_maintainer()
+        while True:
+            victim = None
+            with self._lock:
+                if self._stopped.is_set():
+                    raise RuntimeError("浏览器池已关闭")
+                self._last_used[profile] = time.time()
+                idle = self._idle.get(profile)
+                entry = idle.pop() if idle else None
+                if entry is None:
+                    if self._total_locked() >= self.max_browsers:
+                        victim = self._pop_idle_locked(exclude=profile)
+                        if victim is None:
+                            raise RuntimeError(
+                                f"已达到最大并发浏览器数量({self.max_browsers})，请先关闭其他会话"
+                            )
+                    self._launching += 1
+
+            if entry is not None:
+                driver = entry[0]
+                if _is_healthy(driver):
+                    with self._lock:
+                        self._leased[id(driver)] = (driver, profile)
+                    self._wake.set()
+                    logger.info(f"复用预热浏览器: {profile}")
+                    return driver, True
+                logger.info(f"预热浏览器已失效，丢弃后重试: {profile}")
+                self._disposer(driver)
+                continue
+
+            if victim is not None:
+                logger.info("浏览器数量已达上限，关闭其他配置的空闲浏览器")
+                self._disposer(victim)
+            started_at = time.time()
+            try:
+                driver = self._launcher(profile)
+            finally:
+                with self._lock:
+                    self._launching -= 1
+            with self._lock:
+                self._leased[id(driver)] = (driver, profile)
+                self.last_launch_ms = int((time.time() - started_at) * 1000)
+            self._wake.set()
+            logger.info(f"冷启动浏览器: {profile}")
+            return driver, False
+
+    def release(self, driver, reusable: bool = True) -> bool:
+        """
+        归还驱动，能复用则放回空闲队列，否则直接关闭
+
+        Returns:
+            bool: 驱动是否被放回池中
+        """
+        with self._lock:
+            entry = self._leased.pop(id(driver), None)
+        if entry is None or not reusable or self._stopped.is_set():
+            self._disposer(driver)
+            return False
+
+        profile = entry[1]
+        if self._resetter is not None:
+            try:
+                reusable = self._resetter(driver) is not False
+            except Exception as e:
+                logger.debug(f"重置浏览器状态失败: {e}")
+                reusable = False
+        if not reusable or not _is_healthy(driver):
+            self._disposer(driver)
+            return False
+
+        with self._lock:
+            closed = self._stopped.is_set()
+            if not closed:
+                self._idle.setdefault(profile, []).append((driver, time.time()))
+        if closed:
+            # 重置期间池已关闭
+            self._disposer(driver)
+            return False
+        logger.debug(f"浏览器已归还到池中: {profile}")
+        return True
+
+    # ------------------------------------------------------------------
+    # 维护
+    # ------------------------------------------------------------------
+    def _total_locked(self) -> int:
+        idle = sum(len(entries) for entries in self._idle.values())
+        return idle + len(self._leased) + self._launching
+
+    def _pop_idle_locked(self, exclude: Optional[Profile] = None):
+        """取出最久未用的其他配置空闲驱动，用于腾出名额"""
+        oldest = None
+        for profile, entries in self._idle.items():
+            if profile == exclude or not entries:
+                continue
+            if oldest is None or entries[0][1] < oldest[1]:
+                oldest = (profile, entries[0][1])
+        if oldest is None:
+            return None
+        return self._idle[oldest[0]].pop(0)[0]
+
+    def _ensure_maintainer(self) -> None:
+        if self._maintainer is not None:
+            return
+        with self._lock:
+            if self._maintainer is None and not self._stopped.is_set():
+                self._maintainer = threading.Thread(
+                    target=self._maintain_loop, name="browser-pool-maintainer", daemon=True
+                )
+                self._maintainer.start()
+
+    def _maintain_loop(self) -> None:
+        last_cleanup = time.time()
+        while not self._stopped.is_set():
+            self._wake.wait(timeout=self.cleanup_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                if time.time() - last_cleanup >= self.cleanup_interval:
+                    self._cleanup()
+                    last_cleanup = time.time()
+                self._refill()
+            except Exception as e:
+                logger.warning(f"浏览器池维护失败: {e}", exc_info=True)
+
+    def _cleanup(self) -> None:
+        """关闭失效驱动，以及不再活跃的配置或超出预热数量的闲置驱动"""
+        now = time.time()
+        expired = []
+        with self._lock:
+            for profile, entries in self._idle.items():
+                active = now - self._last_used.get(profile, 0) < self.cleanup_interval
+                keep = self.warm_size if active else 0
+                while len(entries) > keep and now - entries[0][1] >= self.cleanup_interval:
+                    expired.append(entries.pop(0)[0])
+            for profile, used_at in list(self._last_used.items()):
+                if now - used_at >= self.cleanup_interval and not self._idle.get(profile):
+                    self._idle.pop(profile, None)
+                    self._last_used.pop(profile, None)
+            snapshot = [driver for entries in self._idle.values() for driver, _ in entries]
+
+        for driver in expired:
+            self._disposer(driver)
+
+        dead_ids = {id(driver) for driver in snapshot if not _is_healthy(driver)}
+        dead = []
+        if dead_ids:
+            with self._lock:
+                for entries in self._idle.values():
+                    dead.extend(driver for driver, _ in entries if id(driver) in dead_ids)
+                    entries[:] = [item for item in entries if id(item[0]) not in dead_ids]
+            for driver in dead:
+                self._disposer(driver)
+        if expired or dead:
+            logger.debug(f"浏览器池清理完成，关闭闲置驱动{len(expired)}个，失效驱动{len(dead)}个")
+
+    def _refill(self) -> None:
+        """为最近使用过的启动配置补足预热驱动"""
+        if self.warm_size <= 0:
+            return
+        now = time.time()
+        while not self._stopped.is_set():
+            with self._lock:
+                profile = None
+                for candidate, used_at in self._last_used.items():
+                    if now - used_at >= self.cleanup_interval:
+                        continue
+                    if len(self._idle.get(candidate, [])) < self.warm_size:
+                        profile = candidate
+                        break
+                if profile is None or self._total_locked() >= self.max_browsers:
+                    return
+                self._launching += 1
+            try:
+                driver = self._launcher(profile)
+            except Exception as e:
+                logger.warning(f"预热浏览器启动失败: {profile}: {e}")
+                with self._lock:
+                    self._launching -= 1
+                return
+            with self._lock:
+                self._launching -= 1
+                closed = self._stopped.is_set()
+                if not closed:
+                    self._idle.setdefault(profile, []).append((driver, time.time()))
+            if closed:
+                # 启动期间池已关闭，shutdown看不到这个驱动，由这里关闭
+                logger.info(f"浏览器池已关闭，丢弃刚预热的浏览器: {profile}")
+                self._disposer(driver)
+                return
+            logger.info(f"已预热浏览器: {profile}")
+
+    # ------------------------------------------------------------------
+    # 状态 / 关闭
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        """返回池的当前状态"""
+        with self._lock:
+            return {
+                "max_browsers": self.max_browsers,
+                "warm_size": self.warm_size,
+                "cleanup_interval": self.cleanup_interval,
+                "leased": len(self._leased),
+                "launching": self._launching,
+                "last_cold_launch_ms": self.last_launch_ms,
+                "idle": {
+                    ",".join(str(part) for part in profile): len(entries)
+                    for profile, entries in self._idle.items()
+                },
+            }
+
+    def shutdown(self) -> None:
+        """关闭池中所有浏览器（包括已租出的）"""
+        self._stopped.set()
+        self._wake.set()
+        with self._lock:
+            drivers = [driver for entries in self._idle.values() for driver, _ in entries]
+            drivers.extend(driver for driver, _ in self._leased.values())
+            self._idle.clear()
+            self._leased.clear()
+        for driver in drivers:
+            self._disposer(driver)
+        if drivers:
+            logger.info(f"浏览器池已关闭，共关闭{len(drivers)}个浏览器")
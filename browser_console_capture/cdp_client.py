@@ -0,0 +1,217 @@
+"""Chrome DevTools Protocol客户端
+通过每个Chrome进程独立的远程调试端口直接连接页面target，
+支持发送命令和订阅事件（Selenium的execute_cdp_cmd只能发送命令，无法接收事件）
+"""
+
+import itertools
+import json
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+try:
+    import websocket
+except ImportError:  # websocket-client未安装时CDP事件功能不可用
+    websocket = None
+
+logger = logging.getLogger(__name__)
+
+
+class CDPError(Exception):
+    """CDP命令执行失败"""
+
+
+class CDPConnection:
+    """
+    到单个页面target的CDP WebSocket连接
+
+    读取线程负责接收消息并唤醒等待中的命令；事件在独立的分发线程中回调，
+    因此事件处理函数内可以继续同步发送CDP命令。
+
+    Args:
+        ws_url: target的webSocketDebuggerUrl
+        name: 日志中使用的连接名称
+    """
+
+    def __init__(self, ws_url: str, name: str = ""):
+        if websocket is None:
+            raise CDPError("websocket-client未安装，无法建立CDP连接")
+        self.ws_url = ws_url
+        self.name = name or ws_url
+        self._ws = websocket.create_connection(ws_url, timeout=10, suppress_origin=True)
+        self._ws.settimeout(None)
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._events: "queue.Queue" = queue.Queue()
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.closed = threading.Event()
+        self._reader = threading.Thread(target=self._read_loop, name=f"cdp-reader-{self.name}", daemon=True)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name=f"cdp-events-{self.name}", daemon=True)
+        self._reader.start()
+        self._dispatcher.start()
+
+    def send(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10) -> Dict[str, Any]:
+        """发送命令并等待结果"""
+        if self.closed.is_set():
+            raise CDPError(f"CDP连接已关闭: {self.name}")
+        message_id = next(self._ids)
+        waiter = {"event": threading.Event(), "response": None}
+        with self._lock:
+            self._pending[message_id] = waiter
+        try:
+            with self._send_lock:
+                self._ws.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+            if not waiter["event"].wait(timeout):
+                raise CDPError(f"CDP命令超时: {method}")
+        finally:
+            with self._lock:
+                self._pending.pop(message_id, None)
+        response = waiter["response"]
+        if response is None:
+            raise CDPError(f"CDP连接已关闭: {self.name}")
+        if "error" in response:
+            raise CDPError(f"{method}: {response['error'].get('message')}")
+        return response.get("result", {})
+
+    def on(self, event: str, handler: Callable[[Dict[str, Any]], None]) -> None:
+        """订阅事件，handler接收事件的params"""
+        with self._lock:
+            self._handlers.setdefault(event, []).append(handler)
+
+    def off(self, event: str, handler: Callable[[Dict[str, Any]], None]) -> None:
+        """取消订阅"""
+        with self._lock:
+            handlers = self._handlers.get(event, [])
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def close(self) -> None:
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+        self._events.put(None)
+
+    def _read_loop(self) -> None:
+        try:
+            while not self.closed.is_set():
+                raw = self._ws.recv()
+                if not raw:
+                    break
+                message = json.loads(raw)
+                if "id" in message:
+                    with self._lock:
+                        waiter = self._pending.get(message["id"])
+                    if waiter is not None:
+                        waiter["response"] = message
+                        waiter["event"].set()
+                elif "method" in message:
+                    self._events.put(message)
+        except Exception as e:
+            if not self.closed.is_set():
+                logger.debug(f"CDP连接{self.name}读取结束: {e}")
+        finally:
+            self.closed.set()
+            with self._lock:
+                waiters = list(self._pending.values())
+            for waiter in waiters:
+                waiter["event"].set()
+            self._events.put(None)
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            message = self._events.get()
+            if message is None:
+                break
+            with self._lock:
+                handlers = list(self._handlers.get(message["method"], []))
+            for handler in handlers:
+                try:
+                    handler(message.get("params", {}))
+                except Exception as e:
+                    logger.warning(f"CDP事件处理失败 {message['method']}: {e}", exc_info=True)
+
+
+class CDPHub:
+    """
+    一个浏览器会话的CDP连接集合，按窗口句柄（即ChromeDriver中的target id）懒加载连接
+
+    通过add_installer注册的功能会安装到已有连接以及之后新建的每个连接上。
+
+    Args:
+        debug_port: Chrome远程调试端口
+        host: 调试地址
+    """
+
+    def __init__(self, debug_port: int, host: str = "127.0.0.1"):
+        self.debug_port = debug_port
+        self.host = host
+        self._connections: Dict[str, CDPConnection] = {}
+        self._installers: List[Callable[[CDPConnection, str], None]] = []
+        self._lock = threading.RLock()
+
+    def targets(self) -> List[Dict[str, Any]]:
+        """列出浏览器中的页面target"""
+        response = requests.get(f"http://{self.host}:{self.debug_port}/json/list", timeout=5)
+        response.raise_for_status()
+        return [target for target in response.json() if target.get("type") == "page"]
+
+    def connection(self, handle: str) -> CDPConnection:
+        """获取窗口句柄对应的CDP连接，不存在时创建并安装已注册的功能"""
+        with self._lock:
+            conn = self._connections.get(handle)
+            if conn is not None and not conn.closed.is_set():
+                return conn
+            # 旧版ChromeDriver的窗口句柄带有CDwindow-前缀
+            target_id = handle[len("CDwindow-"):] if handle.startswith("CDwindow-") else handle
+            ws_url = f"ws://{self.host}:{self.debug_port}/devtools/page/{target_id}"
+            conn = CDPConnection(ws_url, name=handle[:8])
+            self._connections[handle] = conn
+            installers = list(self._installers)
+        for installer in installers:
+            try:
+                installer(conn, handle)
+            except Exception as e:
+                logger.warning(f"CDP功能安装失败: {e}", exc_info=True)
+        logger.debug(f"已建立CDP连接: {handle}")
+        return conn
+
+    def add_installer(self, installer: Callable[[CDPConnection, str], None]) -> None:
+        """注册功能，并立即安装到所有已打开的连接"""
+        with self._lock:
+            self._installers.append(installer)
+            connections = [(handle, conn) for handle, conn in self._connections.items() if not conn.closed.is_set()]
+        for handle, conn in connections:
+            installer(conn, handle)
+
+    def remove_installer(self, installer: Callable[[CDPConnection, str], None]) -> None:
+        with self._lock:
+            if installer in self._installers:
+                self._installers.remove(installer)
+
+    def connections(self) -> Dict[str, CDPConnection]:
+        with self._lock:
+            return {handle: conn for handle, conn in self._connections.items() if not conn.closed.is_set()}
+
+    def drop(self, handle: str) -> None:
+        """关闭单个窗口的连接"""
+        with self._lock:
+            conn = self._connections.pop(handle, None)
+        if conn is not None:
+            conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._installers.clear()
+        for conn in connections:
+            conn.close()
@@ -0,0 +1,262 @@
+"""控制台日志环形缓冲区
+条目以__slots__记录保存，只在返回给调用方时展开为字典；
+WARNING/SEVERE与INFO/DEBUG分别保存在两个固定容量的环中，
+刷屏的普通日志不会把错误挤出缓冲区，长时间运行的会话内存占用保持平稳；
+写入时同步按消息指纹累计重复消息的分组
+"""
+
+import heapq
+import itertools
+import threading
+from collections import Counter, OrderedDict, deque
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from log_classifier import message_fingerprint
+
+# 进入高优先级环的级别
+IMPORTANT_LEVELS = frozenset(("SEVERE", "ERROR", "WARNING"))
+
+# 每条日志最多保留的调用栈帧数
+MAX_STACK_FRAMES = 20
+
+
+def compact_stack(frames) -> Optional[Tuple[Tuple[str, str, int, int], ...]]:
+    """把CDP callFrames压缩为(函数名, URL, 行, 列)元组，行列保持CDP的0起始"""
+    if not frames:
+        return None
+    return tuple(
+        (frame.get("functionName", ""), frame.get("url", ""), frame.get("lineNumber", 0), frame.get("columnNumber", 0))
+        for frame in frames[:MAX_STACK_FRAMES]
+    )
+
+
+class ConsoleEntry:
+    """一条控制台日志"""
+
+    __slots__ = ("seq", "timestamp", "level", "source", "log_type", "tab", "message", "stack")
+
+    def __init__(self, seq: int, timestamp: int, level: str, source: str, log_type: str,
+                 tab: Optional[str], message: str, stack=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.level = level
+        self.source = source
+        self.log_type = log_type
+        self.tab = tab
+        self.message = message
+        self.stack = stack
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "timestamp": self.timestamp,
+            "level": self.level,
+            "source": self.source,
+            "log_type": self.log_type,
+            "tab": self.tab,
+            "message": self.message,
+            "stack": [
+                {"function": function, "url": url, "line": line + 1, "column": column + 1}
+                for function, url, line, column in self.stack
+            ] if self.stack else None,
+        }
+
+
+class ConsoleGroup:
+    """指纹相同的一组控制台日志，sample为组内第一条"""
+
+    __slots__ = ("level", "source", "tab", "fingerprint", "count",
+                 "first_timestamp", "last_timestamp", "first_seq", "last_seq", "sample")
+
+    def __init__(self, entry: ConsoleEntry, fingerprint: str):
+        self.level = entry.level
+        self.source = entry.source
+        self.tab = entry.tab
+        self.fingerprint = fingerprint
+        self.count = 1
+        self.first_timestamp = self.last_timestamp = entry.timestamp
+        self.first_seq = self.last_seq = entry.seq
+        self.sample = entry
+
+    def add(self, entry: ConsoleEntry) -> None:
+        self.count += 1
+        self.last_timestamp = entry.timestamp
+        self.last_seq = entry.seq
+
+    def merge(self, other: "ConsoleGroup") -> None:
+        """合并其他标签页中指纹相同的分组"""
+        self.count += other.count
+        if other.first_seq < self.first_seq:
+            self.first_timestamp, self.first_seq, self.sample = other.first_timestamp, other.first_seq, other.sample
+        if other.last_seq > self.last_seq:
+            self.last_timestamp, self.last_seq = other.last_timestamp, other.last_seq
+        self.tab = None
+
+    def copy(self) -> "ConsoleGroup":
+        group = ConsoleGroup.__new__(ConsoleGroup)
+        for name in ConsoleGroup.__slots__:
+            setattr(group, name, getattr(self, name))
+        return group
+
+
+class ConsoleRingBuffer:
+    """
+    固定容量的控制台日志缓冲区，每条日志分配单调递增的序号
+
+    Args:
+        capacity: WARNING/SEVERE日志的容量
+        low_capacity: INFO/DEBUG等日志的容量，None表示与capacity相同
+        max_groups: 重复消息分组的最大数量，超出时丢弃最久未出现的分组
+    """
+
+    def __init__(self, capacity: int = 10000, low_capacity: Optional[int] = None, max_groups: int = 1000):
+        self.capacity = max(1, capacity)
+        self.low_capacity = max(1, low_capacity if low_capacity is not None else capacity)
+        self._important: deque = deque(maxlen=self.capacity)
+        self._low: deque = deque(maxlen=self.low_capacity)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        # 缓冲区中每个(标签页, 级别)的条目数，随写入和淘汰增量维护
+        self._counts: Counter = Counter()
+        self.dropped = 0
+        self.last_seq = 0
+        # (标签页, 级别, 来源, 指纹) -> 分组，按最近出现顺序排列
+        self._groups: "OrderedDict[Tuple, ConsoleGroup]" = OrderedDict()
+        self.max_groups = max(1, max_groups)
+
+    def append(self, timestamp: int, level: str, source: str, log_type: str,
+               tab: Optional[str], message: str, stack=None) -> ConsoleEntry:
+        with self._lock:
+            entry = ConsoleEntry(next(self._seq), timestamp, level, source, log_type, tab, message, stack)
+            ring = self._important if level in IMPORTANT_LEVELS else self._low
+            if len(ring) == ring.maxlen:
+                evicted = ring[0]
+                self._counts[(evicted.tab, evicted.level)] -= 1
+                self.dropped += 1
+            ring.append(entry)
+            self._counts[(tab, level)] += 1
+            self.last_seq = entry.seq
+            self._group(entry)
+        return entry
+
+    def _group(self, entry: ConsoleEntry) -> None:
+        """把条目计入重复消息分组（调用方需持有锁）"""
+        fingerprint = message_fingerprint(entry.message)
+        key = (entry.tab, entry.level, entry.source, fingerprint)
+        group = self._groups.get(key)
+        if group is None:
+            self._groups[key] = ConsoleGroup(entry, fingerprint)
+            if len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+        else:
+            group.add(entry)
+            self._groups.move_to_end(key)
+
+    def snapshot(self) -> Tuple[List[ConsoleEntry], List[ConsoleEntry]]:
+        """返回两个环的副本（各自按序号递增）"""
+        with self._lock:
+            return list(self._important), list(self._low)
+
+    def entries(self) -> Iterator[ConsoleEntry]:
+        """按序号顺序遍历全部条目"""
+        important, low = self.snapshot()
+        return heapq.merge(important, low, key=attrgetter("seq"))
+
+    def _newest_first(self, important_only: bool) -> Iterator[ConsoleEntry]:
+        """从最新到最旧遍历（调用方需持有锁）"""
+        if important_only:
+            return reversed(self._important)
+        return heapq.merge(reversed(self._important), reversed(self._low), key=attrgetter("seq"), reverse=True)
+
+    def latest(self, limit: Optional[int] = None,
+               predicate: Optional[Callable[[ConsoleEntry], bool]] = None,
+               important_only: bool = False) -> List[ConsoleEntry]:
+        """
+        从最新的条目向前扫描，返回满足条件的最多limit条（按序号递增排列）
+
+        Args:
+            limit: 最多返回的条数，None或0表示不限制
+            predicate: 条目过滤条件
+            important_only: 只扫描WARNING/SEVERE环
+        """
+        with self._lock:
+            newest_first = self._newest_first(important_only)
+            if predicate is not None:
+                newest_first = filter(predicate, newest_first)
+            selected = list(itertools.islice(newest_first, limit or None))
+        selected.reverse()
+        return selected
+
+    def since(self, cursor: int, limit: Optional[int] = None,
+              predicate: Optional[Callable[[ConsoleEntry], bool]] = None,
+              important_only: bool = False) -> Tuple[List[ConsoleEntry], int, bool]:
+        """
+        返回序号大于cursor的条目，只扫描新增部分
+
+        Returns:
+            tuple: (按序号递增的最多limit条条目, 下一次调用使用的游标, 是否还有未返回的条目)
+        """
+        with self._lock:
+            newer = list(itertools.takewhile(lambda entry: entry.seq > cursor, self._newest_first(important_only)))
+            last_seq = self.last_seq
+        newer.reverse()
+        if predicate is not None:
+            newer = [entry for entry in newer if predicate(entry)]
+        if limit and len(newer) > limit:
+            return newer[:limit], newer[limit - 1].seq, True
+        # 被过滤掉的条目也一并跳过，游标推进到当前最新序号
+        return newer, max(cursor, last_seq), False
+
+    def groups(self, tab: Optional[str] = None, since: Optional[int] = None) -> List[ConsoleGroup]:
+        """
+        返回重复消息分组的副本（按最后出现顺序排列）
+
+        Args:
+            tab: 只返回该标签页的分组，None表示合并所有标签页中指纹相同的分组
+            since: 只返回在该序号之后又出现过的分组
+        """
+        with self._lock:
+            groups = [group.copy() for group in self._groups.values() if tab is None or group.tab == tab]
+        if tab is None:
+            merged: Dict[Tuple, ConsoleGroup] = {}
+            for group in groups:
+                key = (group.level, group.source, group.fingerprint)
+                if key in merged:
+                    merged[key].merge(group)
+                else:
+                    merged[key] = group
+            groups = sorted(merged.values(), key=attrgetter("last_seq"))
+        if since is not None:
+            groups = [group for group in groups if group.last_seq > since]
+        return groups
+
+    def level_counts(self, tab: Optional[str] = None) -> Dict[str, int]:
+        """缓冲区中各原始级别的条目数，指定tab时只统计该标签页"""
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for (entry_tab, level), count in self._counts.items():
+                if count and (tab is None or entry_tab == tab):
+                    counts[level] = counts.get(level, 0) + count
+        return counts
+
+    def clear(self) -> None:
+        with self._lock:
+            self._important.clear()
+            self._low.clear()
+            self._counts.clear()
+            self._groups.clear()
+
+    def __len__(self) -> int:
+        return len(self._important) + len(self._low)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self),
+            "important": len(self._important),
+            "low": len(self._low),
+            "capacity": self.capacity,
+            "low_capacity": self.low_capacity,
+            "dropped": self.dropped,
+            "groups": len(self._groups),
+        }
@@ -0,0 +1,216 @@
+"""控制台日志推送捕获
+Chrome会话通过CDP事件（Runtime.consoleAPICalled、Runtime.exceptionThrown、Log.entryAdded）
+实时把日志写入会话缓冲区，读取日志不再需要访问浏览器，也不会因轮询清空浏览器日志缓冲区而丢失日志；
+无法使用CDP的会话（如Firefox）退化为轮询driver.get_log()，结果同样写入缓冲区
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cdp_client import CDPConnection
+from console_buffer import ConsoleEntry, ConsoleGroup, ConsoleRingBuffer, compact_stack
+
+logger = logging.getLogger(__name__)
+
+# 轮询模式下读取的日志类型
+POLL_LOG_TYPES = ('browser', 'driver', 'client', 'server')
+
+# console方法 -> WebDriver日志级别（与ChromeDriver的get_log保持一致）
+CONSOLE_API_LEVELS = {
+    'error': 'SEVERE',
+    'assert': 'SEVERE',
+    'warning': 'WARNING',
+    'debug': 'DEBUG',
+}
+
+# 不产生日志内容的console方法
+IGNORED_CONSOLE_TYPES = {'clear', 'endGroup'}
+
+# Log.entryAdded级别 -> WebDriver日志级别
+LOG_ENTRY_LEVELS = {
+    'verbose': 'DEBUG',
+    'info': 'INFO',
+    'warning': 'WARNING',
+    'error': 'SEVERE',
+}
+
+
+def _format_remote_object(obj: Dict[str, Any]) -> str:
+    """把console参数（RemoteObject）格式化为ChromeDriver日志中的文本形式"""
+    if 'value' in obj:
+        value = obj['value']
+        return json.dumps(value, ensure_ascii=False) if isinstance(value, str) else str(value)
+    if 'unserializableValue' in obj:
+        return obj['unserializableValue']
+    return obj.get('description') or obj.get('className') or obj.get('type', '')
+
+
+def _with_location(text: str, url: Optional[str], line: Optional[int], column: Optional[int]) -> str:
+    """按ChromeDriver的格式在消息前加上"URL 行:列"，便于沿用原有的消息解析"""
+    if not url:
+        return text
+    if line is None:
+        return f"{url} - {text}"
+    return f"{url} {line + 1}:{(column or 0) + 1} {text}"
+
+
+def _with_tab(predicate: Optional[Callable[[ConsoleEntry], bool]],
+              tab: Optional[str]) -> Optional[Callable[[ConsoleEntry], bool]]:
+    """在过滤条件上叠加标签页条件"""
+    if tab is None:
+        return predicate
+    if predicate is None:
+        return lambda entry: entry.tab == tab
+    return lambda entry: entry.tab == tab and predicate(entry)
+
+
+class ConsoleCapture:
+    """
+    单个浏览器会话的控制台日志缓冲区
+
+    条目的level、message、source、timestamp与driver.get_log()返回的格式相同，
+    另外带有log_type、tab（窗口句柄）和stack（CDP调用栈，轮询模式下为None）
+
+    Args:
+        capacity: WARNING/SEVERE日志的容量（console.max_logs）
+        low_capacity: INFO/DEBUG日志的容量（console.auto_clear_threshold）
+        store: 持久化存储（ConsoleStore），None表示只保存在内存中
+        session_id: 写入持久化存储时使用的会话ID
+    """
+
+    def __init__(self, capacity: int = 10000, low_capacity: Optional[int] = None,
+                 store=None, session_id: Optional[str] = None):
+        self.streaming = False
+        self.buffer = ConsoleRingBuffer(capacity, low_capacity)
+        self.store = store
+        self.session_id = session_id
+        # 标签页 -> 当前页面URL，随持久化的日志一起记录
+        self.page_urls: Dict[Optional[str], str] = {}
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def append(self, level: str, message: str, source: str, timestamp: int,
+               log_type: str = 'browser', tab: Optional[str] = None, stack=None) -> ConsoleEntry:
+        entry = self.buffer.append(timestamp, level, source, log_type, tab, message, stack)
+        if self.store is not None:
+            self.store.add(self.session_id, entry, self.page_urls.get(tab))
+        return entry
+
+    def install(self, conn: CDPConnection, handle: str) -> None:
+        """CDPHub安装回调：订阅控制台与异常事件并启用Runtime和Log域"""
+        conn.on("Runtime.consoleAPICalled", lambda params: self._on_console_api(handle, params))
+        conn.on("Runtime.exceptionThrown", lambda params: self._on_exception(handle, params))
+        conn.on("Log.entryAdded", lambda params: self._on_log_entry(handle, params))
+        if self.store is not None:
+            conn.on("Page.frameNavigated", lambda params: self._on_frame_navigated(handle, params))
+            conn.on("Page.navigatedWithinDocument", lambda params: self._on_frame_navigated(handle, params))
+            conn.send("Page.enable")
+        conn.send("Runtime.enable")
+        conn.send("Log.enable")
+        self.streaming = True
+        logger.debug(f"已启用控制台事件推送: {handle}")
+
+    def poll(self, driver) -> int:
+        """轮询模式：读取并清空WebDriver日志缓冲区，写入会话缓冲区"""
+        try:
+            tab = driver.current_window_handle
+            if self.store is not None:
+                self.page_urls[tab] = driver.current_url
+        except Exception:
+            tab = None
+        count = 0
+        for log_type in POLL_LOG_TYPES:
+            try:
+                logs = driver.get_log(log_type)
+            except Exception as type_error:
+                logger.debug(f"无法获取{log_type}日志: {type_error}")
+                continue
+            for log in logs:
+                self.append(log.get('level', 'INFO'), log.get('message', ''), log.get('source', 'unknown'),
+                            log.get('timestamp', 0), log_type, tab)
+            count += len(logs)
+            logger.debug(f"从{log_type}获取到{len(logs)}条日志")
+        return count
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def entries(self, tab: Optional[str] = None) -> List[ConsoleEntry]:
+        """按捕获顺序返回缓冲区中的条目，指定tab时只返回该标签页的条目"""
+        if tab is None:
+            return list(self.buffer.entries())
+        return [entry for entry in self.buffer.entries() if entry.tab == tab]
+
+    def latest(self, limit: Optional[int] = None, predicate: Optional[Callable[[ConsoleEntry], bool]] = None,
+               tab: Optional[str] = None, important_only: bool = False) -> List[ConsoleEntry]:
+        """返回最新的最多limit条满足条件的条目，过滤在原始条目上完成，不做任何格式化"""
+        return self.buffer.latest(limit, _with_tab(predicate, tab), important_only)
+
+    def since(self, cursor: int, limit: Optional[int] = None,
+              predicate: Optional[Callable[[ConsoleEntry], bool]] = None,
+              tab: Optional[str] = None, important_only: bool = False) -> Tuple[List[ConsoleEntry], int, bool]:
+        """增量读取序号大于cursor的条目，返回(条目, 下一个游标, 是否还有更多)"""
+        return self.buffer.since(cursor, limit, _with_tab(predicate, tab), important_only)
+
+    def groups(self, tab: Optional[str] = None, since: Optional[int] = None) -> List[ConsoleGroup]:
+        """重复消息分组，写入时已增量累计，这里只做读取"""
+        return self.buffer.groups(tab, since)
+
+    def level_counts(self, tab: Optional[str] = None) -> Dict[str, int]:
+        return self.buffer.level_counts(tab)
+
+    def clear(self) -> None:
+        self.buffer.clear()
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    # ------------------------------------------------------------------
+    # CDP事件
+    # ------------------------------------------------------------------
+    def _on_console_api(self, handle: str, params: Dict[str, Any]) -> None:
+        console_type = params.get('type', 'log')
+        if console_type in IGNORED_CONSOLE_TYPES:
+            return
+        text = " ".join(_format_remote_object(arg) for arg in params.get('args', []))
+        frames = (params.get('stackTrace') or {}).get('callFrames') or []
+        top = frames[0] if frames else {}
+        self.append(CONSOLE_API_LEVELS.get(console_type, 'INFO'),
+                    _with_location(text, top.get('url'), top.get('lineNumber'), top.get('columnNumber')),
+                    'console-api', int(params.get('timestamp', 0)), tab=handle, stack=compact_stack(frames))
+
+    def _on_exception(self, handle: str, params: Dict[str, Any]) -> None:
+        details = params.get('exceptionDetails', {})
+        exception = details.get('exception') or {}
+        # description包含异常类型、消息和调用栈（"TypeError: ...\n    at fn (url:line:col)"）
+        description = exception.get('description') or exception.get('value')
+        text = details.get('text', 'Uncaught')
+        if description:
+            text = f"{text} {description}"
+        frames = (details.get('stackTrace') or {}).get('callFrames') or []
+        self.append('SEVERE',
+                    _with_location(text, details.get('url'), details.get('lineNumber'), details.get('columnNumber')),
+                    'javascript', int(params.get('timestamp', 0)), tab=handle, stack=compact_stack(frames))
+
+    def _on_frame_navigated(self, handle: str, params: Dict[str, Any]) -> None:
+        """记录标签页主框架的当前URL（包括同文档内的history导航）"""
+        frame = params.get('frame')
+        if frame is not None:
+            if frame.get('parentId') is None and frame.get('url'):
+                self.page_urls[handle] = frame['url'] + frame.get('urlFragment', '')
+        elif params.get('url') and params.get('frameId') == handle:
+            # 主框架的frameId与目标ID（窗口句柄）相同
+            self.page_urls[handle] = params['url']
+
+    def _on_log_entry(self, handle: str, params: Dict[str, Any]) -> None:
+        entry = params.get('entry', {})
+        source = entry.get('source', 'other')
+        if source == 'console-api':
+            # 已由Runtime.consoleAPICalled记录
+            return
+        frames = (entry.get('stackTrace') or {}).get('callFrames') or []
+        self.append(LOG_ENTRY_LEVELS.get(entry.get('level'), 'INFO'),
+                    _with_location(entry.get('text', ''), entry.get('url'), None, None),
+                    source, int(entry.get('timestamp', 0)), tab=handle, stack=compact_stack(frames))
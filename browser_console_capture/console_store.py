@@ -0,0 +1,281 @@
+"""控制台日志持久化存储
+捕获的日志由后台线程批量写入SQLite，关闭浏览器后仍可查询；
+按会话、页面URL、级别、错误指纹和时间建立索引，
+可以直接回答"最近一小时/checkout页面上的所有TypeError"这类问题而不需要重新运行浏览器
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from console_buffer import ConsoleEntry
+from log_classifier import ERROR_LEVELS, classify_message, message_fingerprint, normalize_level
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS console_events (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    tab TEXT,
+    page_url TEXT,
+    page_path TEXT,
+    seq INTEGER,
+    timestamp INTEGER NOT NULL,
+    level TEXT NOT NULL,
+    original_level TEXT,
+    source TEXT,
+    log_type TEXT,
+    error_type TEXT,
+    fingerprint TEXT,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_console_session_time ON console_events (session_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_console_url_time ON console_events (page_url, timestamp);
+CREATE INDEX IF NOT EXISTS idx_console_path_time ON console_events (page_path, timestamp);
+CREATE INDEX IF NOT EXISTS idx_console_level_time ON console_events (level, timestamp);
+CREATE INDEX IF NOT EXISTS idx_console_error_time ON console_events (error_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_console_fingerprint_time ON console_events (fingerprint, timestamp);
+CREATE INDEX IF NOT EXISTS idx_console_time ON console_events (timestamp);
+"""
+
+INSERT_SQL = """
+INSERT INTO console_events (session_id, tab, page_url, page_path, seq, timestamp, level, original_level,
+                            source, log_type, error_type, fingerprint, message)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# 前缀匹配的上界：前缀后追加最大码点，范围查询可以使用索引
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+# 过期日志的清理间隔（秒）
+PRUNE_INTERVAL = 3600
+
+
+def _row(session_id: str, entry: ConsoleEntry, page_url: Optional[str]) -> Tuple:
+    """在写入线程中完成分类，捕获路径上只做入队"""
+    level = normalize_level(entry.level)
+    error_type = classify_message(entry.message)[1] if level in ERROR_LEVELS else None
+    page_path = (urlsplit(page_url).path or "/") if page_url else None
+    return (session_id, entry.tab, page_url, page_path, entry.seq, entry.timestamp, level, entry.level,
+            entry.source, entry.log_type, error_type, message_fingerprint(entry.message), entry.message)
+
+
+class ConsoleStore:
+    """
+    SQLite控制台日志存储，写入在后台线程中批量提交
+
+    Args:
+        path: 数据库文件路径
+        batch_size: 每个事务最多写入的条数
+        flush_interval: 不足一批时的最长等待时间（秒）
+        retention_days: 保留天数，None表示不清理
+        max_pending: 等待写入的最大条数，写入跟不上时丢弃新日志而不是占用无限内存
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 1.0,
+                 retention_days: Optional[float] = 7, max_pending: int = 100000):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.written = 0
+        self.dropped = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._stopping = threading.Event()
+        self._last_prune = 0.0
+        self._writer = threading.Thread(target=self._run, name="console-store-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"控制台日志持久化已启用: {path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def add(self, session_id: str, entry: ConsoleEntry, page_url: Optional[str] = None) -> None:
+        """把一条日志加入写入队列（不阻塞）"""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait((session_id, entry, page_url))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 10) -> bool:
+        """等待队列中已有的日志全部写入"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            # 队列已满时不阻塞等待空位，写入线程写完当前批次后退出，未写入的日志计入dropped
+            self._stopping.set()
+        self._writer.join(timeout)
+        if self._stopping.is_set():
+            self.dropped += self._queue.qsize()
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            stop = False
+            while not stop and not self._stopping.is_set():
+                batch: List[Tuple] = []
+                waiters: List[threading.Event] = []
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                # 凑满一批或等待flush_interval后在一个事务中写入
+                while True:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or waiters or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                self._write(conn, batch)
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Tuple]) -> None:
+        try:
+            if batch:
+                with conn:
+                    conn.executemany(INSERT_SQL, [_row(*item) for item in batch])
+                self.written += len(batch)
+            if self.retention_days is not None and time.time() - self._last_prune > PRUNE_INTERVAL:
+                self._last_prune = time.time()
+                cutoff = int((time.time() - self.retention_days * 86400) * 1000)
+                with conn:
+                    deleted = conn.execute("DELETE FROM console_events WHERE timestamp < ?", (cutoff,)).rowcount
+                if deleted:
+                    logger.info(f"已清理{deleted}条过期控制台日志")
+        except sqlite3.Error as e:
+            self.dropped += len(batch)
+            logger.error(f"写入控制台日志失败: {e}")
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def query(self, session_id: Optional[str] = None, url: Optional[str] = None, level: Optional[str] = None,
+              error_type: Optional[str] = None, fingerprint: Optional[str] = None, text: Optional[str] = None,
+              start_time: Optional[int] = None, end_time: Optional[int] = None, limit: int = 100,
+              group_by_fingerprint: bool = False) -> List[Dict[str, Any]]:
+        """
+        按条件查询历史日志（最新的在前）
+
+        Args:
+            url: 以"/"开头时按页面路径前缀匹配，否则按完整页面URL前缀匹配
+            level: 标准化级别（ERROR、WARNING、INFO、VERBOSE），原始级别（SEVERE、DEBUG等）按写入时的规则标准化
+            text: 消息中包含的文本
+            start_time/end_time: 毫秒时间戳范围
+            group_by_fingerprint: 按指纹分组返回出现次数和首末时间，
+                message/page_url/session_id取自最后一次出现的那一行（窗口函数按时间倒序取第一行）
+        """
+        clauses, params = [], []
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if url:
+            column = "page_path" if url.startswith("/") else "page_url"
+            clauses.append(f"{column} >= ? AND {column} < ?")
+            params.extend((url, url + PREFIX_UPPER_BOUND))
+        if level:
+            clauses.append("level = ?")
+            params.append(normalize_level(level.upper()))
+        if error_type:
+            clauses.append("error_type = ?")
+            params.append(error_type)
+        if fingerprint:
+            clauses.append("fingerprint = ?")
+            params.append(fingerprint)
+        if text:
+            clauses.append("instr(message, ?) > 0")
+            params.append(text)
+        if start_time is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            clauses.append("timestamp <= ?")
+            params.append(end_time)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        if group_by_fingerprint:
+            sql = f"""
+                WITH filtered AS (
+                    SELECT id, fingerprint, level, error_type, timestamp, message, page_url, session_id
+                    FROM console_events {where}
+                ),
+                groups AS (
+                    SELECT fingerprint, level, error_type, COUNT(*) AS count, MIN(timestamp) AS first_timestamp,
+                           MAX(timestamp) AS last_timestamp, COUNT(DISTINCT session_id) AS sessions
+                    FROM filtered
+                    GROUP BY fingerprint, level, error_type
+                ),
+                latest AS (
+                    SELECT fingerprint, level, error_type, message, page_url, session_id,
+                           ROW_NUMBER() OVER (PARTITION BY fingerprint, level, error_type
+                                              ORDER BY timestamp DESC, id DESC) AS position
+                    FROM filtered
+                )
+                SELECT groups.fingerprint, groups.level, groups.error_type, count, first_timestamp, last_timestamp,
+                       sessions, latest.message, latest.page_url, latest.session_id
+                FROM groups JOIN latest
+                  ON latest.position = 1 AND latest.fingerprint IS groups.fingerprint
+                 AND latest.level IS groups.level AND latest.error_type IS groups.error_type
+                ORDER BY count DESC, last_timestamp DESC
+                LIMIT ?
+            """
+        else:
+            sql = f"""
+                SELECT session_id, tab, page_url, seq, timestamp, level, original_level, source, log_type,
+                       error_type, fingerprint, message
+                FROM console_events {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            """
+        params.append(limit)
+        self.flush()
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "written": self.written, "pending": self._queue.qsize(), "dropped": self.dropped}
@@ -0,0 +1,148 @@
+"""元素句柄缓存
+click_element、input_text、wait_for_element按 (定位方式, 选择器, 导航代数) 缓存WebElement，
+同一页面上重复操作同一元素时不再重新创建WebDriverWait、重新查找元素。
+通过本服务导航、切换或关闭标签页时导航代数加一，旧条目全部失效；
+页面自己跳转或元素被替换时，使用缓存元素会抛出StaleElementReferenceException，
+此时丢弃该条目并按原来的方式重新等待和查找。
+元素属性（标签、文本、可见、可用）通过一次脚本调用获取
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from selenium.common.exceptions import (
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+    StaleElementReferenceException,
+)
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+WAIT_CONDITIONS = {
+    "presence": EC.presence_of_element_located,
+    "visible": EC.visibility_of_element_located,
+    "clickable": EC.element_to_be_clickable,
+}
+
+# 元素已从文档移除时返回null，按失效处理
+ELEMENT_PROPERTIES_SCRIPT = """
+var el = arguments[0];
+if (!el || !el.isConnected) return null;
+var rect = el.getBoundingClientRect(), style = window.getComputedStyle(el);
+return {
+  tag: el.tagName.toLowerCase(),
+  text: (el.innerText || el.textContent || '').slice(0, arguments[1]),
+  visible: rect.width > 0 && rect.height > 0 && style.visibility !== 'hidden'
+           && style.display !== 'none' && parseFloat(style.opacity) !== 0,
+  enabled: !el.disabled
+};
+"""
+
+# 缓存元素操作失败时改为重新查找的异常（被遮挡层拦截或重新渲染也重新等待）
+FALLBACK_ERRORS = (StaleElementReferenceException, ElementNotInteractableException, ElementClickInterceptedException)
+
+
+class ElementCache:
+    """单个浏览器会话的元素句柄缓存（调用方持有会话锁）"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: "OrderedDict[Tuple[str, str, int], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stale": 0}
+
+    def invalidate(self) -> None:
+        """导航或切换标签页后调用，之前的元素句柄全部作废"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def get(self, by: str, selector: str):
+        with self._lock:
+            key = (by, selector, self.generation)
+            element = self._entries.get(key)
+            if element is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return element
+
+    def put(self, by: str, selector: str, element) -> None:
+        with self._lock:
+            self._entries[(by, selector, self.generation)] = element
+            self._entries.move_to_end((by, selector, self.generation))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, by: str, selector: str) -> None:
+        with self._lock:
+            if self._entries.pop((by, selector, self.generation), None) is not None:
+                self.counters["stale"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def locate(driver, cache: ElementCache, by: str, selector: str, condition: str, timeout: float):
+    """按条件等待并查找元素，结果写入缓存"""
+    element = WebDriverWait(driver, timeout).until(WAIT_CONDITIONS[condition]((by, selector)))
+    cache.put(by, selector, element)
+    return element
+
+
+def describe(driver, element, text_chars: int = 200) -> Dict[str, Any]:
+    """
+    一次脚本调用获取元素属性
+
+    Raises:
+        StaleElementReferenceException: 元素已不在当前文档中
+    """
+    properties = driver.execute_script(ELEMENT_PROPERTIES_SCRIPT, element, text_chars)
+    if properties is None:
+        raise StaleElementReferenceException("Element is no longer attached to the document")
+    return properties
+
+
+def satisfies(properties: Dict[str, Any], condition: str) -> bool:
+    if condition == "visible":
+        return properties["visible"]
+    if condition == "clickable":
+        return properties["visible"] and properties["enabled"]
+    return True
+
+
+def with_element(driver, cache: ElementCache, by: str, selector: str, condition: str, timeout: float,
+                 action: Callable[[Any], Any]) -> Any:
+    """
+    对元素执行操作：优先使用缓存的句柄，但先确认它仍满足condition（例如按钮没有变为禁用或隐藏）；
+    不满足、失效或不可交互时丢弃缓存，重新等待查找后再执行一次
+    """
+    element = cache.get(by, selector)
+    if element is not None:
+        try:
+            if condition == "presence" or satisfies(describe(driver, element), condition):
+                return action(element)
+            logger.debug(f"缓存元素不满足{condition}，重新等待 {selector}")
+        except FALLBACK_ERRORS as e:
+            logger.debug(f"缓存元素不可用，重新查找 {selector}: {type(e).__name__}")
+            cache.discard(by, selector)
+    return action(locate(driver, cache, by, selector, condition, timeout))
+
+
+def wait_for(driver, cache: ElementCache, by: str, selector: str, condition: str, timeout: float) -> Dict[str, Any]:
+    """等待元素满足条件并返回其属性；缓存的元素已满足条件时只需一次脚本调用"""
+    element = cache.get(by, selector)
+    if element is not None:
+        try:
+            properties = describe(driver, element)
+            if satisfies(properties, condition):
+                return properties
+        except StaleElementReferenceException:
+            cache.discard(by, selector)
+    return describe(driver, locate(driver, cache, by, selector, condition, timeout))
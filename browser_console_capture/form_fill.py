@@ -0,0 +1,96 @@
+"""批量表单填写
+fill_form把所有字段放进一次注入脚本：文本框通过原生value setter赋值并触发input/change事件，
+React、Vue等框架的受控组件能收到变更；下拉框按value或显示文本选中选项，有未知选项时整个下拉框不做改动；
+复选框和单选框状态不同时调用click()，由浏览器产生完整的事件序列。
+文件输入框以及调用方指定需要真实按键事件的字段，才回退为WebDriver的send_keys
+"""
+
+from typing import Any, Dict, List, Tuple
+
+# 字段状态
+FILLED = "filled"
+NATIVE = "native"
+
+FILL_SCRIPT = """
+var fields = arguments[0], by = arguments[1], native = arguments[2];
+function find(selector) {
+  if (by === 'xpath') {
+    return document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+  }
+  return document.querySelector(selector);
+}
+function setValue(el, value) {
+  var proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+  Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+}
+function fire(el, type) { el.dispatchEvent(new Event(type, {bubbles: true})); }
+function fill(el, value) {
+  var tag = el.tagName.toLowerCase(), type = (el.type || '').toLowerCase();
+  if (el.disabled) return {status: 'disabled'};
+  if (tag === 'input' && type === 'file') return {status: 'native'};
+  if (tag === 'select') {
+    // 先确认每个值都有对应选项，再修改选中状态；有未知值时不改动下拉框
+    var wanted = (Array.isArray(value) ? value : [value]).map(String);
+    var options = Array.prototype.slice.call(el.options);
+    function matches(option, item) { return option.value === item || option.text.trim() === item; }
+    var unknown = wanted.filter(function (item) {
+      return !options.some(function (option) { return matches(option, item); });
+    });
+    if (unknown.length) return {status: 'unknown_option', options: unknown};
+    options.forEach(function (option) {
+      var hit = wanted.some(function (item) { return matches(option, item); });
+      if (el.multiple || hit) option.selected = hit;
+    });
+    fire(el, 'input'); fire(el, 'change');
+    return {status: 'filled'};
+  }
+  if (tag === 'input' && (type === 'checkbox' || type === 'radio')) {
+    var checked = typeof value === 'string' ? ['', 'false', '0', 'off', 'no'].indexOf(value.toLowerCase()) < 0 : !!value;
+    if (el.checked !== checked) el.click();
+    return {status: el.checked === checked ? 'filled' : 'unchanged'};
+  }
+  if (el.readOnly) return {status: 'readonly'};
+  el.focus();
+  if (el.isContentEditable) {
+    el.textContent = value == null ? '' : String(value);
+  } else if (tag === 'input' || tag === 'textarea') {
+    setValue(el, value == null ? '' : String(value));
+  } else {
+    return {status: 'unsupported', tag: tag};
+  }
+  fire(el, 'input'); fire(el, 'change');
+  el.blur();
+  return {status: 'filled'};
+}
+return fields.map(function (field) {
+  // 按键输入的字段交给WebDriver查找，尚未渲染的字段会等待timeout
+  if (native.indexOf(field[0]) >= 0) return {status: 'native'};
+  var el = find(field[0]);
+  if (!el) return {status: 'missing'};
+  try { return fill(el, field[1]); } catch (e) { return {status: 'error', error: String(e)}; }
+});
+"""
+
+
+def split_results(fields: Dict[str, Any], results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    合并脚本结果
+
+    Returns:
+        (每个字段的报告, 需要用send_keys填写的选择器)
+    """
+    report = []
+    native = []
+    for selector, result in zip(fields, results):
+        entry = {"selector": selector, **(result or {"status": "error", "error": "no result"})}
+        if entry["status"] == NATIVE:
+            native.append(selector)
+        report.append(entry)
+    return report, native
+
+
+def native_keys_text(value: Any) -> str:
+    """send_keys的文本：文件输入框多个路径用换行分隔"""
+    if isinstance(value, (list, tuple)):
+        return "\n".join(str(item) for item in value)
+    return "" if value is None else str(value)
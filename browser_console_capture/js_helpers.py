@@ -0,0 +1,164 @@
+"""JavaScript辅助函数注册表
+辅助函数只定义一次：Chrome会话通过Page.addScriptToEvaluateOnNewDocument安装到每个标签页，
+导航后依然存在；之后按名称调用并传入JSON参数，每次调用只发送一段很短的调用脚本。
+没有CDP的会话在调用时发现页面中缺少该函数才重新发送定义。
+调用统一通过execute_async_script执行，返回Promise的辅助函数不需要轮询
+"""
+
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from cdp_client import CDPConnection
+
+logger = logging.getLogger(__name__)
+
+HELPER_NAME_PATTERN = re.compile(r"^[A-Za-z_$][\w$]*$")
+
+CALL_SCRIPT = """
+var name = arguments[0], args = arguments[1] || [], done = arguments[arguments.length - 1];
+var helper = window.__mcpHelpers && window.__mcpHelpers[name];
+if (typeof helper !== 'function') { done({missing: true}); return; }
+Promise.resolve().then(function () { return helper.apply(window, args); }).then(
+  function (value) { done({value: value === undefined ? null : value}); },
+  function (error) { done({error: String((error && error.stack) || error)}); }
+);
+"""
+
+
+class JSHelperError(Exception):
+    """辅助函数定义或执行失败"""
+
+
+def definition_script(name: str, source: str) -> str:
+    """把函数表达式挂到window.__mcpHelpers上的脚本"""
+    return ("(function () { var helpers = window.__mcpHelpers = window.__mcpHelpers || {}; "
+            f"helpers[{json.dumps(name)}] = ({source}\n); }})();")
+
+
+class JSHelperRegistry:
+    """单个浏览器会话的辅助函数注册表"""
+
+    def __init__(self):
+        self._helpers: Dict[str, str] = {}
+        # (窗口句柄, 名称) -> addScriptToEvaluateOnNewDocument返回的identifier
+        self._identifiers: Dict[Tuple[str, str], str] = {}
+        self._connections: Dict[str, CDPConnection] = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "reinstalls": 0}
+
+    def install(self, conn: CDPConnection, handle: str) -> None:
+        """CDPHub安装回调：把已定义的辅助函数安装到新的标签页连接"""
+        with self._lock:
+            self._connections[handle] = conn
+            helpers = list(self._helpers.items())
+        for name, source in helpers:
+            self._install_one(conn, handle, name, source)
+
+    def _install_one(self, conn: CDPConnection, handle: str, name: str, source: str) -> None:
+        """
+        先在当前文档中执行定义，成功后才注册为新文档脚本并移除旧版本；
+        执行失败时不注册，之前能用的版本保持不变，导航后也不会反复抛出异常
+        """
+        script = definition_script(name, source)
+        result = conn.send("Runtime.evaluate", {"expression": script})
+        if result.get("exceptionDetails"):
+            details = result["exceptionDetails"]
+            raise JSHelperError((details.get("exception") or {}).get("description") or details.get("text", "evaluation failed"))
+        identifier = conn.send("Page.addScriptToEvaluateOnNewDocument", {"source": script}).get("identifier")
+        with self._lock:
+            previous = self._identifiers.pop((handle, name), None)
+            if identifier:
+                self._identifiers[(handle, name)] = identifier
+        if previous:
+            # 重新定义时移除旧版本，新文档只执行最新的定义
+            conn.send("Page.removeScriptToEvaluateOnNewDocument", {"identifier": previous})
+
+    def _uninstall_one(self, conn: CDPConnection, handle: str, name: str) -> None:
+        with self._lock:
+            identifier = self._identifiers.pop((handle, name), None)
+        if identifier:
+            conn.send("Page.removeScriptToEvaluateOnNewDocument", {"identifier": identifier})
+
+    def define(self, driver, name: str, source: str) -> int:
+        """
+        定义或重新定义辅助函数
+
+        Args:
+            driver: 会话的WebDriver，没有CDP连接时用它安装到当前页面
+            name: 辅助函数名称（JavaScript标识符）
+            source: 函数表达式，如 "function (selector) { ... }" 或 "async (url) => { ... }"
+
+        Returns:
+            int: 通过CDP安装的标签页数量
+
+        Raises:
+            JSHelperError: 名称无效或定义脚本执行失败（此时不保存定义）
+        """
+        if not HELPER_NAME_PATTERN.match(name or ""):
+            raise JSHelperError(f"Invalid helper name: {name!r} (use a JavaScript identifier)")
+        with self._lock:
+            previous = self._helpers.get(name)
+            self._helpers[name] = source
+            connections = [(handle, conn) for handle, conn in self._connections.items() if not conn.closed.is_set()]
+        installed = []
+        try:
+            for handle, conn in connections:
+                self._install_one(conn, handle, name, source)
+                installed.append((handle, conn))
+            if not connections:
+                driver.execute_script(definition_script(name, source))
+        except Exception as e:
+            with self._lock:
+                if previous is None:
+                    self._helpers.pop(name, None)
+                else:
+                    self._helpers[name] = previous
+            # 已经装上新版本的标签页恢复为之前的定义
+            for handle, conn in installed:
+                try:
+                    if previous is None:
+                        self._uninstall_one(conn, handle, name)
+                    else:
+                        self._install_one(conn, handle, name, previous)
+                except Exception as rollback_error:
+                    logger.warning(f"恢复辅助函数{name}失败 {handle}: {rollback_error}")
+            raise JSHelperError(f"Failed to define helper {name}: {e}")
+        logger.info(f"已定义JavaScript辅助函数: {name}（{len(source)}字符，{len(connections)}个标签页）")
+        return len(connections)
+
+    def call(self, driver, name: str, args: Optional[List[Any]] = None, timeout: float = 10) -> Any:
+        """
+        按名称调用辅助函数，返回值或Promise的结果
+
+        Raises:
+            JSHelperError: 未定义或执行时抛出异常
+        """
+        with self._lock:
+            source = self._helpers.get(name)
+        if source is None:
+            raise JSHelperError(f"Helper not defined: {name}")
+        self.counters["calls"] += 1
+        driver.set_script_timeout(timeout)
+        result = driver.execute_async_script(CALL_SCRIPT, name, args or [])
+        if isinstance(result, dict) and result.get("missing"):
+            # 页面中没有该函数（没有CDP的会话导航后，或通过其他方式打开的标签页）
+            self.counters["reinstalls"] += 1
+            driver.execute_script(definition_script(name, source))
+            result = driver.execute_async_script(CALL_SCRIPT, name, args or [])
+        if not isinstance(result, dict) or "error" in result:
+            raise JSHelperError(result.get("error") if isinstance(result, dict) else f"Unexpected helper result: {result!r}")
+        return result.get("value")
+
+    def forget(self, handle: str) -> None:
+        with self._lock:
+            self._connections.pop(handle, None)
+            for key in [key for key in self._identifiers if key[0] == handle]:
+                del self._identifiers[key]
+
+    def names(self) -> Dict[str, int]:
+        """辅助函数名称 -> 定义的字符数"""
+        with self._lock:
+            return {name: len(source) for name, source in self._helpers.items()}
@@ -0,0 +1,198 @@
+"""浏览器启动选项构建
+把config.json中的browser.chrome_options、browser.user_agent和features配置
+转换为Chrome参数/偏好设置和Firefox偏好设置，并支持单次调用覆盖
+"""
+
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+logger = logging.getLogger(__name__)
+
+FEATURE_KEYS = ("enable_images", "enable_css", "enable_javascript", "enable_plugins", "enable_extensions")
+
+# 单次调用允许覆盖的选项
+OVERRIDE_KEYS = FEATURE_KEYS + ("enable_fonts", "user_agent", "extra_args", "page_load_strategy")
+
+# WebDriver页面加载策略：normal等待load事件，eager等待DOMContentLoaded，none在导航开始后立即返回
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+# 屏蔽样式表和字体时使用的URL模式（Chrome通过CDP Network.setBlockedURLs对每个标签页生效）
+STYLESHEET_URL_PATTERNS = ("*.css", "*.css?*")
+FONT_URL_PATTERNS = ("*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.woff?*", "*.woff2?*", "*.ttf?*")
+
+# Chrome内容设置: 1 允许, 2 禁止（Chrome没有样式表内容设置，enable_css只通过URL屏蔽实现）
+CHROME_CONTENT_SETTINGS = {
+    "enable_images": "profile.managed_default_content_settings.images",
+    "enable_javascript": "profile.managed_default_content_settings.javascript",
+    "enable_plugins": "profile.managed_default_content_settings.plugins",
+}
+
+# 始终添加的Chrome参数（与config.json中的chrome_options合并）
+BASE_CHROME_ARGS = (
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-web-security",
+    "--disable-features=VizDisplayCompositor",
+)
+
+
+def normalize_overrides(overrides: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, Any], ...]:
+    """
+    校验单次调用的覆盖项并转换为可哈希的元组，用作浏览器池的启动配置键
+
+    Raises:
+        ValueError: 存在不支持的覆盖项
+    """
+    if not overrides:
+        return ()
+    unknown = sorted(set(overrides) - set(OVERRIDE_KEYS))
+    if unknown:
+        raise ValueError(f"Unsupported launch options: {unknown}. Supported: {list(OVERRIDE_KEYS)}")
+    strategy = overrides.get("page_load_strategy")
+    if strategy is not None and strategy not in PAGE_LOAD_STRATEGIES:
+        raise ValueError(f"Unsupported page_load_strategy: {strategy}. Use one of {list(PAGE_LOAD_STRATEGIES)}")
+    items = []
+    for key in sorted(overrides):
+        value = overrides[key]
+        if isinstance(value, list):
+            value = tuple(value)
+        items.append((key, value))
+    return tuple(items)
+
+
+def resolve_launch_settings(config: Dict[str, Any], overrides: Tuple[Tuple[str, Any], ...] = ()) -> Dict[str, Any]:
+    """
+    合并config.json与覆盖项，得到最终的启动设置
+
+    Args:
+        config: 完整的config.json配置
+        overrides: normalize_overrides的返回值
+    """
+    browser_config = config.get('browser', {})
+    features = config.get('features', {})
+    settings: Dict[str, Any] = {key: features.get(key, True) for key in FEATURE_KEYS}
+    settings["enable_fonts"] = features.get('enable_fonts', True)
+    settings["user_agent"] = browser_config.get('user_agent')
+    settings["chrome_args"] = list(browser_config.get('chrome_options', []))
+    settings["extra_args"] = []
+    settings["page_load_strategy"] = browser_config.get('page_load_strategy', 'normal')
+    for key, value in overrides:
+        settings[key] = list(value) if key == "extra_args" else value
+    return settings
+
+
+def blocked_url_patterns(settings: Dict[str, Any]) -> list:
+    """根据启动设置返回需要屏蔽的资源URL模式"""
+    patterns = []
+    if not settings["enable_css"]:
+        patterns.extend(STYLESHEET_URL_PATTERNS)
+    if not settings["enable_fonts"]:
+        patterns.extend(FONT_URL_PATTERNS)
+    return patterns
+
+
+def build_chrome_options(settings: Dict[str, Any], headless: bool, window_size: str, debug_port: int) -> ChromeOptions:
+    """构建Chrome启动选项"""
+    chrome_options = ChromeOptions()
+    chrome_options.page_load_strategy = settings["page_load_strategy"]
+    if headless:
+        chrome_options.add_argument("--headless=new")
+
+    args = list(BASE_CHROME_ARGS)
+    for arg in settings["chrome_args"] + settings["extra_args"]:
+        if arg not in args:
+            args.append(arg)
+    for arg in args:
+        chrome_options.add_argument(arg)
+    chrome_options.add_argument(f"--remote-debugging-port={debug_port}")
+    chrome_options.add_argument(f"--window-size={window_size}")
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+
+    if settings["user_agent"]:
+        chrome_options.add_argument(f"--user-agent={settings['user_agent']}")
+    if not settings["enable_extensions"]:
+        chrome_options.add_argument("--disable-extensions")
+    if not settings["enable_images"]:
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+
+    prefs = {
+        pref: 2
+        for key, pref in CHROME_CONTENT_SETTINGS.items()
+        if not settings[key]
+    }
+    if prefs:
+        chrome_options.add_experimental_option("prefs", prefs)
+
+    # 启用日志记录
+    chrome_options.add_argument("--enable-logging")
+    chrome_options.add_argument("--log-level=0")
+    chrome_options.set_capability('goog:loggingPrefs', {'browser': 'ALL'})
+    return chrome_options
+
+
+def build_firefox_options(settings: Dict[str, Any], headless: bool, window_size: str) -> FirefoxOptions:
+    """构建Firefox启动选项"""
+    firefox_options = FirefoxOptions()
+    firefox_options.page_load_strategy = settings["page_load_strategy"]
+    if headless:
+        firefox_options.add_argument("--headless")
+    firefox_options.add_argument("--no-sandbox")
+    firefox_options.add_argument("--disable-dev-shm-usage")
+    try:
+        width, height = [int(part) for part in window_size.split(",")]
+        firefox_options.add_argument(f"--width={width}")
+        firefox_options.add_argument(f"--height={height}")
+    except ValueError:
+        logger.warning(f"无法解析窗口大小: {window_size}")
+    for arg in settings["extra_args"]:
+        firefox_options.add_argument(arg)
+
+    if settings["user_agent"]:
+        firefox_options.set_preference("general.useragent.override", settings["user_agent"])
+    if not settings["enable_images"]:
+        firefox_options.set_preference("permissions.default.image", 2)
+    if not settings["enable_css"]:
+        firefox_options.set_preference("permissions.default.stylesheet", 2)
+    if not settings["enable_fonts"]:
+        firefox_options.set_preference("browser.display.use_document_fonts", 0)
+    if not settings["enable_javascript"]:
+        firefox_options.set_preference("javascript.enabled", False)
+    if not settings["enable_extensions"]:
+        firefox_options.set_preference("extensions.enabledScopes", 0)
+        firefox_options.set_preference("extensions.autoDisableScopes", 15)
+    return firefox_options
+
+
+def resource_blocking_installer(settings: Dict[str, Any]) -> Optional[Callable[[Any, str], None]]:
+    """
+    返回CDPHub安装回调，在每个标签页的连接上屏蔽样式表和字体请求
+    通过标签页工具打开的新标签页同样生效；不需要屏蔽时返回None
+    """
+    patterns = blocked_url_patterns(settings)
+    if not patterns:
+        return None
+
+    def install(conn, handle: str) -> None:
+        conn.send("Network.enable")
+        conn.send("Network.setBlockedURLs", {"urls": patterns})
+        logger.debug(f"标签页{handle}已屏蔽资源请求: {patterns}")
+
+    return install
+
+
+def apply_chrome_runtime_settings(driver, settings: Dict[str, Any]) -> None:
+    """无法建立CDP事件连接时的退化方式：通过ChromeDriver只对当前标签页屏蔽样式表和字体请求"""
+    patterns = blocked_url_patterns(settings)
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.debug(f"已屏蔽资源请求: {patterns}")
+    except Exception as e:
+        logger.warning(f"设置资源屏蔽失败: {e}")
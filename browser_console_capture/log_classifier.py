@@ -0,0 +1,153 @@
+"""控制台日志分类
+对消息做一次分类得到堆栈跟踪、错误类型、文件位置和console方法，
+文件位置使用预编译的正则，结果按消息文本缓存（页面反复输出相同消息时只分类一次）
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+
+# Chrome DevTools Console API 日志级别映射
+# 参考: https://developer.chrome.com/docs/devtools/console/api
+CONSOLE_LEVEL_MAPPING = {
+    'SEVERE': 'ERROR',     # console.error(), console.assert(false)
+    'WARNING': 'WARNING',  # console.warn()
+    'INFO': 'INFO',        # console.log(), console.info(), console.dir(), console.table()
+    'DEBUG': 'VERBOSE',    # console.debug()
+    'FINE': 'VERBOSE',     # 详细调试信息
+    'FINER': 'VERBOSE',    # 更详细的调试信息
+    'FINEST': 'VERBOSE'    # 最详细的调试信息
+}
+
+ERROR_LEVELS = frozenset(('ERROR', 'SEVERE'))
+
+# 堆栈帧中的文件和行号，只在消息包含" at "时使用
+FILE_PATTERN = re.compile(r'at\s+.*?\((.*?):(\d+):(\d+)\)')
+
+# 错误类型判断顺序（只在消息包含"Error:"时检查）
+ERROR_TYPE_ORDER = (
+    ('TypeError:', 'TypeError'),
+    ('ReferenceError:', 'ReferenceError'),
+    ('SyntaxError:', 'SyntaxError'),
+    ('NetworkError:', 'NetworkError'),
+)
+
+# console.error/console.warn之后的console方法判断顺序（只在消息包含"console."时检查）
+CONSOLE_METHOD_ORDER = (
+    'console.info', 'console.debug',
+    'console.table', 'console.trace', 'console.assert', 'console.log',
+)
+
+
+# 分类结果缓存的最大条目数，写满后整体清空
+CACHE_SIZE = 8192
+
+# (has_stack_trace, error_type, file_info, line_number, console_method)
+MessageTraits = Tuple[bool, str, Optional[str], Optional[int], str]
+
+_cache: Dict[str, MessageTraits] = {}
+
+
+def classify_message(message: str) -> MessageTraits:
+    """
+    对消息分类，结果按消息文本缓存
+
+    Returns:
+        tuple: (has_stack_trace, error_type, file_info, line_number, console_method)，
+               error_type仅在日志级别为错误时使用
+    """
+    traits = _cache.get(message)
+    if traits is None:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        traits = _cache[message] = _classify(message)
+    return traits
+
+
+def clear_cache() -> None:
+    _cache.clear()
+    _fingerprint_cache.clear()
+
+
+def _classify(message: str) -> MessageTraits:
+    """
+    每个标记只检查一次并在各字段间共享；
+    "Error:"、"console."、"at "不存在时跳过对应的整组检查
+    """
+    has_error = 'Error:' in message
+    has_console = 'console.' in message
+    has_at = 'at ' in message
+
+    error_type = None
+    if has_error:
+        for token, name in ERROR_TYPE_ORDER:
+            if token in message:
+                error_type = name
+                break
+    if error_type is None:
+        if '404' in message:
+            error_type = 'NetworkError'
+        elif has_console and 'console.assert' in message:
+            error_type = 'AssertionError'
+        else:
+            error_type = 'UnknownError'
+
+    file_info = None
+    line_number = None
+    if has_at and ' at ' in message:
+        file_match = FILE_PATTERN.search(message)
+        if file_match:
+            file_info = file_match.group(1)
+            line_number = int(file_match.group(2))
+
+    if has_error or (has_console and 'console.error' in message):
+        console_method = 'console.error'
+    elif 'Warning:' in message or (has_console and 'console.warn' in message):
+        console_method = 'console.warn'
+    else:
+        console_method = 'unknown'
+        if has_console:
+            for method in CONSOLE_METHOD_ORDER:
+                if method in message:
+                    console_method = method
+                    break
+
+    return has_at or has_error, error_type, file_info, line_number, console_method
+
+
+# 聚合近似重复消息时替换为占位符的可变部分：UUID、十六进制值、数字
+VARIABLE_PART_PATTERN = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+    r"|0x[0-9a-fA-F]+"
+    r"|\d+(?:\.\d+)?"
+)
+
+_fingerprint_cache: Dict[str, str] = {}
+
+
+def message_fingerprint(message: str) -> str:
+    """
+    消息指纹：可变部分（计数、ID、耗时、行列号等）替换为#，
+    "批量日志消息 #1"与"批量日志消息 #2"得到相同的指纹
+    """
+    fingerprint = _fingerprint_cache.get(message)
+    if fingerprint is None:
+        if len(_fingerprint_cache) >= CACHE_SIZE:
+            _fingerprint_cache.clear()
+        fingerprint = _fingerprint_cache[message] = VARIABLE_PART_PATTERN.sub("#", message)
+    return fingerprint
+
+
+def source_type_of(source: str) -> str:
+    """根据日志来源判断来源类型"""
+    if 'console-api' in source:
+        return 'console-api'  # console.log/error/warn等
+    if 'javascript' in source:
+        return 'javascript'   # JavaScript运行时错误
+    if 'network' in source:
+        return 'network'      # 网络请求错误
+    return 'other'
+
+
+def normalize_level(level: str) -> str:
+    """标准化日志级别"""
+    return CONSOLE_LEVEL_MAPPING.get(level, level)
@@ -0,0 +1,152 @@
+"""控制台日志响应格式
+- full: 每条日志一个完整字典（原有格式）
+- compact: 按列存放的数组，来源和URL使用字典编码，时间戳存为相对偏移
+- summary: 只有计数和出现次数最多的错误
+并按max_bytes预算统一截断过长的消息，仍然超出时丢弃最旧的日志
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RESPONSE_FORMATS = ("full", "compact", "summary")
+
+# 预算不足时消息至少保留的字符数，低于该长度改为丢弃最旧的日志
+MIN_MESSAGE_CHARS = 80
+
+# summary格式中返回的错误分组数量和消息长度
+TOP_ERRORS = 10
+SUMMARY_MESSAGE_CHARS = 200
+
+# ChromeDriver格式消息开头的"URL 行:列 "或"URL - "
+LOCATION_PREFIX_PATTERN = re.compile(r"^(\S+://\S+) (?:(\d+:\d+) |- )")
+
+
+def payload_size(payload: Any) -> int:
+    """响应序列化为JSON后的字节数"""
+    return len(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def truncate_message(message: str, max_chars: int) -> str:
+    """截断消息并标明省略的字符数"""
+    if len(message) <= max_chars:
+        return message
+    return f"{message[:max_chars]}…[+{len(message) - max_chars}]"
+
+
+def compact_logs(logs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    把完整格式的日志转换为列式结构
+
+    消息开头的URL移入urls表，按下标引用；来源同样使用sources表；
+    时间戳为相对base_timestamp的毫秒偏移
+    """
+    sources: Dict[str, int] = {}
+    urls: Dict[str, int] = {}
+    columns: Dict[str, list] = {name: [] for name in ("seq", "level", "t", "source", "url", "loc", "error_type", "message")}
+    aggregated = bool(logs) and "count" in logs[0]
+    if aggregated:
+        columns["count"] = []
+    with_stacks = bool(logs) and "stack_frames" in logs[0]
+    if with_stacks:
+        columns["stack_frames"] = []
+    base_timestamp = logs[0]["timestamp"] if logs else 0
+
+    for log in logs:
+        message = log["message"]
+        url_index = None
+        location = None
+        prefix = LOCATION_PREFIX_PATTERN.match(message)
+        if prefix:
+            url_index = urls.setdefault(prefix.group(1), len(urls))
+            location = prefix.group(2)
+            message = message[prefix.end():]
+        columns["seq"].append(log["seq"])
+        columns["level"].append(log["level"])
+        columns["t"].append(log["timestamp"] - base_timestamp)
+        columns["source"].append(sources.setdefault(log["source"], len(sources)))
+        columns["url"].append(url_index)
+        columns["loc"].append(location)
+        columns["error_type"].append(log["error_type"])
+        columns["message"].append(message)
+        if aggregated:
+            columns["count"].append(log["count"])
+        if with_stacks:
+            columns["stack_frames"].append(log["stack_frames"])
+
+    return {
+        "base_timestamp": base_timestamp,
+        "sources": list(sources),
+        "urls": list(urls),
+        "columns": columns,
+    }
+
+
+def fit_to_budget(logs: List[Dict[str, Any]],
+                  render: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+                  max_bytes: Optional[int]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    按字节预算生成响应
+
+    先把所有超过统一上限的消息截断到同一长度（上限取能放下的最大值），
+    上限降到MIN_MESSAGE_CHARS仍放不下时，从最旧的日志开始丢弃
+
+    Args:
+        logs: 完整格式的日志（包含message字段）
+        render: 由日志列表生成完整响应的函数
+        max_bytes: 响应的字节上限，None表示不限制
+
+    Returns:
+        tuple: (响应, 预算使用情况；未设置预算时为None)
+    """
+    payload = render(logs)
+    if not max_bytes:
+        return payload, None
+    size = payload_size(payload)
+    budget = {"max_bytes": max_bytes, "bytes": size, "message_max_chars": None,
+              "truncated_messages": 0, "omitted_logs": 0}
+    if size <= max_bytes or not logs:
+        return payload, budget
+
+    def with_limit(entries, max_chars):
+        return [
+            dict(entry, message=truncate_message(entry["message"], max_chars))
+            if len(entry["message"]) > max_chars else entry
+            for entry in entries
+        ]
+
+    def fits(entries):
+        return payload_size(render(entries)) <= max_bytes
+
+    longest = max(len(entry["message"]) for entry in logs)
+    low, high = min(MIN_MESSAGE_CHARS, longest), longest
+    kept = logs
+    if fits(with_limit(logs, low)):
+        # 二分查找能放下的最大统一长度
+        while low < high:
+            middle = (low + high + 1) // 2
+            if fits(with_limit(logs, middle)):
+                low = middle
+            else:
+                high = middle - 1
+        kept = with_limit(logs, low)
+    else:
+        # 消息已截断到最短，二分查找能保留的最新日志数量
+        truncated = with_limit(logs, low)
+        keep_low, keep_high = 0, len(truncated) - 1
+        while keep_low < keep_high:
+            middle = (keep_low + keep_high + 1) // 2
+            if fits(truncated[len(truncated) - middle:]):
+                keep_low = middle
+            else:
+                keep_high = middle - 1
+        kept = truncated[len(truncated) - keep_low:]
+
+    payload = render(kept)
+    budget.update({
+        "bytes": payload_size(payload),
+        "message_max_chars": low,
+        "truncated_messages": sum(1 for entry in logs[len(logs) - len(kept):] if len(entry["message"]) > low),
+        "omitted_logs": len(logs) - len(kept),
+    })
+    return payload, budget
@@ -0,0 +1,236 @@
+"""网络录制/回放缓存
+通过CDP Fetch域拦截页面请求：
+- record: 把响应写入本地磁盘缓存，按请求方法、URL和请求体生成键
+- replay: 命中缓存的请求直接由缓存响应，不访问网络
+同一拦截层还负责执行security.blocked_domains
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from cdp_client import CDPConnection, CDPError
+
+logger = logging.getLogger(__name__)
+
+NETWORK_MODES = ("off", "record", "replay")
+
+# 重定向响应没有响应体，无法通过Fetch.getResponseBody读取
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# Fetch.getResponseBody返回的是解压后的响应体，回放时不能保留这些头
+DROPPED_REPLAY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def is_blocked_host(url: str, blocked_domains: Iterable[str]) -> bool:
+    """判断URL的主机名是否属于被屏蔽的域名（含子域名）"""
+    host = (urlsplit(url).hostname or "").lower()
+    if not host:
+        return False
+    for domain in blocked_domains:
+        domain = domain.lower().lstrip(".")
+        if host == domain or host.endswith("." + domain):
+            return True
+    return False
+
+
+class NetworkCache:
+    """
+    磁盘响应缓存，每条响应一个JSON文件
+
+    Args:
+        cache_dir: 缓存目录
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(method: str, url: str, post_data: Optional[str] = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(method.upper().encode("utf-8"))
+        digest.update(b"\n")
+        digest.update(url.encode("utf-8"))
+        if post_data:
+            digest.update(b"\n")
+            digest.update(post_data.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取网络缓存失败 {key}: {e}")
+            return None
+
+    def save(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, Any]:
+        count = 0
+        size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    count += 1
+                    size += os.path.getsize(os.path.join(root, name))
+        return {"cache_dir": self.cache_dir, "entries": count, "bytes": size}
+
+
+class NetworkInterceptor:
+    """
+    挂载在会话CDP连接上的请求拦截器
+
+    Args:
+        blocked_domains: 需要屏蔽的域名
+        cache: 录制/回放使用的磁盘缓存
+    """
+
+    def __init__(self, blocked_domains: Iterable[str], cache: NetworkCache):
+        self.blocked_domains = [domain for domain in blocked_domains if domain]
+        self.cache = cache
+        self.mode = "off"
+        self.strict = False
+        self._connections: Dict[str, CDPConnection] = {}
+        self._lock = threading.Lock()
+        self.counters = {"blocked": 0, "recorded": 0, "replayed": 0, "replay_misses": 0}
+
+    # ------------------------------------------------------------------
+    # 配置
+    # ------------------------------------------------------------------
+    def _patterns(self):
+        if self.mode == "record":
+            return [{"urlPattern": "*", "requestStage": "Request"},
+                    {"urlPattern": "*", "requestStage": "Response"}]
+        if self.mode == "replay" or self.blocked_domains:
+            return [{"urlPattern": "*", "requestStage": "Request"}]
+        return []
+
+    def _apply(self, conn: CDPConnection) -> None:
+        patterns = self._patterns()
+        if patterns:
+            conn.send("Fetch.enable", {"patterns": patterns})
+        else:
+            conn.send("Fetch.disable")
+
+    def install(self, conn: CDPConnection, handle: str) -> None:
+        """CDPHub安装回调：订阅Fetch.requestPaused并按当前模式启用拦截"""
+        conn.on("Fetch.requestPaused", lambda params: self._on_request_paused(conn, params))
+        with self._lock:
+            self._connections[handle] = conn
+        self._apply(conn)
+
+    def set_mode(self, mode: str, cache: Optional[NetworkCache] = None, strict: bool = False) -> None:
+        if mode not in NETWORK_MODES:
+            raise ValueError(f"Unsupported network mode: {mode}. Use one of {list(NETWORK_MODES)}")
+        self.mode = mode
+        self.strict = strict
+        if cache is not None:
+            self.cache = cache
+        with self._lock:
+            connections = [conn for conn in self._connections.values() if not conn.closed.is_set()]
+        for conn in connections:
+            self._apply(conn)
+        logger.info(f"网络模式已切换为{mode}，缓存目录: {self.cache.cache_dir}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "strict": self.strict,
+            "blocked_domains": self.blocked_domains,
+            "cache_dir": self.cache.cache_dir,
+            **self.counters,
+        }
+
+    # ------------------------------------------------------------------
+    # 拦截
+    # ------------------------------------------------------------------
+    def _on_request_paused(self, conn: CDPConnection, params: Dict[str, Any]) -> None:
+        request_id = params["requestId"]
+        request = params.get("request", {})
+        try:
+            if "responseStatusCode" in params or "responseErrorReason" in params:
+                self._handle_response(conn, params)
+            else:
+                self._handle_request(conn, request_id, request)
+        except Exception as e:
+            # 任何异常都要放行请求，否则请求一直暂停在Fetch域，页面卡住
+            if isinstance(e, CDPError):
+                logger.debug(f"处理拦截请求失败 {request.get('url')}: {e}")
+            else:
+                logger.warning(f"处理拦截请求出错，直接放行 {request.get('url')}: {e}")
+            try:
+                conn.send("Fetch.continueRequest", {"requestId": request_id})
+            except Exception:
+                pass
+
+    def _handle_request(self, conn: CDPConnection, request_id: str, request: Dict[str, Any]) -> None:
+        url = request.get("url", "")
+        if self.blocked_domains and is_blocked_host(url, self.blocked_domains):
+            self.counters["blocked"] += 1
+            logger.info(f"已屏蔽请求: {url}")
+            conn.send("Fetch.failRequest", {"requestId": request_id, "errorReason": "BlockedByClient"})
+            return
+
+        if self.mode == "replay" and not url.startswith("data:"):
+            key = NetworkCache.key(request.get("method", "GET"), url, request.get("postData"))
+            entry = self.cache.load(key)
+            if entry is not None:
+                self.counters["replayed"] += 1
+                conn.send("Fetch.fulfillRequest", {
+                    "requestId": request_id,
+                    "responseCode": entry["status"],
+                    "responseHeaders": entry["headers"],
+                    "body": entry["body"],
+                })
+                return
+            self.counters["replay_misses"] += 1
+            if self.strict:
+                logger.debug(f"回放缓存未命中，严格模式拒绝请求: {url}")
+                conn.send("Fetch.failRequest", {"requestId": request_id, "errorReason": "InternetDisconnected"})
+                return
+
+        conn.send("Fetch.continueRequest", {"requestId": request_id})
+
+    def _handle_response(self, conn: CDPConnection, params: Dict[str, Any]) -> None:
+        request_id = params["requestId"]
+        request = params.get("request", {})
+        status = params.get("responseStatusCode")
+        if self.mode == "record" and status and status not in REDIRECT_STATUSES:
+            body = conn.send("Fetch.getResponseBody", {"requestId": request_id})
+            encoded = body.get("body", "")
+            if not body.get("base64Encoded"):
+                encoded = base64.b64encode(encoded.encode("utf-8")).decode("ascii")
+            url = request.get("url", "")
+            key = NetworkCache.key(request.get("method", "GET"), url, request.get("postData"))
+            self.cache.save(key, {
+                "url": url,
+                "method": request.get("method", "GET"),
+                "status": status,
+                "headers": [
+                    header for header in params.get("responseHeaders", [])
+                    if header.get("name", "").lower() not in DROPPED_REPLAY_HEADERS
+                ],
+                "body": encoded,
+                "resource_type": params.get("resourceType"),
+                "recorded_at": time.time(),
+            })
+            self.counters["recorded"] += 1
+        conn.send("Fetch.continueRequest", {"requestId": request_id})
@@ -0,0 +1,227 @@
+"""页面加载完成策略
+navigate_to_url的等待方式：
+- load / domcontentloaded: 在页面内用一次异步脚本等待readystatechange事件，不再每0.5秒轮询readyState，
+  超时由页面内的setTimeout判定；page_load_strategy为none时旧文档上的脚本一直等到文档被卸载，再在新文档上重新执行
+- networkidle: Chrome会话通过CDP网络事件统计进行中的请求，连续idle_ms没有请求时完成；
+  其他浏览器退化为观察资源计时条目数量是否稳定
+- selector: 在页面内用MutationObserver等待元素出现
+- none: 不等待
+配合启动选项page_load_strategy（eager/none），driver.get不必等到load事件就能返回
+
+click_element点击后的稳定条件（SETTLE_MODES）复用同一组等待脚本，另加DOM静止：
+在页面内用MutationObserver观察，连续quiet毫秒没有变化即完成
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from cdp_client import CDPConnection
+
+logger = logging.getLogger(__name__)
+
+WAIT_MODES = ("load", "domcontentloaded", "networkidle", "selector", "none")
+SETTLE_MODES = ("dom", "navigation", "networkidle", "selector", "sleep", "none")
+
+# 标记导航前的文档，page_load_strategy为none时driver.get可能在新文档提交前返回
+STALE_DOCUMENT_MARKER_SCRIPT = "window.__mcpStaleDocument = true;"
+CLEAR_STALE_DOCUMENT_SCRIPT = "delete window.__mcpStaleDocument;"
+
+# 所有等待脚本的最后一个参数（回调之前）是剩余的等待毫秒数，由页面内的setTimeout结束等待。
+# 旧文档上不做判断，只等待它被卸载（脚本随之以document unloaded错误结束）或超时
+
+# 等待document.readyState达到指定状态（interactive或complete），超时返回false
+READY_STATE_SCRIPT = """
+var target = arguments[0], timeout = arguments[arguments.length - 2], done = arguments[arguments.length - 1];
+if (window.__mcpStaleDocument) { setTimeout(function () { done(false); }, timeout); return; }
+var order = {loading: 0, interactive: 1, complete: 2}, timer;
+function check() {
+  if (order[document.readyState] >= order[target]) {
+    document.removeEventListener('readystatechange', check);
+    clearTimeout(timer);
+    done(document.readyState);
+    return true;
+  }
+  return false;
+}
+if (!check()) {
+  document.addEventListener('readystatechange', check);
+  timer = setTimeout(function () { document.removeEventListener('readystatechange', check); done(false); }, timeout);
+}
+"""
+
+# 等待选择器匹配的元素出现，超时返回false
+SELECTOR_SCRIPT = """
+var selector = arguments[0], timeout = arguments[arguments.length - 2], done = arguments[arguments.length - 1];
+if (window.__mcpStaleDocument) { setTimeout(function () { done(false); }, timeout); return; }
+if (document.querySelector(selector)) { done(true); return; }
+var observer = new MutationObserver(function () {
+  if (document.querySelector(selector)) { observer.disconnect(); clearTimeout(timer); done(true); }
+});
+observer.observe(document, {childList: true, subtree: true, attributes: true});
+var timer = setTimeout(function () { observer.disconnect(); done(false); }, timeout);
+"""
+
+# 没有CDP时的网络空闲判断：资源计时条目数量在idle毫秒内不再变化
+RESOURCE_IDLE_SCRIPT = """
+var idle = arguments[0], timeout = arguments[arguments.length - 2], done = arguments[arguments.length - 1];
+if (window.__mcpStaleDocument) { setTimeout(function () { done(false); }, timeout); return; }
+var started = Date.now(), count = -1, since = Date.now();
+(function poll() {
+  var current = performance.getEntriesByType('resource').length;
+  if (current !== count || document.readyState !== 'complete') { count = current; since = Date.now(); }
+  if (Date.now() - since >= idle) { done(true); return; }
+  if (Date.now() - started >= timeout) { done(false); return; }
+  setTimeout(poll, 50);
+})();
+"""
+
+# DOM静止：连续quiet毫秒没有DOM变化返回true，timeout毫秒后返回false
+DOM_QUIET_SCRIPT = """
+var quiet = arguments[0], timeout = arguments[arguments.length - 2], done = arguments[arguments.length - 1];
+var started = Date.now(), last = started;
+var observer = new MutationObserver(function () { last = Date.now(); });
+observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+(function check() {
+  var now = Date.now();
+  if (now - last >= quiet || now - started >= timeout) { observer.disconnect(); done(now - last >= quiet); return; }
+  setTimeout(check, Math.max(10, Math.min(quiet - (now - last), timeout - (now - started))));
+})();
+"""
+
+# 脚本超时比页面内计时多出的余量（秒），只在页面主线程被阻塞、setTimeout无法按时触发时起作用
+SCRIPT_TIMEOUT_MARGIN = 1
+
+
+class NetworkActivity:
+    """
+    按标签页统计进行中的网络请求（CDP Network事件）
+
+    Network域只在第一次需要等待网络空闲时才对该标签页启用，
+    不需要时不会产生额外的事件流量
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, Set[str]] = {}
+        self._last_change: Dict[str, float] = {}
+        self._enabled: Set[str] = set()
+        self._condition = threading.Condition()
+
+    def install(self, conn: CDPConnection, handle: str) -> None:
+        """CDPHub安装回调：只订阅事件，Network域由ensure_enabled按需启用"""
+        conn.on("Network.requestWillBeSent", lambda params: self._started(handle, params))
+        conn.on("Network.loadingFinished", lambda params: self._finished(handle, params))
+        conn.on("Network.loadingFailed", lambda params: self._finished(handle, params))
+        with self._condition:
+            self._enabled.discard(handle)
+            self._inflight[handle] = set()
+
+    def ensure_enabled(self, conn: CDPConnection, handle: str) -> None:
+        with self._condition:
+            if handle in self._enabled:
+                return
+        conn.send("Network.enable")
+        with self._condition:
+            self._enabled.add(handle)
+            self._last_change[handle] = time.monotonic()
+        logger.debug(f"已启用网络活动跟踪: {handle}")
+
+    def _started(self, handle: str, params: Dict[str, Any]) -> None:
+        with self._condition:
+            self._inflight.setdefault(handle, set()).add(params.get("requestId"))
+            self._last_change[handle] = time.monotonic()
+            self._condition.notify_all()
+
+    def _finished(self, handle: str, params: Dict[str, Any]) -> None:
+        with self._condition:
+            self._inflight.setdefault(handle, set()).discard(params.get("requestId"))
+            self._last_change[handle] = time.monotonic()
+            self._condition.notify_all()
+
+    def inflight(self, handle: str) -> int:
+        with self._condition:
+            return len(self._inflight.get(handle, ()))
+
+    def wait_idle(self, handle: str, idle_ms: int, timeout: float, started_at: Optional[float] = None) -> None:
+        """
+        等待连续idle_ms毫秒没有进行中的请求
+
+        Args:
+            started_at: 空闲计时的最早起点（time.monotonic()），通常为导航开始的时间
+
+        Raises:
+            TimeoutException: 超时仍未空闲
+        """
+        idle = idle_ms / 1000
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                quiet_since = max(self._last_change.get(handle, 0), started_at or 0)
+                if not self._inflight.get(handle) and now - quiet_since >= idle:
+                    return
+                if now >= deadline:
+                    raise TimeoutException(
+                        f"Network not idle after {timeout}s ({len(self._inflight.get(handle, ()))} requests in flight)")
+                wake = deadline if self._inflight.get(handle) else min(deadline, quiet_since + idle)
+                self._condition.wait(max(0.0, wake - now))
+
+    def forget(self, handle: str) -> None:
+        with self._condition:
+            self._inflight.pop(handle, None)
+            self._last_change.pop(handle, None)
+            self._enabled.discard(handle)
+
+
+def _run_async(driver, script: str, timeout: float, *args, follow_navigation: bool = True):
+    """
+    执行异步等待脚本，剩余毫秒数作为最后一个参数传入，由页面内计时结束等待
+
+    Args:
+        follow_navigation: 等待期间文档被卸载（发生了导航）时，在新文档上用剩余时间重新执行；
+            为False时把卸载错误抛给调用方
+
+    Returns:
+        脚本结果；页面内计时到期时为False
+    """
+    deadline = time.monotonic() + timeout
+    driver.set_script_timeout(max(timeout, 0) + SCRIPT_TIMEOUT_MARGIN)
+    while True:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            return False
+        try:
+            return driver.execute_async_script(script, *args, remaining_ms)
+        except TimeoutException:
+            raise
+        except WebDriverException as e:
+            if not follow_navigation or "unloaded" not in str(e).lower():
+                raise
+            logger.debug("等待期间文档被卸载，在新文档上继续等待")
+
+
+def wait_ready_state(driver, target: str, timeout: float) -> str:
+    """等待document.readyState达到interactive或complete"""
+    result = _run_async(driver, READY_STATE_SCRIPT, timeout, target)
+    if not result:
+        raise TimeoutException(f"Page did not reach readyState {target} within {timeout}s")
+    return result
+
+
+def wait_selector(driver, selector: str, timeout: float) -> None:
+    if not _run_async(driver, SELECTOR_SCRIPT, timeout, selector):
+        raise TimeoutException(f"Selector {selector} did not appear within {timeout}s")
+
+
+def wait_resources_idle(driver, idle_ms: int, timeout: float) -> None:
+    if not _run_async(driver, RESOURCE_IDLE_SCRIPT, timeout, idle_ms):
+        raise TimeoutException(f"Network not idle after {timeout}s")
+
+
+def wait_dom_quiet(driver, quiet_ms: int, timeout: float) -> None:
+    """点击引起跳转时旧文档被卸载，WebDriverException交给调用方处理"""
+    if not _run_async(driver, DOM_QUIET_SCRIPT, timeout, quiet_ms, follow_navigation=False):
+        raise TimeoutException(f"DOM still changing after {timeout}s")
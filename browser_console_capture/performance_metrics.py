@@ -0,0 +1,244 @@
+"""页面性能指标采集
+在任何页面脚本执行之前（Page.addScriptToEvaluateOnNewDocument）注入PerformanceObserver，
+在页面内缓冲Navigation Timing L2、资源计时、长任务、LCP、CLS和INP；
+读取时只执行一次脚本取回缓冲区，并在Python端汇总，控制台日志读取不再承担这部分开销
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from cdp_client import CDPConnection
+
+logger = logging.getLogger(__name__)
+
+# 页面内缓冲的上限，长时间运行的页面内存占用保持有界
+MAX_RESOURCES = 500
+MAX_LONG_TASKS = 200
+MAX_INTERACTIONS = 500
+
+# 长任务中超过该时长的部分计入总阻塞时间
+LONG_TASK_BLOCKING_MS = 50
+
+OBSERVER_SCRIPT = """
+(function () {
+  if (window.__mcpPerf) return;
+  var perf = window.__mcpPerf = {
+    navigation: null, paint: {}, resources: [], resourcesDropped: 0, longTasks: [],
+    lcp: null, cls: 0, layoutShifts: 0, interactions: {}, interactionCount: 0,
+    observed: [], installedAt: performance.now()
+  };
+  var clsWindow = 0, clsWindowStart = 0, clsLast = 0;
+  function observe(type, callback, options) {
+    try {
+      var supported = PerformanceObserver.supportedEntryTypes;
+      if (supported && supported.indexOf(type) < 0) return;
+      new PerformanceObserver(function (list) { list.getEntries().forEach(callback); })
+        .observe(Object.assign({type: type, buffered: true}, options || {}));
+      perf.observed.push(type);
+    } catch (e) {}
+  }
+  observe('navigation', function (e) { perf.navigation = e.toJSON(); });
+  observe('paint', function (e) { perf.paint[e.name] = e.startTime; });
+  observe('resource', function (e) {
+    if (perf.resources.length >= %(max_resources)d) { perf.resourcesDropped++; return; }
+    perf.resources.push({
+      name: e.name, type: e.initiatorType, start: e.startTime, duration: e.duration,
+      transferSize: e.transferSize, encodedBodySize: e.encodedBodySize,
+      protocol: e.nextHopProtocol, status: e.responseStatus
+    });
+  });
+  observe('longtask', function (e) {
+    if (perf.longTasks.length < %(max_long_tasks)d) perf.longTasks.push({start: e.startTime, duration: e.duration});
+  });
+  observe('largest-contentful-paint', function (e) {
+    var el = e.element;
+    perf.lcp = {
+      time: e.startTime, size: e.size, url: e.url || null,
+      element: el ? el.tagName.toLowerCase() + (el.id ? '#' + el.id : '') : null
+    };
+  });
+  observe('layout-shift', function (e) {
+    if (e.hadRecentInput) return;
+    if (clsWindow && e.startTime - clsLast < 1000 && e.startTime - clsWindowStart < 5000) {
+      clsWindow += e.value;
+    } else {
+      clsWindow = e.value;
+      clsWindowStart = e.startTime;
+    }
+    clsLast = e.startTime;
+    perf.cls = Math.max(perf.cls, clsWindow);
+    perf.layoutShifts++;
+  });
+  observe('event', function (e) {
+    if (!e.interactionId) return;
+    var previous = perf.interactions[e.interactionId];
+    if (!previous) {
+      if (perf.interactionCount >= %(max_interactions)d) return;
+      perf.interactionCount++;
+    }
+    if (!previous || e.duration > previous.duration) {
+      perf.interactions[e.interactionId] = {name: e.name, start: e.startTime, duration: e.duration};
+    }
+  }, {durationThreshold: 16});
+})();
+""" % {"max_resources": MAX_RESOURCES, "max_long_tasks": MAX_LONG_TASKS, "max_interactions": MAX_INTERACTIONS}
+
+COLLECT_SCRIPT = """
+var perf = window.__mcpPerf;
+if (!perf) return null;
+var snapshot = JSON.parse(JSON.stringify(perf));
+snapshot.url = location.href;
+snapshot.now = performance.now();
+if (arguments[0]) {
+  perf.resources = [];
+  perf.resourcesDropped = 0;
+  perf.longTasks = [];
+}
+return snapshot;
+"""
+
+
+def install(conn: CDPConnection, handle: str) -> None:
+    """CDPHub安装回调：之后加载的每个文档在页面脚本之前注入观察器，当前文档立即注入"""
+    try:
+        conn.send("Page.addScriptToEvaluateOnNewDocument", {"source": OBSERVER_SCRIPT})
+        conn.send("Runtime.evaluate", {"expression": OBSERVER_SCRIPT})
+        logger.debug(f"已注入性能观察器: {handle}")
+    except Exception as e:
+        # 注入失败不影响同一连接上的其他功能，读取时会现场注入
+        logger.warning(f"注入性能观察器失败: {handle}: {e}")
+
+
+def collect(driver, clear: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    读取页面内缓冲的性能数据；页面中没有观察器时（未连接CDP的会话或自行打开的标签页）现场注入，
+    buffered观察器可以补回导航、绘制、资源、LCP和布局偏移，长任务和交互只从注入时开始记录
+
+    Returns:
+        dict: 原始快照，late_injection表示观察器是在页面加载后注入的
+    """
+    raw = driver.execute_script(COLLECT_SCRIPT, clear)
+    if raw is not None:
+        raw["late_injection"] = False
+        return raw
+    driver.execute_script(OBSERVER_SCRIPT)
+    raw = driver.execute_script(COLLECT_SCRIPT, clear)
+    if raw is not None:
+        raw["late_injection"] = True
+    return raw
+
+
+def _ms(value) -> Optional[float]:
+    return round(value, 1) if isinstance(value, (int, float)) else None
+
+
+def _span(navigation: Dict[str, Any], start: str, end: str) -> Optional[float]:
+    begin = navigation.get(start) or 0
+    finish = navigation.get(end) or 0
+    # 未发生的阶段（如无重定向、HTTP连接没有TLS）时间戳为0
+    if finish <= 0 or (start != "startTime" and begin <= 0):
+        return None
+    return _ms(finish - begin)
+
+
+def _navigation_summary(navigation: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Navigation Timing L2条目的各阶段耗时（毫秒，相对导航开始）"""
+    if not navigation:
+        return None
+    return {
+        "type": navigation.get("type"),
+        "redirect_count": navigation.get("redirectCount"),
+        "redirect_ms": _span(navigation, "redirectStart", "redirectEnd"),
+        "dns_ms": _span(navigation, "domainLookupStart", "domainLookupEnd"),
+        "connect_ms": _span(navigation, "connectStart", "connectEnd"),
+        "tls_ms": _span(navigation, "secureConnectionStart", "connectEnd"),
+        "ttfb_ms": _span(navigation, "startTime", "responseStart"),
+        "response_ms": _span(navigation, "responseStart", "responseEnd"),
+        "dom_interactive_ms": _span(navigation, "startTime", "domInteractive"),
+        "dom_content_loaded_ms": _span(navigation, "startTime", "domContentLoadedEventEnd"),
+        "load_ms": _span(navigation, "startTime", "loadEventEnd"),
+        "transfer_size": navigation.get("transferSize"),
+        "protocol": navigation.get("nextHopProtocol"),
+    }
+
+
+def interaction_to_next_paint(durations: List[float]) -> Optional[float]:
+    """INP：每50次交互忽略一次最慢的交互后取最大值（交互少于50次时即最慢的交互）"""
+    if not durations:
+        return None
+    ordered = sorted(durations, reverse=True)
+    return _ms(ordered[min(len(ordered) - 1, len(ordered) // 50)])
+
+
+def summarize(raw: Dict[str, Any], include_resources: bool = False, resource_limit: int = 50) -> Dict[str, Any]:
+    """
+    汇总页面快照
+
+    Args:
+        raw: collect返回的快照
+        include_resources: 是否返回资源列表（按耗时从长到短）
+        resource_limit: 返回的资源条数上限
+    """
+    paint = raw.get("paint") or {}
+    fcp = paint.get("first-contentful-paint")
+    long_tasks = raw.get("longTasks") or []
+    blocking = sum(max(0, task["duration"] - LONG_TASK_BLOCKING_MS)
+                   for task in long_tasks if fcp is None or task["start"] >= fcp)
+    lcp = raw.get("lcp")
+    resources = raw.get("resources") or []
+    by_type: Dict[str, Dict[str, int]] = {}
+    for resource in resources:
+        stats = by_type.setdefault(resource.get("type") or "other", {"count": 0, "transfer_bytes": 0})
+        stats["count"] += 1
+        stats["transfer_bytes"] += resource.get("transferSize") or 0
+    slowest = sorted(resources, key=lambda resource: resource.get("duration") or 0, reverse=True)
+
+    summary = {
+        "url": raw.get("url"),
+        "late_injection": raw.get("late_injection", False),
+        "observed_entry_types": raw.get("observed", []),
+        "navigation": _navigation_summary(raw.get("navigation")),
+        "vitals": {
+            "first_paint_ms": _ms(paint.get("first-paint")),
+            "first_contentful_paint_ms": _ms(fcp),
+            "largest_contentful_paint_ms": _ms(lcp["time"]) if lcp else None,
+            "lcp_element": lcp.get("element") if lcp else None,
+            "lcp_url": lcp.get("url") if lcp else None,
+            "cumulative_layout_shift": round(raw.get("cls") or 0, 4),
+            "interaction_to_next_paint_ms": interaction_to_next_paint(
+                [interaction["duration"] for interaction in (raw.get("interactions") or {}).values()]),
+            "total_blocking_time_ms": _ms(blocking),
+        },
+        "long_tasks": {
+            "count": len(long_tasks),
+            "total_ms": _ms(sum(task["duration"] for task in long_tasks)),
+            "max_ms": _ms(max((task["duration"] for task in long_tasks), default=0)),
+        },
+        "interactions": raw.get("interactionCount", 0),
+        "layout_shifts": raw.get("layoutShifts", 0),
+        "resources": {
+            "count": len(resources),
+            "dropped": raw.get("resourcesDropped", 0),
+            "transfer_bytes": sum(stats["transfer_bytes"] for stats in by_type.values()),
+            "by_type": by_type,
+            "slowest": [
+                {"name": resource["name"], "type": resource.get("type"), "duration_ms": _ms(resource.get("duration"))}
+                for resource in slowest[:5]
+            ],
+        },
+    }
+    if include_resources:
+        summary["resources"]["entries"] = [
+            {
+                "name": resource["name"],
+                "type": resource.get("type"),
+                "start_ms": _ms(resource.get("start")),
+                "duration_ms": _ms(resource.get("duration")),
+                "transfer_size": resource.get("transferSize"),
+                "encoded_body_size": resource.get("encodedBodySize"),
+                "protocol": resource.get("protocol"),
+                "status": resource.get("status"),
+            }
+            for resource in slowest[:resource_limit]
+        ]
+    return summary
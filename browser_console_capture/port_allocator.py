@@ -0,0 +1,78 @@
+"""Chrome远程调试端口分配器
+为每个浏览器进程分配独立的--remote-debugging-port，进程关闭时回收端口，
+使同一台主机上可以并行运行多个Chrome会话
+"""
+
+import logging
+import socket
+import threading
+from typing import Set
+
+logger = logging.getLogger(__name__)
+
+
+class PortAllocator:
+    """
+    在[start, end]范围内分配空闲端口
+
+    已分配的端口在释放前不会再次分配；分配时还会尝试绑定端口，
+    跳过被其他进程占用的端口。
+
+    Args:
+        start: 端口范围起点（含）
+        end: 端口范围终点（含）
+        host: 检测端口占用时绑定的地址
+    """
+
+    def __init__(self, start: int = 9222, end: int = 9322, host: str = "127.0.0.1"):
+        if start > end:
+            raise ValueError(f"端口范围无效: {start}-{end}")
+        self.start = start
+        self.end = end
+        self.host = host
+        self._allocated: Set[int] = set()
+        self._next = start
+        self._lock = threading.Lock()
+
+    def _is_free(self, port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            try:
+                sock.bind((self.host, port))
+            except OSError:
+                return False
+        return True
+
+    def allocate(self) -> int:
+        """
+        分配一个空闲端口
+
+        Returns:
+            int: 端口号
+
+        Raises:
+            RuntimeError: 范围内没有可用端口
+        """
+        with self._lock:
+            size = self.end - self.start + 1
+            for offset in range(size):
+                port = self.start + (self._next - self.start + offset) % size
+                if port in self._allocated or not self._is_free(port):
+                    continue
+                self._allocated.add(port)
+                # 轮转起点，避免刚释放的端口立即被复用（旧进程可能尚未完全退出）
+                self._next = port + 1 if port < self.end else self.start
+                logger.debug(f"分配调试端口: {port}")
+                return port
+        raise RuntimeError(f"调试端口范围{self.start}-{self.end}内没有可用端口")
+
+    def release(self, port: int) -> None:
+        """回收端口"""
+        with self._lock:
+            if port in self._allocated:
+                self._allocated.discard(port)
+                logger.debug(f"回收调试端口: {port}")
+
+    def in_use(self) -> Set[int]:
+        """返回当前已分配的端口"""
+        with self._lock:
+            return set(self._allocated)
@@ -4,23 +4,62 @@
 支持test-token-eric特殊认证，默认以eric用户身份访问并自带授权
 """
 
+import atexit
 import base64
 import time
 import logging
 import os
 import json
+import functools
+import inspect
+import threading
+import uuid
 import requests
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from mcp.server.fastmcp import FastMCP
+from browser_launcher import LaunchBackend, LauncherDiscovery
+from browser_pool import BrowserPool
+from cdp_client import CDPHub
+from console_capture import ConsoleCapture
+from console_store import ConsoleStore
+from element_cache import WAIT_CONDITIONS, ElementCache, wait_for, with_element
+from form_fill import FILL_SCRIPT, FILLED, native_keys_text, split_results
+from log_classifier import ERROR_LEVELS, classify_message, normalize_level, source_type_of
+from log_formats import RESPONSE_FORMATS, SUMMARY_MESSAGE_CHARS, TOP_ERRORS, compact_logs, fit_to_budget, truncate_message
+import performance_metrics
+from js_helpers import JSHelperError, JSHelperRegistry
+from page_load import (
+    CLEAR_STALE_DOCUMENT_SCRIPT,
+    SETTLE_MODES,
+    STALE_DOCUMENT_MARKER_SCRIPT,
+    WAIT_MODES,
+    NetworkActivity,
+    wait_dom_quiet,
+    wait_ready_state,
+    wait_resources_idle,
+    wait_selector,
+)
+from network_cache import NETWORK_MODES, NetworkCache, NetworkInterceptor, is_blocked_host
+from session_reset import origin_of, reset_browser_state
+from source_maps import SourceMapResolver
+from stack_frames import entry_frames, resolve_frames
+from launch_options import (
+    apply_chrome_runtime_settings,
+    build_chrome_options,
+    build_firefox_options,
+    normalize_overrides,
+    resource_blocking_installer,
+    resolve_launch_settings,
+)
+from port_allocator import PortAllocator
+from session_executor import SessionExecutor
 from auth_utils import (
     browser_mcp_auth_required, 
     get_browser_mcp_auth_headers, 
@@ -59,42 +98,129 @@ logger.info("FastMCP服务器初始化完成")
 # Global state to store browser instances
 state = {
     "drivers": {},
+    "sessions": {},
     "current_session": None
 }
 logger.info("状态字典初始化完成")
 
 
-def get_driver():
-    """Get the current active driver"""
-    logger.debug(f"获取驱动器，当前会话: {state['current_session']}")
+def resolve_session(session_id: str = None):
+    """
+    Resolve a session id to (session_id, driver).
+    Without session_id the current session (or the first available one) is used.
+    """
+    logger.debug(f"获取驱动器，指定会话: {session_id}，当前会话: {state['current_session']}")
     logger.debug(f"可用驱动器: {list(state['drivers'].keys())}")
     
+    if session_id:
+        driver = state["drivers"].get(session_id)
+        if driver is None:
+            logger.error(f"浏览器会话不存在: {session_id}")
+            raise Exception(f"Browser session not found: {session_id}")
+        return session_id, driver
+    
     if not state["drivers"]:
         logger.error("没有活动的浏览器会话")
         raise Exception("No browser session active. Please start a browser first.")
     
     # Return the current session driver or the first available driver
-    if state["current_session"] and state["current_session"] in state["drivers"]:
-        driver = state["drivers"][state["current_session"]]
+    current = state["current_session"]
+    driver = state["drivers"].get(current) if current else None
+    if driver:
         logger.debug(f"成功获取当前会话驱动器: {type(driver)}")
-        return driver
+        return current, driver
     
     # Return the first available driver
-    for session_id, driver in state["drivers"].items():
+    for candidate, driver in list(state["drivers"].items()):
         if driver:
-            state["current_session"] = session_id
+            state["current_session"] = candidate
             logger.debug(f"成功获取第一个可用驱动器: {type(driver)}")
-            return driver
+            return candidate, driver
     
     logger.error("没有找到活动的浏览器会话")
     raise Exception("No active browser session found.")
 
 
+def get_driver(session_id: str = None):
+    """Get the driver of the given session, or the current active driver"""
+    return resolve_session(session_id)[1]
+
+
+def resolve_tab(driver, tab: str) -> str:
+    """把标签页参数（窗口句柄或list_tabs中的序号）解析为窗口句柄"""
+    handles = driver.window_handles
+    if tab in handles:
+        return tab
+    if str(tab).isdigit() and int(tab) < len(handles):
+        return handles[int(tab)]
+    raise Exception(f"Tab not found: {tab}")
+
+
+@contextmanager
+def session_scope(session_id: str = None, tab: str = None):
+    """
+    解析会话并持有该会话的锁
+    不同会话的操作并行执行，同一会话内的操作串行执行
+    指定tab时临时切换到该标签页，结束后切回原标签页
+    """
+    session_id, driver = resolve_session(session_id)
+    session = state["sessions"].get(session_id)
+    if session is None:
+        raise Exception(f"Browser session not found: {session_id}")
+    with session["lock"]:
+        # 等待锁期间会话可能已被关闭
+        if state["drivers"].get(session_id) is not driver:
+            raise Exception(f"Browser session closed: {session_id}")
+        if tab is None:
+            yield session_id, driver
+            return
+        previous = driver.current_window_handle
+        target = resolve_tab(driver, tab)
+        if target != previous:
+            driver.switch_to.window(target)
+        try:
+            yield session_id, driver
+        finally:
+            if target != previous and previous in driver.window_handles:
+                driver.switch_to.window(previous)
+
+
+session_executor = SessionExecutor(config.get('performance', {}).get('executor_workers', 8))
+atexit.register(session_executor.shutdown)
+
+
+def offload(per_session: bool = True, read_only: Callable[[Dict[str, Any]], bool] = None):
+    """
+    把同步工具函数包装为异步工具，WebDriver调用在线程池中执行，不阻塞MCP事件循环
+    per_session为True时按session_id（未指定时为当前会话）排队，同一会话的调用依次执行
+    read_only(kwargs)为True的调用不发送WebDriver命令，不进入会话通道，
+    不会排在同一会话的长时间页面加载之后（需要WebDriver的调用仍然排队：
+    ChromeDriver本身对同一会话的命令串行执行，并会等待进行中的导航）
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            lane = None
+            if per_session and not (read_only is not None and read_only(kwargs)):
+                lane = kwargs.get('session_id') or state["current_session"]
+            return await session_executor.run(lane, func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def buffered_scope(session_id: str = None):
+    """不持有会话锁、不调用WebDriver的只读访问，只用于读取事件推送的缓冲区"""
+    session_id, driver = resolve_session(session_id)
+    if session_id not in state["sessions"]:
+        raise Exception(f"Browser session not found: {session_id}")
+    yield session_id, driver
+
+
 def generate_session_id(browser: str) -> str:
-    """生成会话ID"""
-    import time
+    """生成会话ID，同一秒内启动的会话也不会重复"""
     timestamp = int(time.time())
-    return f"{browser}_{timestamp}"
+    return f"{browser}_{timestamp}_{uuid.uuid4().hex[:8]}"
 
 
 @mcp.tool()
@@ -140,87 +266,224 @@ def authenticate_user(username: str, password: str):
         }
 
 
+debug_port_range = config['browser'].get('debug_port_range', [9222, 9322])
+port_allocator = PortAllocator(debug_port_range[0], debug_port_range[1])
+# 浏览器驱动 -> 远程调试端口，进程关闭时回收
+driver_ports = {}
+# 浏览器驱动 -> 访问过的源，重置时逐个清除存储
+visited_origins = {}
+
+
+browser_config = config['browser']
+firefox_backend = LaunchBackend("firefox", "firefox", search_names=("firefox", "geckodriver"))
+launcher_discovery = LauncherDiscovery({
+    "chrome": [
+        # 使用指定的Chrome和ChromeDriver路径
+        LaunchBackend(
+            "chrome_pinned", "chrome",
+            binary_path=browser_config.get('chrome_binary_path', "/opt/chrome-linux64/chrome"),
+            driver_path=browser_config.get('chromedriver_path', "/opt/chromedriver-linux64/chromedriver"),
+        ),
+        # 如果指定路径失败，尝试使用系统默认Chrome
+        LaunchBackend(
+            "chrome_system", "chrome",
+            search_names=("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chromedriver"),
+        ),
+        # 如果Chrome完全失败，尝试使用Firefox
+        firefox_backend,
+    ],
+    "firefox": [firefox_backend],
+})
+launcher_discovery.probe_all()
+
+
+def _launch_driver(profile) -> webdriver.Remote:
+    """
+    按启动配置冷启动一个浏览器驱动
+    启动后端在首次启动时探测并缓存，之后直接使用缓存的后端
+    """
+    browser, headless, window_size, overrides = profile
+    settings = resolve_launch_settings(config, overrides)
+    logger.debug(f"准备启动{browser}浏览器，启动选项覆盖: {dict(overrides)}")
+    driver, backend = launcher_discovery.launch(
+        browser, lambda backend: _launch_with_backend(backend, settings, headless, window_size)
+    )
+    logger.debug(f"浏览器已通过启动后端{backend.name}启动")
+    return driver
+
+
+def _launch_with_backend(backend: LaunchBackend, settings: Dict[str, Any], headless: bool, window_size: str) -> webdriver.Remote:
+    """用指定后端启动浏览器，每个Chrome进程分配独立的远程调试端口"""
+    if backend.browser == "firefox":
+        return webdriver.Firefox(options=build_firefox_options(settings, headless, window_size))
+
+    debug_port = port_allocator.allocate()
+    try:
+        chrome_options = build_chrome_options(settings, headless, window_size, debug_port)
+        if backend.binary_path:
+            # 设置Chrome二进制路径
+            chrome_options.binary_location = backend.binary_path
+        if backend.driver_path:
+            # 使用指定的ChromeDriver路径
+            driver = webdriver.Chrome(service=ChromeService(backend.driver_path), options=chrome_options)
+        else:
+            driver = webdriver.Chrome(options=chrome_options)
+    except Exception:
+        port_allocator.release(debug_port)
+        raise
+    driver_ports[id(driver)] = debug_port
+    logger.debug(f"Chrome远程调试端口: {debug_port}")
+    return driver
+
+
+def _dispose_driver(driver) -> None:
+    """关闭浏览器进程并回收其调试端口"""
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.warning(f"关闭浏览器驱动时出错: {e}")
+    finally:
+        visited_origins.pop(id(driver), None)
+        debug_port = driver_ports.pop(id(driver), None)
+        if debug_port is not None:
+            port_allocator.release(debug_port)
+
+
+def _recycle_driver(driver) -> bool:
+    """
+    驱动归还到浏览器池前清理页面状态：关闭多余标签页、清除Cookie和存储、回到空白页、丢弃残留日志
+    """
+    reset_browser_state(driver, visited_origins.pop(id(driver), ()))
+    return True
+
+
+network_config = config.get('network', {})
+console_config = config.get('console', {})
+blocked_domains = config.get('security', {}).get('blocked_domains', [])
+
+# Source Map在所有会话间共享：同一脚本只下载和解析一次
+source_map_resolver = SourceMapResolver(
+    console_config.get('source_map_cache_dir', './source_map_cache'),
+    int(console_config.get('source_map_cache_mb', 50) * 1024 * 1024),
+    blocked_domains=blocked_domains
+)
+
+# 可选的控制台日志持久化，关闭浏览器后仍可通过query_console_history查询
+console_store = None
+if console_config.get('history_enabled', False):
+    try:
+        console_store = ConsoleStore(
+            console_config.get('history_path', './console_history/console.db'),
+            retention_days=console_config.get('history_retention_days', 7)
+        )
+        atexit.register(console_store.close)
+    except Exception as store_error:
+        logger.error(f"控制台日志持久化初始化失败，仅保存在内存中: {store_error}")
+
+
+def _attach_cdp(session: Dict[str, Any], driver) -> None:
+    """
+    为Chrome会话建立CDP事件连接，并在同一拦截层安装网络录制/回放和域名屏蔽，
+    同时订阅控制台事件推送到会话的日志缓冲区，并在每个新文档中预先注入性能观察器
+    Firefox或无法连接调试端口时保持原有行为（轮询日志，读取性能指标时现场注入观察器）
+    """
+    if session.get("debug_port") is None:
+        return
+    settings = resolve_launch_settings(config, session["profile"][3])
+    hub = CDPHub(session["debug_port"])
+    try:
+        # 样式表和字体屏蔽按标签页安装，新打开的标签页同样生效
+        blocker = resource_blocking_installer(settings)
+        if blocker is not None:
+            hub.add_installer(blocker)
+        interceptor = NetworkInterceptor(blocked_domains, NetworkCache(network_config.get('cache_dir', './network_cache')))
+        hub.add_installer(interceptor.install)
+        hub.add_installer(session["console"].install)
+        hub.add_installer(performance_metrics.install)
+        activity = NetworkActivity()
+        hub.add_installer(activity.install)
+        hub.add_installer(session["helpers"].install)
+        hub.connection(driver.current_window_handle)
+    except Exception as e:
+        logger.warning(f"建立CDP连接失败，事件相关功能不可用: {e}")
+        hub.close()
+        session["console"].streaming = False
+        apply_chrome_runtime_settings(driver, settings)
+        return
+    session["cdp"] = hub
+    session["network"] = interceptor
+    session["activity"] = activity
+
+
+performance_config = config.get('performance', {})
+browser_pool = BrowserPool(
+    launcher=_launch_driver,
+    resetter=_recycle_driver,
+    disposer=_dispose_driver,
+    max_browsers=performance_config.get('max_concurrent_browsers', 3),
+    cleanup_interval=performance_config.get('cleanup_interval', 300),
+    warm_size=performance_config.get('warm_pool_size', 1),
+)
+atexit.register(browser_pool.shutdown)
+logger.info(f"浏览器池初始化完成: {browser_pool.stats()}")
+
+
 @mcp.tool()
+@offload(per_session=False)
 @browser_mcp_auth_required
-def start_browser(browser: str = "chrome", headless: bool = True, window_size: str = "1920,1080", **kwargs):
+def start_browser(browser: str = "chrome", headless: bool = True, window_size: str = "1920,1080", options: Dict[str, Any] = None, **kwargs):
     """
-    Start a browser (supports Chrome and Firefox)
+    Start a browser (supports Chrome and Firefox).
+    Drivers are leased from a warm pool keyed by (browser, headless, window_size, options).
+    Launch options default to config.json (features, browser.chrome_options, browser.user_agent).
     :param browser: Browser type ("chrome" or "firefox")
     :param headless: Whether to run in headless mode
     :param window_size: Browser window size
+    :param options: Per-call overrides: enable_images, enable_css, enable_fonts, enable_javascript,
+                    enable_plugins (Chrome only), enable_extensions, user_agent, extra_args,
+                    page_load_strategy ("normal", "eager" or "none"; lets navigate_to_url return
+                    before the load event when combined with its wait_until modes)
+                    (e.g. {"enable_images": false, "enable_fonts": false} for fast error hunting)
     """
     try:
         # 获取认证用户信息
         current_user = kwargs.get('current_user', {})
-        logger.info(f"用户 {current_user.get('username', 'unknown')} 启动浏览器: {browser}, 无头模式: {headless}, 窗口大小: {window_size}")
+        logger.info(f"用户 {current_user.get('username', 'unknown')} 启动浏览器: {browser}, 无头模式: {headless}, 窗口大小: {window_size}, 启动选项: {options}")
         if browser not in ["chrome", "firefox"]:
             logger.error(f"不支持的浏览器类型: {browser}")
             raise ValueError("Unsupported browser type. Use 'chrome' or 'firefox'.")
 
-        driver = None
-        logger.debug(f"准备启动{browser}浏览器")
-        if browser == "chrome":
-            chrome_options = ChromeOptions()
-            if headless:
-                chrome_options.add_argument("--headless=new")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--disable-web-security")
-            chrome_options.add_argument("--disable-features=VizDisplayCompositor")
-            chrome_options.add_argument("--remote-debugging-port=9222")
-            chrome_options.add_argument(f"--window-size={window_size}")
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            
-            # 启用日志记录
-            chrome_options.add_argument("--enable-logging")
-            chrome_options.add_argument("--log-level=0")
-            chrome_options.set_capability('goog:loggingPrefs', {'browser': 'ALL'})
-            
-            try:
-                # 使用指定的Chrome和ChromeDriver路径
-                chrome_binary_path = "/opt/chrome-linux64/chrome"
-                chromedriver_path = "/opt/chromedriver-linux64/chromedriver"
-                
-                # 设置Chrome二进制路径
-                chrome_options.binary_location = chrome_binary_path
-                
-                # 使用指定的ChromeDriver路径
-                from selenium.webdriver.chrome.service import Service
-                service = Service(chromedriver_path)
-                
-                driver = webdriver.Chrome(service=service, options=chrome_options)
-            except Exception as chrome_error:
-                # 如果指定路径失败，尝试使用系统默认Chrome
-                try:
-                    driver = webdriver.Chrome(options=chrome_options)
-                except Exception:
-                    # 如果Chrome完全失败，尝试使用Firefox
-                    firefox_options = FirefoxOptions()
-                    if headless:
-                        firefox_options.add_argument("--headless")
-                    firefox_options.add_argument("--no-sandbox")
-                    firefox_options.add_argument("--disable-dev-shm-usage")
-                    
-                    driver = webdriver.Firefox(options=firefox_options)
-
-        elif browser == "firefox":
-            firefox_options = FirefoxOptions()
-            if headless:
-                firefox_options.add_argument("--headless")
-            firefox_options.add_argument("--no-sandbox")
-            firefox_options.add_argument("--disable-dev-shm-usage")
-            
-            driver = webdriver.Firefox(options=firefox_options)
+        profile = (browser, headless, window_size, normalize_overrides(options))
+        started_at = time.time()
+        driver, reused = browser_pool.acquire(profile)
+        launch_ms = int((time.time() - started_at) * 1000)
 
-        session_id = generate_session_id(browser)
+        try:
+            session_id = generate_session_id(browser)
+            session = {
+                "profile": profile,
+                "debug_port": driver_ports.get(id(driver)),
+                "lock": threading.RLock(),
+                "cdp": None,
+                "network": None,
+                "activity": None,
+                "helpers": JSHelperRegistry(),
+                "elements": ElementCache(),
+                "console": ConsoleCapture(console_config.get('max_logs', 10000), console_config.get('auto_clear_threshold'),
+                                          console_store, session_id),
+            }
+            _attach_cdp(session, driver)
+        except Exception:
+            # 驱动已从池中租出，会话没有建立时交还给池关闭，避免泄漏浏览器进程
+            browser_pool.release(driver, reusable=False)
+            raise
+        state["sessions"][session_id] = session
         state["drivers"][session_id] = driver
         state["current_session"] = session_id
         
-        logger.info(f"浏览器启动成功，会话ID: {session_id}")
+        logger.info(f"浏览器启动成功，会话ID: {session_id}，{'复用预热浏览器' if reused else '冷启动'}，耗时{launch_ms}ms，调试端口: {state['sessions'][session_id]['debug_port']}")
         logger.debug(f"当前状态: drivers={list(state['drivers'].keys())}, current_session={state['current_session']}")
-        return f"Browser started with session_id: {session_id}"
+        return f"Browser started with session_id: {session_id} ({'warm' if reused else 'cold'} start, {launch_ms}ms)"
 
     except Exception as e:
         logger.error(f"启动浏览器失败: {str(e)}", exc_info=True)
@@ -228,74 +491,145 @@ def start_browser(browser: str = "chrome", headless: bool = True, window_size: s
 
     
 @mcp.tool()
+@offload()
 @browser_mcp_auth_required
-def navigate_to_url(url: str, wait_for_load: bool = True, timeout: int = 30, **kwargs):
+def navigate_to_url(url: str, wait_for_load: bool = True, timeout: int = 30, session_id: str = None,
+                    wait_until: str = "load", selector: str = None, idle_ms: int = 500, **kwargs):
     """
     Navigates the browser to a specified URL.
     :param url: The URL to navigate to.
-    :param wait_for_load: Whether to wait for page load completion
+    :param wait_for_load: Whether to wait for page load completion (False is the same as wait_until="none")
     :param timeout: Maximum time to wait for page load
+    :param session_id: Target browser session (defaults to the current session)
+    :param wait_until: "load", "domcontentloaded", "networkidle" (no request in flight for idle_ms,
+                       tracked from CDP network events in Chrome), "selector" (wait for `selector`)
+                       or "none". Start the browser with options={"page_load_strategy": "eager"} or
+                       "none" so the driver itself does not block until the load event
+    :param selector: CSS selector to wait for when wait_until="selector"
+    :param idle_ms: Quiet period for wait_until="networkidle"
+    
+    The result reports how long each phase took (navigate = the driver.get call itself).
     """
+    if wait_until not in WAIT_MODES:
+        return f"Error navigating: unsupported wait_until {wait_until}. Use one of {list(WAIT_MODES)}"
+    if wait_until == "selector" and not selector:
+        return "Error navigating: wait_until=\"selector\" requires the selector parameter"
+    mode = wait_until if wait_for_load else "none"
     try:
         # 获取认证用户信息
         current_user = kwargs.get('current_user', {})
-        logger.info(f"用户 {current_user.get('username', 'unknown')} 导航到URL: {url}, wait_for_load={wait_for_load}, timeout={timeout}")
-        driver = get_driver()
-        logger.debug(f"获取到驱动器，开始导航到: {url}")
-        driver.get(url)
-        logger.debug(f"页面加载请求已发送")
-        
-        if wait_for_load:
-            logger.debug(f"等待页面加载完成，超时时间: {timeout}秒")
-            wait = WebDriverWait(driver, timeout)
-            wait.until(lambda driver: driver.execute_script("return document.readyState") == "complete")
-            logger.debug("页面加载完成")
-        
-        title = driver.title
-        logger.info(f"成功导航到 {url}，页面标题: {title}")
-        return f"Navigated to {url}. Current title: {title}. The next setp is execute_javascript "
+        logger.info(f"用户 {current_user.get('username', 'unknown')} 导航到URL: {url}, wait_until={mode}, timeout={timeout}")
+        if is_blocked_host(url, blocked_domains):
+            logger.warning(f"拒绝导航到被屏蔽的域名: {url}")
+            return f"Error navigating: domain of {url} is blocked by security.blocked_domains"
+        with session_scope(session_id) as (session_id, driver):
+            logger.debug(f"获取到驱动器，开始导航到: {url}")
+            session = state["sessions"][session_id]
+            strategy = (driver.capabilities or {}).get("pageLoadStrategy", "normal")
+            origin = origin_of(url)
+            if origin:
+                visited_origins.setdefault(id(driver), set()).add(origin)
+
+            started = time.monotonic()
+            activity = session.get("activity")
+            handle = None
+            if mode == "networkidle" and activity is not None:
+                # 在导航开始前启用网络事件，页面的第一个请求也会被统计
+                handle = driver.current_window_handle
+                activity.ensure_enabled(session["cdp"].connection(handle), handle)
+            if strategy == "none" and mode != "none":
+                # none策略下driver.get可能在新文档提交前返回，标记旧文档以免在旧页面上判断完成
+                driver.execute_script(STALE_DOCUMENT_MARKER_SCRIPT)
+            session["elements"].invalidate()
+            driver.get(url)
+            phase_started = time.monotonic()
+            phases = {"navigate_ms": int((phase_started - started) * 1000)}
+            logger.debug(f"页面加载请求已发送，等待方式: {mode}，页面加载策略: {strategy}")
+
+            remaining = timeout - (phase_started - started)
+            if mode == "domcontentloaded":
+                wait_ready_state(driver, "interactive", remaining)
+            elif mode == "load":
+                wait_ready_state(driver, "complete", remaining)
+            elif mode == "networkidle":
+                if activity is not None:
+                    activity.wait_idle(handle, idle_ms, remaining, started_at=started)
+                else:
+                    wait_resources_idle(driver, idle_ms, remaining)
+            elif mode == "selector":
+                wait_selector(driver, selector, remaining)
+            if mode != "none":
+                phases[f"{mode}_ms"] = int((time.monotonic() - phase_started) * 1000)
+            phases["total_ms"] = int((time.monotonic() - started) * 1000)
+            logger.debug(f"页面加载阶段耗时: {phases}")
+        
+            title = driver.title
+            logger.info(f"成功导航到 {url}，页面标题: {title}")
+            network_note = ""
+            interceptor = session.get("network")
+            if interceptor is not None and interceptor.mode != "off":
+                network_note = f" Network mode: {interceptor.mode} (recorded={interceptor.counters['recorded']}, replayed={interceptor.counters['replayed']}, misses={interceptor.counters['replay_misses']})."
+            timing_note = ", ".join(f"{name[:-3]}={value}ms" for name, value in phases.items())
+            return (f"Navigated to {url}. Current title: {title}.{network_note} "
+                    f"Timings: {timing_note} (wait_until={mode}, page_load_strategy={strategy}). "
+                    f"The next setp is execute_javascript ")
     except Exception as e:
         logger.error(f"导航失败: {str(e)}", exc_info=True)
         return f"Error navigating: {str(e)}"
     
 @mcp.tool()
+@offload()
 @browser_mcp_auth_required
-def execute_javascript(script: str, capture_console: bool = True, timeout: int = 10, max_logs: int = 1000, **kwargs):
+def execute_javascript(script: str, capture_console: bool = True, timeout: int = 10, max_logs: int = 1000, session_id: str = None, async_script: bool = False, **kwargs):
     """
     Execute JavaScript code in the current page.
     :param script: JavaScript code to execute
-    :param capture_console: Whether to show console logs note (use get_console_logs separately to avoid buffer clearing)
+    :param capture_console: Whether to show console logs note (use get_console_logs to read the logs)
     :param timeout: Execution timeout
     :param max_logs: Deprecated parameter (kept for compatibility)
+    :param session_id: Target browser session (defaults to the current session)
+    :param async_script: Run with execute_async_script: the script receives a callback as its last
+                         argument (arguments[arguments.length - 1]) and finishes by calling it,
+                         e.g. "fetch('/api').then(r => r.status).then(arguments[0])"; waits up to `timeout`
+    
+    For scripts used more than once, prefer define_js_helper + call_js_helper.
     
-    Note: To properly capture console logs, execute JavaScript with capture_console=False,
-    then call get_console_logs separately to avoid log buffer being cleared.
+    Note: Chrome sessions stream console output into a session buffer, so nothing is lost
+    between calls. Other browsers poll the WebDriver log buffer in get_console_logs.
     """
     # 获取认证用户信息
     current_user = kwargs.get('current_user', {})
-    logger.info(f"用户 {current_user.get('username', 'unknown')} 执行JavaScript: {script[:200]}{'...' if len(script) > 200 else ''}, capture_console={capture_console}")
+    logger.info(f"用户 {current_user.get('username', 'unknown')} 执行JavaScript（{len(script)}字符）, async_script={async_script}, capture_console={capture_console}")
+    logger.debug(f"JavaScript: {script[:200]}{'...' if len(script) > 200 else ''}")
     try:
-        driver = get_driver()
-        logger.debug("获取到驱动器，开始执行JavaScript")
+        with session_scope(session_id) as (session_id, driver):
+            logger.debug("获取到驱动器，开始执行JavaScript")
         
-        # Execute JavaScript
-        result = driver.execute_script(script)
-        logger.debug(f"JavaScript执行完成，结果: {str(result)[:500]}{'...' if len(str(result)) > 500 else ''}")
+            # Execute JavaScript
+            if async_script:
+                driver.set_script_timeout(timeout)
+                result = driver.execute_async_script(script)
+            else:
+                result = driver.execute_script(script)
+            logger.debug(f"JavaScript执行完成，结果: {str(result)[:500]}{'...' if len(str(result)) > 500 else ''}")
         
-        response_data = {
-            "success": True,
-            "result": result,
-            "script_executed": script[:200] + ('...' if len(script) > 200 else ''),
-            "console_logs": []
-        }
+            response_data = {
+                "success": True,
+                "result": result,
+                "script_executed": script[:200] + ('...' if len(script) > 200 else ''),
+                "console_logs": []
+            }
         
-        if capture_console:
-            logger.debug("JavaScript执行完成，建议使用get_console_logs获取日志")
-            response_data["console_logs_note"] = "JavaScript执行完成，请使用get_console_logs工具获取控制台日志以避免日志缓冲区被清空"
-            response_data["console_count"] = "请使用get_console_logs查看"
+            if capture_console:
+                logger.debug("JavaScript执行完成，建议使用get_console_logs获取日志")
+                if state["sessions"][session_id]["console"].streaming:
+                    response_data["console_logs_note"] = "JavaScript执行完成，控制台日志已实时记录到会话缓冲区，请使用get_console_logs查看"
+                else:
+                    response_data["console_logs_note"] = "JavaScript执行完成，请使用get_console_logs工具获取控制台日志以避免日志缓冲区被清空"
+                response_data["console_count"] = "请使用get_console_logs查看"
         
-        logger.info("JavaScript执行成功")
-        return response_data
+            logger.info("JavaScript执行成功")
+            return response_data
         
     except Exception as e:
         logger.error(f"执行JavaScript失败: {str(e)}", exc_info=True)
@@ -306,17 +640,52 @@ def execute_javascript(script: str, capture_console: bool = True, timeout: int =
         }
 
     
+def _console_read_is_buffered(kwargs: Dict[str, Any]) -> bool:
+    """
+    日志已由CDP事件推送到缓冲区，且不需要按标签页过滤或读取性能数据时，
+    get_console_logs只读缓冲区，不需要WebDriver，也不需要等待会话锁
+    """
+    if kwargs.get("tab") is not None or kwargs.get("include_performance"):
+        return False
+    try:
+        session_id, _ = resolve_session(kwargs.get("session_id"))
+    except Exception:
+        return False
+    session = state["sessions"].get(session_id)
+    return session is not None and session["console"].streaming
+
+
 @mcp.tool()
-def get_console_logs(level: str = "ALL", clear_after_get: bool = False, limit: int = 1000, include_performance: bool = True, exclude_info: bool = False):
+@offload(read_only=_console_read_is_buffered)
+def get_console_logs(level: str = "ALL", clear_after_get: bool = False, limit: int = 1000, include_performance: bool = False, exclude_info: bool = False, session_id: str = None, tab: str = None, since: int = None, aggregate: bool = False, format: str = "full", max_bytes: int = None, stack_frames: bool = False, resolve_source_maps: bool = False):
     """
     Get console logs from the browser with enhanced formatting and analysis.
     Based on Chrome DevTools Console API standards.
+    Chrome sessions read from the session buffer filled by CDP console events, without waiting for
+    other calls on the same session (unless tab or include_performance is given);
+    other browsers poll driver.get_log() into the same buffer.
     
     :param level: Log level filter (ALL, INFO, WARNING, ERROR, SEVERE)
-    :param clear_after_get: Whether to clear logs after getting them
+    :param clear_after_get: Whether to clear the session log buffer after getting the logs
     :param limit: Maximum number of logs to return (default: 1000)
-    :param include_performance: Whether to include performance timing information
+    :param include_performance: Whether to include page timing and Core Web Vitals read from the
+                                performance observer buffer (see get_performance_metrics for details)
     :param exclude_info: Whether to exclude INFO level logs from the response (useful for AI model processing)
+    :param session_id: Target browser session (defaults to the current session)
+    :param tab: Tab handle or index from list_tabs (defaults to logs from every tab)
+    :param since: Cursor (next_cursor of a previous call); only entries captured after it are returned,
+                  oldest first and at most `limit` of them (has_more tells whether to call again)
+    :param aggregate: Fold identical or near-identical messages (differing only in numbers/ids) into one
+                      record with count, first/last timestamps and a sample; `limit` then counts groups
+    :param format: "full" (one dict per log), "compact" (columnar arrays with source/URL tables)
+                   or "summary" (counts and the most frequent errors only)
+    :param max_bytes: Response size budget; long messages are cut to a common length first,
+                      then the oldest logs are dropped (see "budget" in the response)
+    :param stack_frames: Attach the parsed call stack to each log as "stack_frames"
+                         (function, url, line, column; 1-based)
+    :param resolve_source_maps: Also map every frame back to its original source through the
+                                script's source map ("original" on each frame; implies stack_frames).
+                                Maps are fetched once per script URL and cached on disk
     
     Enhanced features:
     - Better message parsing and formatting
@@ -325,200 +694,200 @@ def get_console_logs(level: str = "ALL", clear_after_get: bool = False, limit: i
     - Source information extraction
     - Optional INFO level filtering for AI model optimization
     """
+    if format not in RESPONSE_FORMATS:
+        return {"success": False, "error": f"Unsupported format: {format}. Use one of {list(RESPONSE_FORMATS)}", "logs": []}
     try:
-        driver = get_driver()
-        logger.debug(f"开始获取控制台日志，级别: {level}, 限制: {limit}")
-        
-        # Chrome DevTools Console API 日志级别映射
-        # 参考: https://developer.chrome.com/docs/devtools/console/api
-        console_level_mapping = {
-            'SEVERE': 'ERROR',     # console.error(), console.assert(false)
-            'WARNING': 'WARNING',  # console.warn()
-            'INFO': 'INFO',        # console.log(), console.info(), console.dir(), console.table()
-            'DEBUG': 'VERBOSE',    # console.debug()
-            'FINE': 'VERBOSE',     # 详细调试信息
-            'FINER': 'VERBOSE',    # 更详细的调试信息
-            'FINEST': 'VERBOSE'    # 最详细的调试信息
-        }
+        # 推送模式下读取缓冲区不经过WebDriver，不等待同一会话正在进行的页面加载
+        buffered = _console_read_is_buffered({"session_id": session_id, "tab": tab, "include_performance": include_performance})
+        scope = buffered_scope(session_id) if buffered else session_scope(session_id, tab=tab)
+        with scope as (session_id, driver):
+            logger.debug(f"开始获取控制台日志，级别: {level}, 限制: {limit}, 格式: {format}")
         
-        # Get browser logs - 获取所有类型的日志
-        all_logs = []
-        log_types = ['browser', 'driver', 'client', 'server']
+            # 推送模式下日志已在缓冲区中，轮询模式先把WebDriver日志读入缓冲区
+            capture = state["sessions"][session_id]["console"]
+            if not capture.streaming:
+                capture.poll(driver)
+            tab_handle = driver.current_window_handle if tab is not None else None
         
-        for log_type in log_types:
-            try:
-                logs = driver.get_log(log_type)
-                for log in logs:
-                    log['log_type'] = log_type
-                    all_logs.append(log)
-                logger.debug(f"从{log_type}获取到{len(logs)}条日志")
-            except Exception as type_error:
-                logger.debug(f"无法获取{log_type}日志: {type_error}")
-        
-        # 按时间戳排序
-        all_logs.sort(key=lambda x: x.get('timestamp', 0))
-        
-        # Enhanced log formatting with Chrome DevTools standards
-        formatted_logs = []
-        error_count = 0
-        warning_count = 0
-        
-        for log in all_logs:
-            # 解析消息内容，提取堆栈跟踪信息
-            message = log.get('message', '')
-            
-            # 检测是否包含堆栈跟踪
-            has_stack_trace = 'at ' in message or 'Error:' in message or 'TypeError:' in message
-            
-            # 提取源文件信息
-            source_info = log.get('source', 'unknown')
-            if 'console-api' in source_info:
-                source_type = 'console-api'  # console.log/error/warn等
-            elif 'javascript' in source_info:
-                source_type = 'javascript'   # JavaScript运行时错误
-            elif 'network' in source_info:
-                source_type = 'network'      # 网络请求错误
+            # 过滤条件下推到原始条目：先按级别、INFO排除和标签页过滤，
+            # 再从最新的条目向前取limit条，只有保留下来的条目才会被格式化
+            level_filter = level.upper() if level != "ALL" and level.upper() != "VERBOSE" else None  # VERBOSE包含所有级别
+        
+            def matches(entry):
+                normalized = normalize_level(entry.level).upper()
+                if level_filter is not None and normalized != level_filter:
+                    return False
+                return not (exclude_info and normalized == 'INFO')
+        
+            predicate = matches if level_filter is not None or exclude_info else None
+            important_only = level_filter in ('ERROR', 'WARNING')
+            if format == "summary":
+                # summary只使用计数和错误分组，不选取单条日志
+                selected_logs = []
+                next_cursor, has_more = capture.buffer.last_seq, False
+            elif aggregate:
+                # 重复消息分组在日志写入时已增量累计，这里只读取分组
+                groups = capture.groups(tab_handle, since)
+                if predicate is not None:
+                    groups = [group for group in groups if predicate(group)]
+                if limit and len(groups) > limit:
+                    groups = groups[-limit:]
+                next_cursor, has_more = capture.buffer.last_seq, False
+            elif since is not None:
+                # 增量读取：只扫描游标之后新增的条目
+                selected_logs, next_cursor, has_more = capture.since(since, limit, predicate, tab=tab_handle, important_only=important_only)
             else:
-                source_type = 'other'
-            
-            # 标准化日志级别
-            original_level = log.get('level', 'INFO')
-            normalized_level = console_level_mapping.get(original_level, original_level)
-            
-            # 解析错误类型
-            error_type = None
-            if normalized_level in ['ERROR', 'SEVERE']:
-                error_count += 1
-                if 'TypeError:' in message:
-                    error_type = 'TypeError'
-                elif 'ReferenceError:' in message:
-                    error_type = 'ReferenceError'
-                elif 'SyntaxError:' in message:
-                    error_type = 'SyntaxError'
-                elif 'NetworkError:' in message or '404' in message:
-                    error_type = 'NetworkError'
-                elif 'console.assert' in message:
-                    error_type = 'AssertionError'
-                else:
-                    error_type = 'UnknownError'
-            elif normalized_level == 'WARNING':
-                warning_count += 1
-            
-            # 提取文件和行号信息
-            file_info = None
-            line_number = None
-            if ' at ' in message:
-                # 尝试提取堆栈跟踪中的文件信息
-                import re
-                file_match = re.search(r'at\s+.*?\((.*?):(\d+):(\d+)\)', message)
-                if file_match:
-                    file_info = file_match.group(1)
-                    line_number = int(file_match.group(2))
-            
-            formatted_log = {
-                "level": normalized_level,
-                "original_level": original_level,
-                "message": message,
-                "timestamp": log['timestamp'],
-                "datetime": datetime.fromtimestamp(log['timestamp'] / 1000).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
-                "source": source_info,
-                "source_type": source_type,
-                "log_type": log.get('log_type', 'browser'),
-                "has_stack_trace": has_stack_trace,
-                "error_type": error_type,
-                "file_info": file_info,
-                "line_number": line_number,
-                "console_method": _detect_console_method(message)  # 检测使用的console方法
-            }
-            formatted_logs.append(formatted_log)
+                selected_logs = capture.latest(limit, predicate, tab=tab_handle, important_only=important_only)
+                next_cursor, has_more = capture.buffer.last_seq, False
+        
+            # 错误和警告统计来自缓冲区维护的级别计数，不需要遍历全部条目
+            raw_level_counts = capture.level_counts(tab_handle)
+            total_count = sum(raw_level_counts.values())
+            error_count = sum(count for raw_level, count in raw_level_counts.items() if normalize_level(raw_level) in ERROR_LEVELS)
+            warning_count = sum(count for raw_level, count in raw_level_counts.items() if normalize_level(raw_level) == 'WARNING')
         
-        # Filter by level
-        if level != "ALL":
-            if level.upper() == "VERBOSE":
-                # VERBOSE包含所有级别
-                pass
+            # Enhanced log formatting with Chrome DevTools standards
+            if aggregate and format != "summary":
+                formatted_logs = [_format_console_group(group) for group in groups]
             else:
-                formatted_logs = [log for log in formatted_logs if log['level'].upper() == level.upper()]
-        
-        # Optional: Exclude INFO level logs for AI model processing
-        if exclude_info:
-            formatted_logs = [log for log in formatted_logs if log['level'].upper() != 'INFO']
-            logger.debug(f"已过滤INFO级别日志，剩余{len(formatted_logs)}条日志")
-        
-        # Apply limit to most recent logs
-        if limit and len(formatted_logs) > limit:
-            formatted_logs = formatted_logs[-limit:]
-        
-        # 统计各级别日志数量
-        level_counts = {}
-        console_method_counts = {}
-        for log in formatted_logs:
-            log_level = log['level']
-            level_counts[log_level] = level_counts.get(log_level, 0) + 1
+                formatted_logs = [_format_console_entry(log) for log in selected_logs]
+            if stack_frames or resolve_source_maps:
+                samples = [group.sample for group in groups] if aggregate and format != "summary" else selected_logs
+                for formatted, log in zip(formatted_logs, samples):
+                    formatted["stack_frames"] = _stack_frames_of(log, resolve_source_maps)
+            if exclude_info:
+                logger.debug(f"已过滤INFO级别日志，剩余{len(formatted_logs)}条日志")
+        
+            # 统计各级别日志数量
+            level_counts = {}
+            console_method_counts = {}
+            for log in formatted_logs:
+                occurrences = log.get('count', 1)
+                log_level = log['level']
+                level_counts[log_level] = level_counts.get(log_level, 0) + occurrences
             
-            console_method = log.get('console_method', 'unknown')
-            console_method_counts[console_method] = console_method_counts.get(console_method, 0) + 1
+                console_method = log.get('console_method', 'unknown')
+                console_method_counts[console_method] = console_method_counts.get(console_method, 0) + occurrences
         
-        # Performance analysis
-        performance_info = {}
-        if include_performance:
-            try:
-                # 获取页面性能信息
-                performance_timing = driver.execute_script("""
+            # 性能数据来自页面内的观察器缓冲区，默认不读取
+            performance_info = {}
+            if include_performance:
+                try:
+                    raw = performance_metrics.collect(driver)
+                    if raw is not None:
+                        metrics = performance_metrics.summarize(raw)
+                        navigation = metrics["navigation"] or {}
+                        performance_info = {
+                            "page_load_time_ms": navigation.get("load_ms"),
+                            "dom_ready_time_ms": navigation.get("dom_content_loaded_ms"),
+                            **metrics["vitals"]
+                        }
+                except Exception as perf_error:
+                    logger.debug(f"无法获取性能信息: {perf_error}")
+                    performance_info = {"error": "无法获取性能信息"}
+        
+            error_summary = {
+                "total_errors": error_count,
+                "total_warnings": warning_count,
+                "has_critical_errors": error_count > 0
+            }
+        
+            if format == "summary":
+                # 出现次数最多的错误分组，分组在写入时已累计
+                error_groups = [group for group in capture.groups(tab_handle) if normalize_level(group.level) in ERROR_LEVELS]
+                error_groups.sort(key=lambda group: group.count, reverse=True)
+                top_errors = [
+                    {
+                        "message": truncate_message(group.sample.message, SUMMARY_MESSAGE_CHARS),
+                        "count": group.count,
+                        "error_type": classify_message(group.sample.message)[1],
+                        "source": group.source,
+                        "last_datetime": _format_datetime(group.last_timestamp),
+                        "last_seq": group.last_seq
+                    }
+                    for group in error_groups[:TOP_ERRORS]
+                ]
+                if stack_frames or resolve_source_maps:
+                    for error, group in zip(top_errors, error_groups):
+                        error["stack_frames"] = _stack_frames_of(group.sample, resolve_source_maps)
+                summary_level_counts = {}
+                for raw_level, count in raw_level_counts.items():
+                    normalized_level = normalize_level(raw_level)
+                    summary_level_counts[normalized_level] = summary_level_counts.get(normalized_level, 0) + count
+        
+                def render(errors):
                     return {
-                        loadEventEnd: performance.timing.loadEventEnd,
-                        navigationStart: performance.timing.navigationStart,
-                        domContentLoadedEventEnd: performance.timing.domContentLoadedEventEnd,
-                        firstPaint: performance.getEntriesByType('paint').find(entry => entry.name === 'first-paint')?.startTime,
-                        firstContentfulPaint: performance.getEntriesByType('paint').find(entry => entry.name === 'first-contentful-paint')?.startTime
-                    };
-                """)
-                
-                if performance_timing['loadEventEnd'] > 0:
-                    load_time = performance_timing['loadEventEnd'] - performance_timing['navigationStart']
-                    dom_ready_time = performance_timing['domContentLoadedEventEnd'] - performance_timing['navigationStart']
-                    
-                    performance_info = {
-                        "page_load_time_ms": load_time,
-                        "dom_ready_time_ms": dom_ready_time,
-                        "first_paint_ms": performance_timing.get('firstPaint'),
-                        "first_contentful_paint_ms": performance_timing.get('firstContentfulPaint')
+                        "success": True,
+                        "format": format,
+                        "total_count": total_count,
+                        "next_cursor": next_cursor,
+                        "level_counts": summary_level_counts,
+                        "error_summary": error_summary,
+                        "top_errors": errors,
+                        "performance_info": performance_info
                     }
-            except Exception as perf_error:
-                logger.debug(f"无法获取性能信息: {perf_error}")
-                performance_info = {"error": "无法获取性能信息"}
         
-        # Optional: Clear logs after retrieval
-        if clear_after_get:
-            driver.execute_script("console.clear();")
-            logger.debug("已清除浏览器控制台日志")
+                response, budget = fit_to_budget(top_errors, render, max_bytes)
+            elif format == "compact":
+                def render(logs):
+                    return {
+                        "success": True,
+                        "format": format,
+                        "total_count": total_count,
+                        "filtered_count": len(logs),
+                        "next_cursor": next_cursor,
+                        "has_more": has_more,
+                        "level_counts": level_counts,
+                        "error_summary": error_summary,
+                        "performance_info": performance_info,
+                        "logs": compact_logs(logs)
+                    }
+        
+                response, budget = fit_to_budget(formatted_logs, render, max_bytes)
+            else:
+                # Return comprehensive structured response
+                def render(logs):
+                    return {
+                        "success": True,
+                        "total_count": total_count,
+                        "filtered_count": len(logs),
+                        "next_cursor": next_cursor,
+                        "has_more": has_more,
+                        "level_filter": level,
+                        "level_counts": level_counts,
+                        "console_method_counts": console_method_counts,
+                        "error_summary": error_summary,
+                        "performance_info": performance_info,
+                        "logs": logs,
+                        "message": f"成功获取{len(logs)}条控制台日志 (总共{total_count}条，错误{error_count}条，警告{warning_count}条)",
+                        "capture_settings": {
+                            "mode": "push" if capture.streaming else "poll",
+                            "buffer": capture.buffer.stats(),
+                            "limit": limit,
+                            "include_performance": include_performance,
+                            "cleared_after_get": clear_after_get,
+                            "since": since,
+                            "aggregate": aggregate,
+                            "exclude_info": exclude_info,
+                            "format": format,
+                            "max_bytes": max_bytes,
+                            "stack_frames": stack_frames or resolve_source_maps,
+                            "source_maps": source_map_resolver.stats() if resolve_source_maps else None
+                        },
+                        "chrome_devtools_compliance": True  # 标识符合Chrome DevTools标准
+                    }
         
-        logger.info(f"成功获取{len(formatted_logs)}条控制台日志")
+                response, budget = fit_to_budget(formatted_logs, render, max_bytes)
         
-        # Return comprehensive structured response
-        return {
-            "success": True,
-            "total_count": len(all_logs),
-            "filtered_count": len(formatted_logs),
-            "level_filter": level,
-            "level_counts": level_counts,
-            "console_method_counts": console_method_counts,
-            "error_summary": {
-                "total_errors": error_count,
-                "total_warnings": warning_count,
-                "has_critical_errors": error_count > 0
-            },
-            "performance_info": performance_info,
-            "logs": formatted_logs,
-            "message": f"成功获取{len(formatted_logs)}条控制台日志 (总共{len(all_logs)}条，错误{error_count}条，警告{warning_count}条)",
-            "capture_settings": {
-                "limit": limit,
-                "include_performance": include_performance,
-                "cleared_after_get": clear_after_get,
-                "exclude_info": exclude_info
-            },
-            "chrome_devtools_compliance": True  # 标识符合Chrome DevTools标准
-        }
+            if budget is not None:
+                response["budget"] = budget
+        
+            # Optional: Clear logs after retrieval
+            if clear_after_get:
+                capture.clear()
+                logger.debug("已清除会话控制台日志缓冲区")
+            logger.info(f"成功获取{len(formatted_logs)}条控制台日志，格式: {format}")
+            return response
         
     except Exception as e:
         logger.error(f"获取控制台日志失败: {str(e)}", exc_info=True)
@@ -529,63 +898,241 @@ def get_console_logs(level: str = "ALL", clear_after_get: bool = False, limit: i
             "logs": []
         }
     
+def _format_datetime(timestamp) -> str:
+    return datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _format_console_entry(log) -> Dict[str, Any]:
+    """把缓冲区条目展开为返回给调用方的日志字典"""
+    message = log.message
+    # 堆栈跟踪、错误类型、文件位置和console方法（按消息缓存）
+    has_stack_trace, message_error_type, file_info, line_number, console_method = classify_message(message)
+
+    # 标准化日志级别
+    original_level = log.level
+    normalized_level = normalize_level(original_level)
+
+    return {
+        "seq": log.seq,
+        "level": normalized_level,
+        "original_level": original_level,
+        "message": message,
+        "timestamp": log.timestamp,
+        "datetime": _format_datetime(log.timestamp),
+        "source": log.source,
+        "source_type": source_type_of(log.source),
+        "log_type": log.log_type,
+        "has_stack_trace": has_stack_trace,
+        "error_type": message_error_type if normalized_level in ERROR_LEVELS else None,
+        "file_info": file_info,
+        "line_number": line_number,
+        "console_method": console_method  # 检测使用的console方法
+    }
+
+
+def _stack_frames_of(log, resolve: bool) -> List[Dict[str, Any]]:
+    """日志的结构化调用栈，resolve为True时附带Source Map还原的源码位置"""
+    frames = entry_frames(log)
+    if resolve and frames:
+        resolve_frames(frames, source_map_resolver)
+    return frames
+
+
+def _format_console_group(group) -> Dict[str, Any]:
+    """重复消息分组：第一条日志作为样本，附带出现次数和首末时间"""
+    formatted = _format_console_entry(group.sample)
+    formatted.update({
+        "count": group.count,
+        "fingerprint": group.fingerprint,
+        "first_timestamp": group.first_timestamp,
+        "last_timestamp": group.last_timestamp,
+        "last_datetime": _format_datetime(group.last_timestamp),
+        "last_seq": group.last_seq
+    })
+    return formatted
+
+
 def _detect_console_method(message):
         """
         检测使用的console方法类型
         基于Chrome DevTools Console API规范
         """
-        if 'console.error' in message or 'Error:' in message:
-            return 'console.error'
-        elif 'console.warn' in message or 'Warning:' in message:
-            return 'console.warn'
-        elif 'console.info' in message:
-            return 'console.info'
-        elif 'console.debug' in message:
-            return 'console.debug'
-        elif 'console.table' in message:
-            return 'console.table'
-        elif 'console.trace' in message:
-            return 'console.trace'
-        elif 'console.assert' in message:
-            return 'console.assert'
-        elif 'console.log' in message:
-            return 'console.log'
-        else:
-            return 'unknown'
+        return classify_message(message)[4]
     
 @mcp.tool()
-def click_element(selector: str, by: str = "css", timeout: int = 10, wait_after_click: float = 1):
+@offload()
+def get_performance_metrics(include_resources: bool = False, resource_limit: int = 50, clear: bool = False,
+                            session_id: str = None, tab: str = None):
+    """
+    Get web-performance metrics buffered in the page by a PerformanceObserver that is injected
+    before any page script runs (Chrome sessions; other browsers inject it on first call):
+    Navigation Timing L2 phases, LCP, CLS, INP, first (contentful) paint, long tasks with
+    total blocking time, and resource timing totals by type.
+    :param include_resources: Include individual resource timings (slowest first)
+    :param resource_limit: Maximum number of resource timings to return
+    :param clear: Clear the buffered resource and long-task entries after reading
+    :param session_id: Target browser session (defaults to the current session)
+    :param tab: Tab handle or index from list_tabs (defaults to the active tab)
+    """
+    try:
+        with session_scope(session_id, tab=tab) as (session_id, driver):
+            raw = performance_metrics.collect(driver, clear)
+            if raw is None:
+                return {"success": False, "error": "Performance observer is not available on this page"}
+            metrics = performance_metrics.summarize(raw, include_resources, resource_limit)
+            logger.info(f"已获取性能指标: {metrics['url']}")
+            return {"success": True, **metrics}
+    except Exception as e:
+        logger.error(f"获取性能指标失败: {str(e)}", exc_info=True)
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+@offload()
+def define_js_helper(name: str, source: str, session_id: str = None):
+    """
+    Define (or redefine) a named JavaScript helper once; it is installed into every tab before
+    page scripts run and survives navigations, so later calls only send the name and arguments.
+    :param name: Helper name (a JavaScript identifier)
+    :param source: Function expression, e.g. "function (selector) { return document.querySelectorAll(selector).length; }"
+                   or "async (url) => (await fetch(url)).status"
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
+        with session_scope(session_id) as (session_id, driver):
+            registry = state["sessions"][session_id]["helpers"]
+            installed_tabs = registry.define(driver, name, source)
+            return {
+                "success": True,
+                "name": name,
+                "installed_tabs": installed_tabs,
+                "persistent": state["sessions"][session_id].get("cdp") is not None,
+                "helpers": registry.names()
+            }
+    except Exception as e:
+        logger.error(f"定义JavaScript辅助函数失败: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@mcp.tool()
+@offload()
+def call_js_helper(name: str, args: List[Any] = None, timeout: int = 10, session_id: str = None, tab: str = None):
+    """
+    Call a helper defined with define_js_helper. Promise results are awaited.
+    :param name: Helper name
+    :param args: JSON arguments passed positionally to the helper
+    :param timeout: Maximum time to wait for the result (seconds)
+    :param session_id: Target browser session (defaults to the current session)
+    :param tab: Tab handle or index from list_tabs (defaults to the active tab)
+    """
+    try:
+        with session_scope(session_id, tab=tab) as (session_id, driver):
+            started = time.monotonic()
+            result = state["sessions"][session_id]["helpers"].call(driver, name, args, timeout)
+            duration_ms = int((time.monotonic() - started) * 1000)
+            logger.debug(f"JavaScript辅助函数{name}执行完成，耗时{duration_ms}ms")
+            return {"success": True, "name": name, "result": result, "duration_ms": duration_ms}
+    except JSHelperError as e:
+        return {"success": False, "name": name, "error": str(e)}
+    except Exception as e:
+        logger.error(f"调用JavaScript辅助函数失败: {str(e)}", exc_info=True)
+        return {"success": False, "name": name, "error": str(e)}
+
+
+@mcp.tool()
+@offload()
+def click_element(selector: str, by: str = "css", timeout: int = 10, wait_after_click: float = 1, session_id: str = None,
+                  settle: str = "dom", settle_selector: str = None, quiet_ms: int = 150):
     """
     Click an element on the current page.
     :param selector: Element selector
     :param by: Selection method (css, xpath)
     :param timeout: Maximum time to wait for element
-    :param wait_after_click: Time to wait after clicking
+    :param wait_after_click: Maximum time to wait for the settle condition after clicking
+    :param session_id: Target browser session (defaults to the current session)
+    :param settle: What to wait for after the click, capped at wait_after_click:
+                   "dom" (no DOM mutation for quiet_ms), "navigation" (a new document is committed),
+                   "networkidle" (no request in flight for quiet_ms), "selector" (settle_selector appears),
+                   "sleep" (always wait the full wait_after_click) or "none"
+    :param settle_selector: CSS selector to wait for when settle="selector"
+    :param quiet_ms: Quiet period for settle="dom" and settle="networkidle"
+    
+    The result reports how long the tool actually waited after the click and whether the condition was met.
     """
+    if settle not in SETTLE_MODES:
+        return f"Unsupported settle condition: {settle}. Use one of {list(SETTLE_MODES)}"
+    if settle == "selector" and not settle_selector:
+        return "Error clicking element: settle=\"selector\" requires the settle_selector parameter"
     try:
-        driver = get_driver()
-        wait = WebDriverWait(driver, timeout)
+        with session_scope(session_id) as (session_id, driver):
+            if by.lower() == "css":
+                by_method = By.CSS_SELECTOR
+            elif by.lower() == "xpath":
+                by_method = By.XPATH
+            else:
+                return f"Unsupported selection method: {by}"
         
-        if by.lower() == "css":
-            by_method = By.CSS_SELECTOR
-        elif by.lower() == "xpath":
-            by_method = By.XPATH
-        else:
-            return f"Unsupported selection method: {by}"
+            session = state["sessions"][session_id]
+            waiting = wait_after_click > 0 and settle != "none"
+            activity = session.get("activity")
+            handle = None
+            if waiting and settle == "navigation":
+                # 标记点击前的文档，新文档提交后标记自然消失
+                driver.execute_script(STALE_DOCUMENT_MARKER_SCRIPT)
+            elif waiting and settle == "networkidle" and activity is not None:
+                handle = driver.current_window_handle
+                activity.ensure_enabled(session["cdp"].connection(handle), handle)
         
-        element = wait.until(EC.element_to_be_clickable((by_method, selector)))
-        element.click()
+            with_element(driver, session["elements"], by_method, selector, "clickable", timeout,
+                         lambda element: element.click())
+            clicked = time.monotonic()
         
-        if wait_after_click > 0:
-            time.sleep(wait_after_click)
+            if not waiting:
+                return f"Successfully clicked element: {selector}"
+        
+            settled = True
+            try:
+                if settle == "sleep":
+                    time.sleep(wait_after_click)
+                elif settle == "dom":
+                    try:
+                        wait_dom_quiet(driver, quiet_ms, wait_after_click)
+                    except TimeoutException:
+                        raise
+                    except WebDriverException:
+                        # 点击触发了跳转，旧文档在脚本返回前被卸载
+                        wait_ready_state(driver, "interactive", wait_after_click - (time.monotonic() - clicked))
+                        session["elements"].invalidate()
+                elif settle == "navigation":
+                    wait_ready_state(driver, "interactive", wait_after_click)
+                    session["elements"].invalidate()
+                elif settle == "networkidle":
+                    if activity is not None:
+                        activity.wait_idle(handle, quiet_ms, wait_after_click, started_at=clicked)
+                    else:
+                        wait_resources_idle(driver, quiet_ms, wait_after_click)
+                elif settle == "selector":
+                    wait_selector(driver, settle_selector, wait_after_click)
+            except TimeoutException:
+                settled = False
+                if settle == "navigation":
+                    # 没有发生跳转，清除标记以免影响之后在该页面上的等待
+                    driver.execute_script(CLEAR_STALE_DOCUMENT_SCRIPT)
+            waited_ms = int((time.monotonic() - clicked) * 1000)
+            logger.debug(f"点击后等待{settle}: {waited_ms}ms，{'已满足' if settled else '达到上限'}")
         
-        return f"Successfully clicked element: {selector}"
+            if settle == "sleep":
+                return f"Successfully clicked element: {selector} (waited {waited_ms}ms)"
+            if settled:
+                return f"Successfully clicked element: {selector} (settled on {settle} after {waited_ms}ms)"
+            return f"Successfully clicked element: {selector} ({settle} not reached, stopped at the {wait_after_click}s cap after {waited_ms}ms)"
         
     except Exception as e:
         return f"Error clicking element: {str(e)}"
     
 @mcp.tool()
-def input_text(selector: str, text: str, by: str = "css", clear_first: bool = True, timeout: int = 10):
+@offload()
+def input_text(selector: str, text: str, by: str = "css", clear_first: bool = True, timeout: int = 10, session_id: str = None):
     """
     Input text into an element on the current page.
     :param selector: Element selector
@@ -593,93 +1140,160 @@ def input_text(selector: str, text: str, by: str = "css", clear_first: bool = Tr
     :param by: Selection method (css, xpath)
     :param clear_first: Whether to clear existing text first
     :param timeout: Maximum time to wait for element
+    :param session_id: Target browser session (defaults to the current session)
     """
     try:
-        driver = get_driver()
-        wait = WebDriverWait(driver, timeout)
+        with session_scope(session_id) as (session_id, driver):
+            if by.lower() == "css":
+                by_method = By.CSS_SELECTOR
+            elif by.lower() == "xpath":
+                by_method = By.XPATH
+            else:
+                return f"Unsupported selection method: {by}"
+        
+            def type_into(element):
+                if clear_first:
+                    element.clear()
+                element.send_keys(text)
+
+            with_element(driver, state["sessions"][session_id]["elements"], by_method, selector, "presence", timeout,
+                         type_into)
         
+            return f"Successfully input text '{text}' into element: {selector}"
+        
+    except Exception as e:
+        return f"Error inputting text: {str(e)}"
+    
+@mcp.tool()
+@offload()
+def fill_form(fields: Dict[str, Any], by: str = "css", native_keys: List[str] = None, timeout: int = 10,
+              session_id: str = None):
+    """
+    Fill several form fields at once.
+    Text inputs, textareas, selects, checkboxes and radios are set in one injected script that fires
+    input/change events; file inputs and fields listed in native_keys are typed with real key events.
+    :param fields: Map of selector to value. Checkboxes and radios take true/false, selects take an
+                   option value or label (a list for multi-selects), file inputs take a path or list of paths
+    :param by: Selection method for all selectors (css, xpath)
+    :param native_keys: Selectors that need real keyboard events (e.g. inputs with key handlers or masks)
+    :param timeout: Maximum time to wait for a native_keys field to appear. Other fields, file inputs included,
+                    are looked up once by the script and reported as "missing" if not on the page yet
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
         if by.lower() == "css":
             by_method = By.CSS_SELECTOR
         elif by.lower() == "xpath":
             by_method = By.XPATH
         else:
-            return f"Unsupported selection method: {by}"
-        
-        element = wait.until(EC.presence_of_element_located((by_method, selector)))
-        
-        if clear_first:
-            element.clear()
-        
-        element.send_keys(text)
-        
-        return f"Successfully input text '{text}' into element: {selector}"
-        
+            return {"success": False, "error": f"Unsupported selection method: {by}"}
+        if not fields:
+            return {"success": False, "error": "fields must map at least one selector to a value"}
+        with session_scope(session_id) as (session_id, driver):
+            started = time.monotonic()
+            results = driver.execute_script(FILL_SCRIPT, list(fields.items()), by.lower(), list(native_keys or []))
+            report, native = split_results(fields, results or [])
+            for entry in report:
+                if entry["selector"] not in native:
+                    continue
+                value = fields[entry["selector"]]
+
+                def type_into(element):
+                    if element.get_attribute("type") != "file":
+                        element.clear()
+                    element.send_keys(native_keys_text(value))
+
+                try:
+                    with_element(driver, state["sessions"][session_id]["elements"], by_method, entry["selector"],
+                                 "presence", timeout, type_into)
+                    entry["status"] = FILLED
+                    entry["native_keys"] = True
+                except Exception as e:
+                    entry["status"] = "error"
+                    entry["error"] = str(e)
+            failed = [entry for entry in report if entry["status"] != FILLED]
+            duration_ms = int((time.monotonic() - started) * 1000)
+            logger.info(f"会话{session_id}填写表单: {len(report) - len(failed)}/{len(report)}个字段，"
+                        f"其中{len(native)}个使用按键输入，耗时{duration_ms}ms")
+            result = {
+                "success": not failed,
+                "session_id": session_id,
+                "filled": len(report) - len(failed),
+                "native_keys": len(native),
+                "duration_ms": duration_ms,
+                "fields": report
+            }
+            if failed:
+                result["error"] = "Fields not filled: " + ", ".join(f"{entry['selector']} ({entry['status']})" for entry in failed)
+            return result
     except Exception as e:
-        return f"Error inputting text: {str(e)}"
+        logger.error(f"填写表单失败: {str(e)}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e)
+        }
     
 @mcp.tool()
-def take_screenshot(filename: str = None, full_page: bool = False, element_selector: str = None):
+@offload()
+def take_screenshot(filename: str = None, full_page: bool = False, element_selector: str = None, session_id: str = None, tab: str = None):
     """
     Take a screenshot of the current page.
     :param filename: Screenshot filename (auto-generated if not provided)
     :param full_page: Whether to capture full page
     :param element_selector: CSS selector for specific element screenshot
+    :param session_id: Target browser session (defaults to the current session)
+    :param tab: Tab handle or index from list_tabs (defaults to the active tab)
     """
     try:
-        driver = get_driver()
+        with session_scope(session_id, tab=tab) as (session_id, driver):
         
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"screenshot_{timestamp}.png"
+            if not filename:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                filename = f"screenshot_{timestamp}.png"
         
-        # Ensure screenshot directory exists
-        screenshot_dir = "./screenshots"
-        os.makedirs(screenshot_dir, exist_ok=True)
-        filepath = os.path.join(screenshot_dir, filename)
+            # Ensure screenshot directory exists
+            screenshot_dir = "./screenshots"
+            os.makedirs(screenshot_dir, exist_ok=True)
+            filepath = os.path.join(screenshot_dir, filename)
         
-        if element_selector:
-            # Screenshot specific element
-            element = driver.find_element(By.CSS_SELECTOR, element_selector)
-            element.screenshot(filepath)
-        else:
-            # Screenshot entire page
-            driver.save_screenshot(filepath)
+            if element_selector:
+                # Screenshot specific element
+                element = driver.find_element(By.CSS_SELECTOR, element_selector)
+                element.screenshot(filepath)
+            else:
+                # Screenshot entire page
+                driver.save_screenshot(filepath)
         
-        return f"Screenshot saved: {filepath}"
+            return f"Screenshot saved: {filepath}"
         
     except Exception as e:
         return f"Error taking screenshot: {str(e)}"
     
 @mcp.tool()
-def wait_for_element(selector: str, by: str = "css", timeout: int = 10, condition: str = "presence"):
+@offload()
+def wait_for_element(selector: str, by: str = "css", timeout: int = 10, condition: str = "presence", session_id: str = None):
     """
     Wait for an element to appear on the page.
     :param selector: Element selector
     :param by: Selection method (css, xpath)
     :param timeout: Maximum time to wait
     :param condition: Wait condition (presence, visible, clickable)
+    :param session_id: Target browser session (defaults to the current session)
     """
     try:
-        driver = get_driver()
-        wait = WebDriverWait(driver, timeout)
+        with session_scope(session_id) as (session_id, driver):
+            if by.lower() == "css":
+                by_method = By.CSS_SELECTOR
+            elif by.lower() == "xpath":
+                by_method = By.XPATH
+            else:
+                return f"Unsupported selection method: {by}"
         
-        if by.lower() == "css":
-            by_method = By.CSS_SELECTOR
-        elif by.lower() == "xpath":
-            by_method = By.XPATH
-        else:
-            return f"Unsupported selection method: {by}"
-        
-        if condition == "presence":
-            element = wait.until(EC.presence_of_element_located((by_method, selector)))
-        elif condition == "visible":
-            element = wait.until(EC.visibility_of_element_located((by_method, selector)))
-        elif condition == "clickable":
-            element = wait.until(EC.element_to_be_clickable((by_method, selector)))
-        else:
-            return f"Unsupported wait condition: {condition}"
+            if condition not in WAIT_CONDITIONS:
+                return f"Unsupported wait condition: {condition}"
         
-        return f"Element found: {element.tag_name}(text: '{element.text[:50]}...', visible: {element.is_displayed()})"
+            properties = wait_for(driver, state["sessions"][session_id]["elements"], by_method, selector, condition, timeout)
+            return f"Element found: {properties['tag']}(text: '{properties['text'][:50]}...', visible: {properties['visible']})"
         
     except TimeoutException:
         return f"Element wait timeout: {selector}"
@@ -687,55 +1301,503 @@ def wait_for_element(selector: str, by: str = "css", timeout: int = 10, conditio
         return f"Error waiting for element: {str(e)}"
     
 @mcp.tool()
-def get_page_info(include_html: bool = False, include_cookies: bool = False):
+@offload()
+def get_page_info(include_html: bool = False, include_cookies: bool = False, session_id: str = None):
     """
     Get information about the current page.
+    Every field is read through WebDriver, so the call waits for earlier calls on the same session
+    (for example a page load in progress); other sessions are not affected.
     :param include_html: Whether to include page HTML
     :param include_cookies: Whether to include cookies
+    :param session_id: Target browser session (defaults to the current session)
     """
     try:
-        driver = get_driver()
+        with session_scope(session_id) as (session_id, driver):
         
-        info = f"URL: {driver.current_url}\nTitle: {driver.title}\nWindow size: {driver.get_window_size()}"
+            info = f"URL: {driver.current_url}\nTitle: {driver.title}\nWindow size: {driver.get_window_size()}"
         
-        if include_html:
-            html_length = len(driver.page_source)
-            info += f"\nHTML length: {html_length} characters"
+            if include_html:
+                html_length = len(driver.page_source)
+                info += f"\nHTML length: {html_length} characters"
         
-        if include_cookies:
-            cookies = driver.get_cookies()
-            info += f"\nCookies count: {len(cookies)}"
+            if include_cookies:
+                cookies = driver.get_cookies()
+                info += f"\nCookies count: {len(cookies)}"
         
-        return info
+            return info
         
     except Exception as e:
         return f"Error getting page info: {str(e)}"
 
+def _describe_tabs(session: Dict[str, Any], driver) -> list:
+    """列出标签页的句柄、URL和标题，Chrome通过调试端口一次取回，其他浏览器逐个切换读取"""
+    handles = driver.window_handles
+    active = driver.current_window_handle
+    details = {}
+    if session.get("cdp"):
+        try:
+            for target in session["cdp"].targets():
+                details[target["id"]] = {"url": target.get("url"), "title": target.get("title")}
+        except Exception as e:
+            logger.debug(f"通过调试端口获取标签页信息失败: {e}")
+    tabs = []
+    for index, handle in enumerate(handles):
+        info = details.get(handle[len("CDwindow-"):] if handle.startswith("CDwindow-") else handle)
+        if info is None:
+            driver.switch_to.window(handle)
+            info = {"url": driver.current_url, "title": driver.title}
+        tabs.append({"index": index, "handle": handle, "active": handle == active, **info})
+    if driver.current_window_handle != active:
+        driver.switch_to.window(active)
+    return tabs
+
+
+@mcp.tool()
+@offload()
+def open_tab(url: str = None, switch: bool = True, session_id: str = None):
+    """
+    Open a new tab in an existing browser session.
+    Tabs share one browser process, so many pages can be checked with few browsers.
+    :param url: URL to load in the new tab (blank tab if omitted)
+    :param switch: Whether the new tab becomes the active tab
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
+        if url and is_blocked_host(url, blocked_domains):
+            return {"success": False, "error": f"Domain of {url} is blocked by security.blocked_domains"}
+        with session_scope(session_id) as (session_id, driver):
+            session = state["sessions"][session_id]
+            previous = driver.current_window_handle
+            driver.switch_to.new_window('tab')
+            handle = driver.current_window_handle
+            if session.get("cdp"):
+                # 先建立连接再导航，保证网络拦截和事件捕获覆盖新标签页的首次加载
+                session["cdp"].connection(handle)
+            if url:
+                origin = origin_of(url)
+                if origin:
+                    visited_origins.setdefault(id(driver), set()).add(origin)
+                driver.get(url)
+            title = driver.title
+            if switch:
+                session["elements"].invalidate()
+            else:
+                driver.switch_to.window(previous)
+            logger.info(f"会话{session_id}打开新标签页: {handle} {url or ''}")
+            return {
+                "success": True,
+                "session_id": session_id,
+                "handle": handle,
+                "index": driver.window_handles.index(handle),
+                "url": url or "about:blank",
+                "title": title,
+                "active": switch
+            }
+    except Exception as e:
+        logger.error(f"打开标签页失败: {str(e)}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@mcp.tool()
+@offload()
+def list_tabs(session_id: str = None):
+    """
+    List the tabs of a browser session.
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
+        with session_scope(session_id) as (session_id, driver):
+            tabs = _describe_tabs(state["sessions"][session_id], driver)
+            return {
+                "success": True,
+                "session_id": session_id,
+                "count": len(tabs),
+                "tabs": tabs
+            }
+    except Exception as e:
+        logger.error(f"列出标签页失败: {str(e)}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@mcp.tool()
+@offload()
+def switch_tab(tab: str, session_id: str = None):
+    """
+    Make a tab the active tab of its session.
+    :param tab: Tab handle or index from list_tabs
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
+        with session_scope(session_id) as (session_id, driver):
+            handle = resolve_tab(driver, tab)
+            driver.switch_to.window(handle)
+            state["sessions"][session_id]["elements"].invalidate()
+            return f"Switched to tab {handle}: {driver.title}"
+    except Exception as e:
+        return f"Error switching tab: {str(e)}"
+
+
+@mcp.tool()
+@offload()
+def close_tab(tab: str = None, session_id: str = None):
+    """
+    Close a tab. The last remaining tab cannot be closed (use close_browser instead).
+    :param tab: Tab handle or index from list_tabs (defaults to the active tab)
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
+        with session_scope(session_id) as (session_id, driver):
+            handles = driver.window_handles
+            active = driver.current_window_handle
+            handle = resolve_tab(driver, tab) if tab is not None else active
+            if len(handles) <= 1:
+                return "Error closing tab: cannot close the last tab, use close_browser instead"
+            if handle != active:
+                driver.switch_to.window(handle)
+            driver.close()
+            remaining = [candidate for candidate in handles if candidate != handle]
+            driver.switch_to.window(active if active != handle else remaining[-1])
+            session = state["sessions"][session_id]
+            if handle == active:
+                session["elements"].invalidate()
+            if session.get("cdp"):
+                session["cdp"].drop(handle)
+                session["activity"].forget(handle)
+                session["helpers"].forget(handle)
+            return f"Closed tab {handle}. Active tab: {driver.current_window_handle} ({len(remaining)} open)"
+    except Exception as e:
+        return f"Error closing tab: {str(e)}"
+
+
+@mcp.tool()
+@offload()
+def reset_session(clear_cache: bool = False, session_id: str = None):
+    """
+    Reset a browser session in place instead of closing and relaunching it.
+    Closes extra tabs, clears cookies, storage and service workers, then navigates to about:blank.
+    :param clear_cache: Also clear the HTTP cache (slower next page load)
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
+        with session_scope(session_id) as (session_id, driver):
+            session = state["sessions"][session_id]
+            result = reset_browser_state(driver, visited_origins.pop(id(driver), ()), clear_cache)
+            session["console"].clear()
+            session["elements"].invalidate()
+            if session.get("cdp"):
+                for handle in result["closed_tabs"]:
+                    session["cdp"].drop(handle)
+                    session["activity"].forget(handle)
+                    session["helpers"].forget(handle)
+            logger.info(f"会话{session_id}已重置，方式: {result['kind']}，耗时{result['duration_ms']}ms")
+            return {
+                "success": True,
+                "session_id": session_id,
+                "reset_kind": result["kind"],
+                "reset_ms": result["duration_ms"],
+                "cold_launch_ms": browser_pool.last_launch_ms,
+                "closed_tabs": len(result["closed_tabs"]),
+                "cleared_origins": result["cleared_origins"],
+                "cleared_cache": result["cleared_cache"]
+            }
+    except Exception as e:
+        logger.error(f"重置会话失败: {str(e)}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@mcp.tool()
+@offload()
+def set_network_mode(mode: str = "off", cache_dir: str = None, strict: bool = None, session_id: str = None):
+    """
+    Switch network record/replay for a Chrome session (CDP Fetch interception).
+    security.blocked_domains is always enforced on the same interception layer.
+    :param mode: "record" saves responses to the on-disk cache, "replay" serves cached responses
+                 to navigate_to_url without the network, "off" disables both
+    :param cache_dir: Cache directory (default: network.cache_dir in config.json)
+    :param strict: In replay mode, fail requests missing from the cache instead of fetching them
+                   (default: network.strict_replay in config.json)
+    :param session_id: Target browser session (defaults to the current session)
+    """
+    try:
+        if mode not in NETWORK_MODES:
+            return {"success": False, "error": f"Unsupported network mode: {mode}. Use one of {list(NETWORK_MODES)}"}
+        with session_scope(session_id) as (session_id, driver):
+            interceptor = state["sessions"][session_id].get("network")
+            if interceptor is None:
+                return {
+                    "success": False,
+                    "error": "Network record/replay requires a Chrome session with CDP access"
+                }
+            if strict is None:
+                strict = network_config.get('strict_replay', False)
+            interceptor.set_mode(mode, NetworkCache(cache_dir) if cache_dir else None, strict)
+            return {
+                "success": True,
+                "session_id": session_id,
+                "network": interceptor.stats(),
+                "cache": interceptor.cache.stats()
+            }
+    except Exception as e:
+        logger.error(f"切换网络模式失败: {str(e)}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@mcp.tool()
+def get_browser_diagnostics(refresh: bool = False):
+    """
+    Report the cached browser launch backends, warm pool, debugging ports and executor state.
+    :param refresh: Drop the cached launch backends so the next launch re-runs discovery
+    """
+    try:
+        if refresh:
+            launcher_discovery.invalidate()
+            launcher_discovery.probe_all()
+            logger.info("已清除启动后端缓存，下次启动将重新探测")
+        return {
+            "success": True,
+            "launchers": launcher_discovery.report(),
+            "pool": browser_pool.stats(),
+            "debug_ports_in_use": sorted(port_allocator.in_use()),
+            "executor": session_executor.stats(),
+            "sessions": {
+                session_id: {
+                    "profile": list(session["profile"]),
+                    "debug_port": session["debug_port"],
+                    "cdp_connected": session.get("cdp") is not None,
+                    "network": session["network"].stats() if session.get("network") else None,
+                    "console": {"mode": "push" if session["console"].streaming else "poll", **session["console"].buffer.stats()},
+                    "element_cache": {"entries": len(session["elements"]), "generation": session["elements"].generation,
+                                      **session["elements"].counters},
+                }
+                for session_id, session in list(state["sessions"].items())
+            },
+            "current_session": state["current_session"],
+            "console_history": console_store.stats() if console_store else None,
+        }
+    except Exception as e:
+        logger.error(f"获取浏览器诊断信息失败: {str(e)}", exc_info=True)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+
+@mcp.tool()
+@offload(per_session=False)
+def query_console_history(url: str = None, level: str = None, error_type: str = None, text: str = None,
+                          fingerprint: str = None, session_id: str = None, last_minutes: float = None,
+                          start_time: int = None, end_time: int = None, group_by_fingerprint: bool = False,
+                          limit: int = 100):
+    """
+    Query console logs persisted across sessions (requires console.history_enabled in config.json).
+    Works for closed sessions too, e.g. all TypeErrors on /checkout in the last hour:
+    query_console_history(url="/checkout", error_type="TypeError", last_minutes=60)
+    :param url: Page path prefix when it starts with "/", otherwise full page URL prefix
+    :param level: Log level (ERROR, WARNING, INFO, VERBOSE). Browser levels are normalized the same way as
+                  stored rows, so SEVERE matches ERROR and DEBUG matches VERBOSE
+    :param error_type: Error type such as TypeError or ReferenceError
+    :param text: Substring the message must contain
+    :param fingerprint: Message fingerprint (from aggregated get_console_logs results)
+    :param session_id: Only logs from this session (closed sessions included)
+    :param last_minutes: Only logs from the last N minutes
+    :param start_time: Only logs at or after this epoch-millisecond timestamp
+    :param end_time: Only logs at or before this epoch-millisecond timestamp
+    :param group_by_fingerprint: Return one row per fingerprint with count, first/last timestamps
+                                 and the number of sessions it appeared in
+    :param limit: Maximum number of rows (newest first)
+    """
+    if console_store is None:
+        return {"success": False, "error": "Console history is disabled. Set console.history_enabled to true in config.json"}
+    try:
+        if last_minutes is not None:
+            cutoff = int((time.time() - last_minutes * 60) * 1000)
+            start_time = max(start_time, cutoff) if start_time is not None else cutoff
+        rows = console_store.query(session_id, url, level, error_type, fingerprint, text,
+                                   start_time, end_time, limit, group_by_fingerprint)
+        for row in rows:
+            for key in ("timestamp", "first_timestamp", "last_timestamp"):
+                if row.get(key) is not None:
+                    row[key.replace("timestamp", "datetime")] = _format_datetime(row[key])
+        logger.info(f"查询控制台历史，返回{len(rows)}条结果")
+        return {
+            "success": True,
+            "count": len(rows),
+            "grouped": group_by_fingerprint,
+            "results": rows,
+            "store": console_store.stats()
+        }
+    except Exception as e:
+        logger.error(f"查询控制台历史失败: {str(e)}", exc_info=True)
+        return {"success": False, "error": str(e)}
+
+
+def _close_session(session_id: str) -> bool:
+    """
+    关闭单个会话：等待该会话正在执行的操作结束，然后把浏览器归还到池中
+    """
+    session = state["sessions"].get(session_id)
+    lock = session["lock"] if session else threading.RLock()
+    with lock:
+        driver = state["drivers"].pop(session_id, None)
+        state["sessions"].pop(session_id, None)
+        if state["current_session"] == session_id:
+            state["current_session"] = None
+    if not driver:
+        return False
+    if session and session.get("cdp"):
+        session["cdp"].close()
+    try:
+        session_executor.discard_lane(session_id)
+        pooled = browser_pool.release(driver)
+        logger.debug(f"已关闭会话: {session_id}{'，浏览器已归还到池中' if pooled else ''}")
+    except Exception as close_error:
+        logger.warning(f"关闭会话{session_id}时出错: {close_error}")
+    return True
+
+
 @mcp.tool()
-def close_browser():
+@offload(per_session=False)
+def close_browser(session_id: str = None):
     """
-    Close the browser instance.
+    Close a browser session, or all sessions when session_id is not given.
+    Healthy drivers are returned to the warm pool.
+    :param session_id: Session to close (closes every session if omitted)
     """
     try:
-        # Close all drivers in state
+        if session_id:
+            if not _close_session(session_id):
+                return f"Browser session not found: {session_id}"
+            return f"Closed browser session: {session_id}"
+        
+        # Release all drivers in state back to the pool
         closed_count = 0
-        for session_id, driver in list(state["drivers"].items()):
-            if driver:
-                try:
-                    driver.quit()
-                    logger.debug(f"已关闭会话: {session_id}")
-                except Exception as close_error:
-                    logger.warning(f"关闭会话{session_id}时出错: {close_error}")
+        for candidate in list(state["drivers"].keys()):
+            if _close_session(candidate):
                 closed_count += 1
         
-        # 清空状态
-        state["drivers"].clear()
-        state["current_session"] = None
-        
         return f"Closed {closed_count} browser session(s)"
     except Exception as e:
         return f"Error closing browser: {str(e)}"
 
+def _implementation(tool):
+    """去掉offload和认证装饰器，得到同步实现"""
+    while hasattr(tool, "__wrapped__"):
+        tool = tool.__wrapped__
+    return tool
+
+
+# run_steps可以执行的操作：同步实现，以及是否接收current_user等额外参数
+STEP_ACTIONS = {
+    tool.__name__: (_implementation(tool), any(
+        parameter.kind is inspect.Parameter.VAR_KEYWORD
+        for parameter in inspect.signature(_implementation(tool)).parameters.values()
+    ))
+    for tool in (
+        navigate_to_url, wait_for_element, input_text, fill_form, click_element, execute_javascript,
+        get_console_logs, get_performance_metrics, take_screenshot, get_page_info,
+        open_tab, switch_tab, close_tab, call_js_helper,
+    )
+}
+
+
+# 各工具失败时返回的字符串前缀
+STEP_FAILURE_PREFIXES = ("Error", "Unsupported", "Element wait timeout")
+
+
+def _step_failed(result) -> bool:
+    """各工具的失败返回：success为False的字典，或以STEP_FAILURE_PREFIXES开头的字符串"""
+    if isinstance(result, dict):
+        return result.get("success") is False
+    return isinstance(result, str) and result.startswith(STEP_FAILURE_PREFIXES)
+
+
+@mcp.tool()
+@offload()
+@browser_mcp_auth_required
+def run_steps(steps: List[Dict[str, Any]], stop_on_error: bool = True, session_id: str = None,
+              current_user: Dict[str, Any] = None):
+    """
+    Run several browser operations server-side in one call, under a single session lock.
+    Each step is {"action": <tool name>, ...that tool's parameters}, e.g.
+    [{"action": "navigate_to_url", "url": "https://example.com", "wait_until": "domcontentloaded"},
+     {"action": "input_text", "selector": "#q", "text": "shoes"},
+     {"action": "click_element", "selector": "#search"},
+     {"action": "get_console_logs", "level": "ERROR", "format": "summary"}]
+    Supported actions: navigate_to_url, wait_for_element, input_text, fill_form, click_element, execute_javascript,
+    get_console_logs, get_performance_metrics, take_screenshot, get_page_info, open_tab, switch_tab, close_tab,
+    call_js_helper.
+    :param steps: Ordered list of steps
+    :param stop_on_error: Stop at the first failing step (remaining steps are reported as skipped)
+    :param session_id: Target browser session for every step (defaults to the current session)
+    :param current_user: Filled in by the authentication decorator; callers leave it out
+    """
+    # 显式声明而不是**kwargs，否则FastMCP会把kwargs列为必填参数
+    current_user = current_user or {}
+    started = time.monotonic()
+    results = []
+    failed_step = None
+    try:
+        with session_scope(session_id) as (session_id, driver):
+            logger.info(f"用户 {current_user.get('username', 'unknown')} 批量执行{len(steps)}个步骤，会话: {session_id}")
+            for index, step in enumerate(steps):
+                params = dict(step)
+                action = params.pop("action", None)
+                step_started = time.monotonic()
+                if action not in STEP_ACTIONS:
+                    result = f"Unsupported action: {action}. Use one of {sorted(STEP_ACTIONS)}"
+                elif "session_id" in params:
+                    result = "Error: steps run in the session given to run_steps; remove session_id from the step"
+                else:
+                    implementation, accepts_extra = STEP_ACTIONS[action]
+                    if accepts_extra:
+                        params["current_user"] = current_user
+                    try:
+                        result = implementation(session_id=session_id, **params)
+                    except TypeError as e:
+                        result = f"Error: invalid parameters for {action}: {e}"
+                ok = not _step_failed(result)
+                results.append({
+                    "index": index,
+                    "action": action,
+                    "ok": ok,
+                    "duration_ms": int((time.monotonic() - step_started) * 1000),
+                    "result": result
+                })
+                if not ok:
+                    logger.warning(f"步骤{index}（{action}）失败: {str(result)[:200]}")
+                    if failed_step is None:
+                        failed_step = index
+                    if stop_on_error:
+                        break
+    except Exception as e:
+        logger.error(f"批量执行步骤失败: {str(e)}", exc_info=True)
+        return {"success": False, "error": str(e), "steps": results}
+
+    total_ms = int((time.monotonic() - started) * 1000)
+    logger.info(f"批量执行完成: {len(results)}/{len(steps)}个步骤，耗时{total_ms}ms")
+    return {
+        "success": failed_step is None,
+        "session_id": session_id,
+        "completed": sum(1 for result in results if result["ok"]),
+        "failed_step": failed_step,
+        "skipped": len(steps) - len(results),
+        "total_ms": total_ms,
+        "steps": results
+    }
+
+
 # Run the FastMCP server
 if __name__ == "__main__":
     logger.info("启动FastMCP服务器...")
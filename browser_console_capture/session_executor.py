@@ -0,0 +1,66 @@
+"""WebDriver调用执行器
+把阻塞的Selenium调用从MCP事件循环转移到有界线程池中执行，
+每个浏览器会话一条执行通道：同一会话的调用按顺序排队，不同会话互不阻塞
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionExecutor:
+    """
+    有界线程池 + 会话通道
+
+    排队等待的调用挂在事件循环上的asyncio.Lock中，不占用工作线程，
+    因此一个会话的长时间页面加载不会耗尽线程池。
+
+    Args:
+        max_workers: 工作线程数量上限
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max(1, int(max_workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="webdriver")
+        self._lanes: Dict[str, asyncio.Lock] = {}
+
+    async def run(self, lane: Optional[str], func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在线程池中执行func
+
+        Args:
+            lane: 执行通道（会话ID），为None时不排队，直接提交到线程池
+            func: 阻塞函数
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        if lane is None:
+            return await loop.run_in_executor(self._pool, call)
+
+        lock = self._lanes.get(lane)
+        if lock is None:
+            lock = self._lanes[lane] = asyncio.Lock()
+        async with lock:
+            return await loop.run_in_executor(self._pool, call)
+
+    def discard_lane(self, lane: str) -> None:
+        """会话关闭后丢弃空闲的执行通道"""
+        lock = self._lanes.get(lane)
+        if lock is not None and not lock.locked():
+            self._lanes.pop(lane, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回执行器状态"""
+        return {
+            "max_workers": self.max_workers,
+            "lanes": len(self._lanes),
+            "busy_lanes": sum(1 for lock in self._lanes.values() if lock.locked()),
+        }
+
+    def shutdown(self) -> None:
+        """关闭线程池，不等待正在执行的调用"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
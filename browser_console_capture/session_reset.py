@@ -0,0 +1,142 @@
+"""浏览器会话快速重置
+在现有驱动中清除Cookie、存储、Service Worker和多余标签页并回到about:blank，
+代替close_browser + start_browser的冷启动。
+Chromium需要逐个源清除存储：除了工具导航过的源，还从每个标签页的导航历史
+（链接点击、重定向后到达的页面）和框架树（iframe）中收集源
+"""
+
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 非Chromium浏览器在当前页面内清除存储（只能覆盖当前源）
+CLEAR_STORAGE_SCRIPT = """
+var done = arguments[arguments.length - 1];
+try { localStorage.clear(); } catch (e) {}
+try { sessionStorage.clear(); } catch (e) {}
+var tasks = [];
+if (navigator.serviceWorker && navigator.serviceWorker.getRegistrations) {
+    tasks.push(navigator.serviceWorker.getRegistrations().then(function (regs) {
+        return Promise.all(regs.map(function (reg) { return reg.unregister(); }));
+    }));
+}
+if (window.caches && caches.keys) {
+    tasks.push(caches.keys().then(function (keys) {
+        return Promise.all(keys.map(function (key) { return caches.delete(key); }));
+    }));
+}
+if (window.indexedDB && indexedDB.databases) {
+    tasks.push(indexedDB.databases().then(function (dbs) {
+        dbs.forEach(function (db) { indexedDB.deleteDatabase(db.name); });
+    }));
+}
+Promise.all(tasks).then(function () { done(true); }, function () { done(false); });
+"""
+
+
+def origin_of(url: str) -> Optional[str]:
+    """返回http(s) URL的源，其他URL返回None"""
+    parts = urlsplit(url or "")
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def tab_origins(driver) -> Set[str]:
+    """当前标签页导航历史和框架树中出现的所有源（通过CDP读取）"""
+    origins = set()
+    history = driver.execute_cdp_cmd("Page.getNavigationHistory", {})
+    for entry in history.get("entries", []):
+        origins.add(origin_of(entry.get("url")))
+        origins.add(origin_of(entry.get("userTypedURL")))
+    nodes = [driver.execute_cdp_cmd("Page.getFrameTree", {}).get("frameTree")]
+    while nodes:
+        node = nodes.pop()
+        if not node:
+            continue
+        frame = node.get("frame", {})
+        origins.add(origin_of(frame.get("url")))
+        origins.add(origin_of(frame.get("securityOrigin")))
+        nodes.extend(node.get("childFrames", []))
+    origins.discard(None)
+    return origins
+
+
+def reset_browser_state(driver, origins: Iterable[str] = (), clear_cache: bool = False) -> Dict[str, Any]:
+    """
+    重置驱动的浏览状态
+
+    Chromium通过CDP清除全部Cookie以及各个源的存储（包括Service Worker）；
+    其他浏览器退化为WebDriver删除Cookie并在当前页面内用脚本清除存储。
+
+    Args:
+        driver: WebDriver实例
+        origins: 会话访问过的源，各标签页历史和框架树中的源以及当前页面的源会自动加入
+        clear_cache: 是否同时清除HTTP缓存（会让下次加载变慢）
+
+    Returns:
+        dict: kind（cdp或webdriver）、closed_tabs、cleared_origins、duration_ms
+    """
+    started_at = time.time()
+    origins = set(origins)
+    use_cdp = hasattr(driver, "execute_cdp_cmd")
+    handles = driver.window_handles
+    closed_tabs = []
+    for index, handle in enumerate(handles):
+        driver.switch_to.window(handle)
+        if use_cdp:
+            try:
+                origins |= tab_origins(driver)
+            except Exception as e:
+                logger.debug(f"读取标签页{handle}的导航历史失败: {e}")
+        if index > 0:
+            driver.close()
+            closed_tabs.append(handle)
+    driver.switch_to.window(handles[0])
+
+    current_origin = origin_of(driver.current_url)
+    if current_origin:
+        origins.add(current_origin)
+
+    kind = "webdriver"
+    if use_cdp:
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in origins:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            if clear_cache:
+                driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            if current_origin:
+                # sessionStorage按标签页保存，不在clearDataForOrigin范围内
+                driver.execute_script("try { sessionStorage.clear(); } catch (e) {}")
+            kind = "cdp"
+        except Exception as e:
+            logger.debug(f"CDP重置失败，改用WebDriver重置: {e}")
+
+    if kind == "webdriver":
+        driver.delete_all_cookies()
+        if current_origin:
+            try:
+                driver.execute_async_script(CLEAR_STORAGE_SCRIPT)
+            except Exception as e:
+                logger.debug(f"清除页面存储失败: {e}")
+
+    driver.get("about:blank")
+    try:
+        # 丢弃残留的浏览器日志
+        driver.get_log('browser')
+    except Exception:
+        pass
+
+    result = {
+        "kind": kind,
+        "closed_tabs": closed_tabs,
+        "cleared_origins": sorted(origins) if kind == "cdp" else ([current_origin] if current_origin else []),
+        "cleared_cache": clear_cache and kind == "cdp",
+        "duration_ms": int((time.time() - started_at) * 1000),
+    }
+    logger.debug(f"浏览器状态已重置: {result}")
+    return result
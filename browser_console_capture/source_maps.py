@@ -0,0 +1,331 @@
+"""Source Map解析与缓存
+把压缩脚本中的位置映射回源码位置：
+- 每个脚本URL只下载一次Source Map，原始JSON保存在大小受限的磁盘LRU缓存中
+- 解析后的映射保存在内存LRU中，同一bundle的重复错误不会重复下载或解析
+- 网络错误等临时失败不缓存，下次解析时重试；security.blocked_domains中的域名不下载
+"""
+
+import base64
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urljoin
+
+import requests
+
+from network_cache import is_blocked_host
+
+logger = logging.getLogger(__name__)
+
+BASE64_DIGITS = {char: index for index, char in enumerate(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/")}
+
+# 脚本末尾的sourceMappingURL注释
+SOURCE_MAPPING_URL_PATTERN = re.compile(r"[#@]\s*sourceMappingURL=(\S+)\s*(?:\*/)?\s*$")
+
+
+def decode_vlq(segment: str) -> List[int]:
+    """解码一个Base64 VLQ片段"""
+    values = []
+    value = 0
+    shift = 0
+    for char in segment:
+        digit = BASE64_DIGITS[char]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+            continue
+        values.append(-(value >> 1) if value & 1 else value >> 1)
+        value = 0
+        shift = 0
+    return values
+
+
+class SourceMap:
+    """
+    解析后的Source Map（v3，不支持sections索引格式）
+
+    Args:
+        data: Source Map JSON
+        map_url: Source Map地址，用于解析相对的源文件路径
+    """
+
+    def __init__(self, data: Dict[str, Any], map_url: str):
+        if "sections" in data:
+            raise ValueError("不支持sections格式的Source Map")
+        root = data.get("sourceRoot") or ""
+        if root and not root.endswith("/"):
+            root += "/"
+        self.sources = [urljoin(map_url, root + (source or "")) for source in data.get("sources", [])]
+        self.names = data.get("names", [])
+        # 每个生成行: (生成列列表, 对应的(源文件下标, 源行, 源列, 名称下标)列表)
+        self._lines: List[Tuple[List[int], List[Tuple[int, int, int, Optional[int]]]]] = []
+        self._parse(data.get("mappings", ""))
+
+    def _parse(self, mappings: str) -> None:
+        source = original_line = original_column = name = 0
+        for line_text in mappings.split(";"):
+            columns: List[int] = []
+            targets: List[Tuple[int, int, int, Optional[int]]] = []
+            column = 0
+            for segment in line_text.split(","):
+                if not segment:
+                    continue
+                fields = decode_vlq(segment)
+                column += fields[0]
+                if len(fields) < 4:
+                    continue
+                source += fields[1]
+                original_line += fields[2]
+                original_column += fields[3]
+                name_index = None
+                if len(fields) >= 5:
+                    name += fields[4]
+                    name_index = name
+                columns.append(column)
+                targets.append((source, original_line, original_column, name_index))
+            self._lines.append((columns, targets))
+
+    def lookup(self, line: int, column: int) -> Optional[Dict[str, Any]]:
+        """
+        查找生成位置对应的源码位置
+
+        Args:
+            line: 生成代码的行（0起始）
+            column: 生成代码的列（0起始）
+
+        Returns:
+            dict: source、line、column（1起始）和name，找不到时返回None
+        """
+        if line < 0 or line >= len(self._lines):
+            return None
+        columns, targets = self._lines[line]
+        index = bisect.bisect_right(columns, column) - 1
+        if index < 0:
+            return None
+        source, original_line, original_column, name_index = targets[index]
+        return {
+            "source": self.sources[source] if source < len(self.sources) else None,
+            "line": original_line + 1,
+            "column": original_column + 1,
+            "name": self.names[name_index] if name_index is not None and name_index < len(self.names) else None,
+        }
+
+
+def find_source_mapping_url(script: str) -> Optional[str]:
+    """
+    脚本最后一个sourceMappingURL注释的值
+    内联data: Source Map通常有几十KB，注释本身可能远在最后几KB之前，
+    所以先用rfind定位，再从该位置匹配
+    """
+    index = script.rfind("sourceMappingURL=")
+    if index < 0:
+        return None
+    # 注释前缀 "//# " 或 "/*# " 及可能的空白
+    start = script.rfind("\n", 0, index) + 1
+    match = SOURCE_MAPPING_URL_PATTERN.search(script, max(start, index - 16))
+    return match.group(1) if match else None
+
+
+def _http_fetch(url: str, timeout: float) -> Tuple[str, Dict[str, str]]:
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.text, dict(response.headers)
+
+
+class SourceMapResolver:
+    """
+    按脚本URL缓存Source Map并解析位置
+
+    Args:
+        cache_dir: 磁盘缓存目录
+        max_bytes: 磁盘缓存上限，超出时删除最久未使用的文件
+        memory_maps: 内存中保留的已解析Source Map数量
+        timeout: 下载超时（秒）
+        fetch: 下载函数，参数为(url, timeout)，返回(文本, 响应头)；HTTP错误抛出带response的异常
+        blocked_domains: 不下载的域名（security.blocked_domains），脚本和Source Map地址都会检查
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 50 * 1024 * 1024, memory_maps: int = 32,
+                 timeout: float = 5, fetch: Callable[[str, float], Tuple[str, Dict[str, str]]] = _http_fetch,
+                 blocked_domains: Iterable[str] = ()):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_maps = memory_maps
+        self.timeout = timeout
+        self._fetch = fetch
+        self.blocked_domains = list(blocked_domains)
+        self._maps: "OrderedDict[str, Optional[SourceMap]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "downloads": 0, "failures": 0, "blocked": 0}
+
+    def resolve(self, script_url: str, line: int, column: int) -> Optional[Dict[str, Any]]:
+        """把脚本中的位置（0起始）解析为源码位置，没有Source Map时返回None"""
+        if not script_url or not script_url.startswith(("http://", "https://")):
+            return None
+        source_map = self.get(script_url)
+        return source_map.lookup(line, column) if source_map is not None else None
+
+    def get(self, script_url: str) -> Optional[SourceMap]:
+        """
+        获取脚本的Source Map，依次查找内存、磁盘缓存和网络
+        磁盘和网络查找不持有全局锁，慢的Source Map服务器只阻塞同一脚本URL的请求
+        """
+        with self._lock:
+            if script_url in self._maps:
+                self._maps.move_to_end(script_url)
+                self.counters["memory_hits"] += 1
+                return self._maps[script_url]
+            url_lock = self._url_locks.setdefault(script_url, threading.Lock())
+        with url_lock:
+            with self._lock:
+                # 等待期间其他线程可能已经下载完成
+                if script_url in self._maps:
+                    self.counters["memory_hits"] += 1
+                    return self._maps[script_url]
+            source_map = self._load_from_disk(script_url)
+            cacheable = True
+            if source_map is None:
+                source_map, cacheable = self._download(script_url)
+            with self._lock:
+                # 确定没有Source Map的脚本同样记入内存，避免重复请求；临时的下载失败不记入
+                if cacheable:
+                    self._maps[script_url] = source_map
+                    if len(self._maps) > self.memory_maps:
+                        self._maps.popitem(last=False)
+                self._url_locks.pop(script_url, None)
+            return source_map
+
+    def stats(self) -> Dict[str, Any]:
+        files, size = self._disk_usage()
+        return {"cache_dir": self.cache_dir, "disk_files": len(files), "disk_bytes": size,
+                "memory_maps": len(self._maps), **self.counters}
+
+    # ------------------------------------------------------------------
+    # 磁盘缓存
+    # ------------------------------------------------------------------
+    def _path(self, script_url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(script_url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_from_disk(self, script_url: str) -> Optional[SourceMap]:
+        path = self._path(script_url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            source_map = SourceMap(cached["map"], cached["map_url"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"读取Source Map缓存失败 {script_url}: {e}")
+            return None
+        os.utime(path)
+        self.counters["disk_hits"] += 1
+        return source_map
+
+    def _save_to_disk(self, script_url: str, map_url: str, data: Dict[str, Any]) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(script_url)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"script_url": script_url, "map_url": map_url, "map": data, "saved_at": time.time()}, f)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            logger.warning(f"写入Source Map缓存失败 {script_url}: {e}")
+
+    def _disk_usage(self):
+        files = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if name.endswith(".json"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # 其他线程淘汰了该文件
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files, sum(size for _, size, _ in files)
+
+    def _evict(self) -> None:
+        """删除最久未使用的缓存文件直到总大小不超过上限"""
+        files, size = self._disk_usage()
+        for _, file_size, path in sorted(files):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                size -= file_size
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # 下载
+    # ------------------------------------------------------------------
+    def _blocked(self, url: str) -> bool:
+        if is_blocked_host(url, self.blocked_domains):
+            self.counters["blocked"] += 1
+            logger.debug(f"Source Map地址属于屏蔽域名，不下载: {url}")
+            return True
+        return False
+
+    def _download(self, script_url: str) -> Tuple[Optional[SourceMap], bool]:
+        """
+        下载并解析Source Map
+
+        Returns:
+            tuple: (Source Map, 结果是否可以缓存)。没有Source Map、4xx、内容无法解析或域名被屏蔽是确定的结果；
+            网络错误、超时和5xx不缓存，下次解析同一脚本时重试
+        """
+        if self._blocked(script_url):
+            return None, True
+        try:
+            script, headers = self._fetch(script_url, self.timeout)
+            headers = {key.lower(): value for key, value in headers.items()}
+            reference = headers.get("sourcemap") or headers.get("x-sourcemap")
+            if not reference:
+                reference = find_source_mapping_url(script)
+            if not reference:
+                logger.debug(f"脚本没有Source Map: {script_url}")
+                return None, True
+            inline = reference.startswith("data:")
+            if inline:
+                # 内联Source Map
+                map_url, text = script_url, reference
+            else:
+                map_url = urljoin(script_url, reference)
+                if self._blocked(map_url):
+                    return None, True
+                text, _ = self._fetch(map_url, self.timeout)
+        except Exception as e:
+            self.counters["failures"] += 1
+            response = getattr(e, "response", None)
+            definitive = response is not None and 400 <= response.status_code < 500
+            logger.debug(f"获取Source Map失败{'' if definitive else '（稍后重试）'} {script_url}: {e}")
+            return None, definitive
+        try:
+            if inline:
+                meta, _, payload = text.partition(",")
+                text = base64.b64decode(payload).decode("utf-8") if ";base64" in meta else unquote(payload)
+            data = json.loads(text)
+            source_map = SourceMap(data, map_url)
+        except Exception as e:
+            self.counters["failures"] += 1
+            logger.debug(f"解析Source Map失败 {script_url}: {e}")
+            return None, True
+        self.counters["downloads"] += 1
+        self._save_to_disk(script_url, map_url, data)
+        logger.info(f"已缓存Source Map: {script_url} -> {map_url}")
+        return source_map, True
@@ -0,0 +1,70 @@
+"""调用栈解析
+把日志中的调用栈整理为结构化的帧列表：
+- CDP推送的日志直接使用事件中的callFrames
+- 轮询得到的日志从消息文本中解析V8（"at fn (url:行:列)"）和Firefox（"fn@url:行:列"）格式的帧
+并可通过SourceMapResolver把压缩代码中的位置还原为源码位置
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+# V8: "    at fn (http://x/a.js:1:2)"、"    at http://x/a.js:1:2"、"    at async fn (...)"
+V8_FRAME_PATTERN = re.compile(
+    r"^\s*at (?:async )?(?:(?P<function>[^\n]*?) \()?(?P<url>[^\s()]+?):(?P<line>\d+):(?P<column>\d+)\)?\s*$",
+    re.MULTILINE,
+)
+# Firefox/Safari: "fn@http://x/a.js:1:2"
+GECKO_FRAME_PATTERN = re.compile(
+    r"^\s*(?P<function>[^@\s]*)@(?P<url>\S+?):(?P<line>\d+):(?P<column>\d+)\s*$",
+    re.MULTILINE,
+)
+
+
+def parse_stack(message: str) -> List[Dict[str, Any]]:
+    """
+    从消息文本中解析调用栈帧
+
+    Returns:
+        list: 帧列表，每帧包含function、url、line、column（行列1起始）
+    """
+    if not message:
+        return []
+    for marker, pattern in (("at ", V8_FRAME_PATTERN), ("@", GECKO_FRAME_PATTERN)):
+        if marker not in message:
+            continue
+        frames = [
+            {
+                "function": match.group("function") or "",
+                "url": match.group("url"),
+                "line": int(match.group("line")),
+                "column": int(match.group("column")),
+            }
+            for match in pattern.finditer(message)
+        ]
+        if frames:
+            return frames
+    return []
+
+
+def entry_frames(entry) -> List[Dict[str, Any]]:
+    """返回一条日志的调用栈帧，优先使用CDP提供的结构化调用栈"""
+    if entry.stack:
+        return [
+            {"function": function, "url": url, "line": line + 1, "column": column + 1}
+            for function, url, line, column in entry.stack
+        ]
+    return parse_stack(entry.message)
+
+
+def resolve_frames(frames: List[Dict[str, Any]], resolver) -> List[Dict[str, Any]]:
+    """
+    为每帧补充original字段（源码位置），无法解析时为None
+
+    Args:
+        frames: entry_frames/parse_stack返回的帧列表
+        resolver: SourceMapResolver
+    """
+    for frame in frames:
+        original: Optional[Dict[str, Any]] = resolver.resolve(frame["url"], frame["line"] - 1, frame["column"] - 1)
+        frame["original"] = original
+    return frames
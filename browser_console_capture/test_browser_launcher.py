@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""浏览器启动后端缓存测试"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from browser_launcher import LaunchBackend, LauncherDiscovery
+
+
+class FakeBackend(LaunchBackend):
+    def __init__(self, name, browser, available=True):
+        super().__init__(name, browser)
+        self.available = available
+        self.probes = 0
+
+    def probe(self):
+        self.probes += 1
+        return self.available, "fake"
+
+
+class FakeDriver:
+    capabilities = {"browserVersion": "120"}
+
+
+class Launcher:
+    """记录启动顺序，failing中的后端启动失败"""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = set()
+
+    def __call__(self, backend):
+        self.calls.append(backend.name)
+        if backend.name in self.failing:
+            raise RuntimeError(f"{backend.name} crashed")
+        return FakeDriver()
+
+
+def make_discovery():
+    pinned = FakeBackend("chrome_pinned", "chrome", available=False)
+    system = FakeBackend("chrome_system", "chrome")
+    firefox = FakeBackend("firefox", "firefox")
+    return LauncherDiscovery({"chrome": [pinned, system, firefox]}), (pinned, system, firefox)
+
+
+def test_resolved_backend_is_cached():
+    """首次启动走回退链，之后直接使用缓存的后端，不再探测"""
+    discovery, (pinned, system, _) = make_discovery()
+    launcher = Launcher()
+    _, backend = discovery.launch("chrome", launcher)
+    assert backend is system and pinned.probes == 1
+    _, backend = discovery.launch("chrome", launcher)
+    assert backend is system and pinned.probes == 1 and system.probes == 1
+    assert launcher.calls == ["chrome_system", "chrome_system"]
+    report = discovery.report()["resolved"]["chrome"]
+    assert report["name"] == "chrome_system" and report["skipped"] == ["chrome_pinned: fake"]
+
+
+def test_failed_cached_backend_not_retried():
+    """缓存的后端失败时失效并回退，回退链中不再启动刚失败的后端"""
+    discovery, (_, system, firefox) = make_discovery()
+    launcher = Launcher()
+    discovery.launch("chrome", launcher)
+    launcher.failing.add("chrome_system")
+    _, backend = discovery.launch("chrome", launcher)
+    print(launcher.calls)
+    assert backend is firefox
+    assert launcher.calls == ["chrome_system", "chrome_system", "firefox"]
+    assert system.probes == 1
+    assert discovery.report()["resolved"]["chrome"]["name"] == "firefox"
+
+    launcher.failing.add("firefox")
+    with pytest.raises(RuntimeError, match="firefox crashed"):
+        discovery.launch("chrome", launcher)
+    assert launcher.calls[-2:] == ["firefox", "chrome_system"]
+    assert "chrome" not in discovery.report()["resolved"]
+
+
+if __name__ == "__main__":
+    test_resolved_backend_is_cached()
+    test_failed_cached_backend_not_retried()
+    print("✅ 启动后端缓存测试通过")
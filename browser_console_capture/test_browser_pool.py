@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""浏览器预热池测试"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from browser_pool import BrowserPool
+
+CHROME = ("chrome", True, "1920,1080")
+FIREFOX = ("firefox", True, "1920,1080")
+
+
+class FakeDriver:
+    def __init__(self, profile):
+        self.profile = profile
+        self.healthy = True
+
+    def execute_script(self, script):
+        if not self.healthy:
+            raise Exception("browser gone")
+        return 1
+
+
+class Recorder:
+    """假启动器和关闭函数，记录启动和关闭的驱动"""
+
+    def __init__(self, fail=False):
+        self.launched = []
+        self.disposed = []
+        self.fail = fail
+
+    def launch(self, profile):
+        if self.fail:
+            raise RuntimeError("launch failed")
+        driver = FakeDriver(profile)
+        self.launched.append(driver)
+        return driver
+
+    def dispose(self, driver):
+        self.disposed.append(driver)
+
+
+def make_pool(recorder, **kwargs):
+    kwargs.setdefault("warm_size", 0)
+    return BrowserPool(recorder.launch, disposer=recorder.dispose, **kwargs)
+
+
+def test_released_driver_is_reused():
+    """归还的驱动被同一配置再次租用，不重新启动"""
+    recorder = Recorder()
+    pool = make_pool(recorder)
+    driver, reused = pool.acquire(CHROME)
+    assert not reused and pool.stats()["leased"] == 1
+    assert pool.release(driver)
+    assert pool.stats()["leased"] == 0 and pool.stats()["idle"] == {"chrome,True,1920,1080": 1}
+
+    again, reused = pool.acquire(CHROME)
+    assert again is driver and reused and len(recorder.launched) == 1
+    pool.shutdown()
+
+
+def test_unhealthy_idle_driver_is_discarded():
+    """空闲驱动健康检查失败时关闭它并冷启动新的"""
+    recorder = Recorder()
+    pool = make_pool(recorder)
+    driver, _ = pool.acquire(CHROME)
+    pool.release(driver)
+    driver.healthy = False
+
+    fresh, reused = pool.acquire(CHROME)
+    assert fresh is not driver and not reused
+    assert recorder.disposed == [driver]
+    assert pool.stats()["leased"] == 1 and pool.stats()["idle"] == {"chrome,True,1920,1080": 0}
+    pool.shutdown()
+
+
+def test_cap_evicts_other_profile_or_raises():
+    """达到上限时关闭其他配置的空闲驱动；全部租出时报错"""
+    recorder = Recorder()
+    pool = make_pool(recorder, max_browsers=1)
+    chrome, _ = pool.acquire(CHROME)
+    with pytest.raises(RuntimeError):
+        pool.acquire(FIREFOX)
+    assert pool.stats()["launching"] == 0
+
+    pool.release(chrome)
+    firefox, reused = pool.acquire(FIREFOX)
+    assert firefox.profile == FIREFOX and not reused
+    assert recorder.disposed == [chrome]
+    assert pool.stats()["leased"] == 1
+    pool.shutdown()
+
+
+def test_release_and_refill_accounting():
+    """启动失败、不可复用的归还和后台补足都保持计数正确"""
+    failing = Recorder(fail=True)
+    pool = make_pool(failing)
+    with pytest.raises(RuntimeError):
+        pool.acquire(CHROME)
+    assert pool.stats()["launching"] == 0 and pool.stats()["leased"] == 0
+    pool.shutdown()
+
+    recorder = Recorder()
+    pool = make_pool(recorder, max_browsers=2)
+    driver, _ = pool.acquire(CHROME)
+    assert not pool.release(driver, reusable=False)
+    assert recorder.disposed == [driver] and pool.stats()["leased"] == 0
+    pool.shutdown()
+
+    # 不调用acquire，维护线程不会启动，直接驱动_refill
+    recorder = Recorder()
+    pool = make_pool(recorder, max_browsers=2, warm_size=2)
+    pool._last_used[CHROME] = time.time()
+    pool._refill()
+    stats = pool.stats()
+    print(stats)
+    assert stats["idle"] == {"chrome,True,1920,1080": 2} and stats["launching"] == 0
+    # 已达上限时不再补足
+    pool._refill()
+    assert len(recorder.launched) == 2
+    pool.shutdown()
+    assert len(recorder.disposed) == 2
+
+
+def test_refill_after_shutdown_disposes_driver():
+    """预热启动期间池被关闭时，刚启动的驱动直接关闭而不是放进空闲队列"""
+    recorder = Recorder()
+    pool = make_pool(recorder, warm_size=1)
+    pool._last_used[CHROME] = time.time()
+
+    def launch_then_shutdown(profile):
+        driver = recorder.launch(profile)
+        pool.shutdown()
+        return driver
+
+    pool._launcher = launch_then_shutdown
+    pool._refill()
+    assert recorder.disposed == recorder.launched and len(recorder.launched) == 1
+    assert pool.stats()["idle"] == {} and pool.stats()["launching"] == 0
+
+
+if __name__ == "__main__":
+    test_released_driver_is_reused()
+    test_unhealthy_idle_driver_is_discarded()
+    test_cap_evicts_other_profile_or_raises()
+    test_release_and_refill_accounting()
+    test_refill_after_shutdown_disposes_driver()
+    print("✅ 浏览器池测试通过")
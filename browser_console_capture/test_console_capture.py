@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""控制台日志推送捕获测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from console_buffer import ConsoleRingBuffer
+from console_capture import ConsoleCapture
+
+
+class FakeConnection:
+    """记录订阅和命令的CDP连接替身"""
+
+    def __init__(self):
+        self.handlers = {}
+        self.sent = []
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def send(self, method, params=None):
+        self.sent.append(method)
+        return {}
+
+    def emit(self, event, params):
+        for handler in self.handlers.get(event, []):
+            handler(params)
+
+
+def test_console_events_become_log_entries():
+    """CDP事件转换为与get_log相同格式的条目"""
+    capture = ConsoleCapture()
+    conn = FakeConnection()
+    capture.install(conn, "TAB1")
+    assert capture.streaming
+    assert conn.sent == ["Runtime.enable", "Log.enable"]
+
+    conn.emit("Runtime.consoleAPICalled", {
+        "type": "error",
+        "args": [{"type": "string", "value": "boom"}, {"type": "number", "value": 3}],
+        "timestamp": 1700000000000,
+        "stackTrace": {"callFrames": [{"url": "http://x/a.js", "lineNumber": 9, "columnNumber": 4}]},
+    })
+    conn.emit("Runtime.consoleAPICalled", {"type": "clear", "args": [], "timestamp": 1700000000001})
+    conn.emit("Runtime.exceptionThrown", {
+        "timestamp": 1700000000002,
+        "exceptionDetails": {
+            "text": "Uncaught", "url": "http://x/a.js", "lineNumber": 1, "columnNumber": 2,
+            "exception": {"description": "TypeError: x is undefined\n    at g (http://x/a.js:2:3)"},
+        },
+    })
+    conn.emit("Log.entryAdded", {"entry": {
+        "source": "network", "level": "error", "text": "Failed to load resource",
+        "timestamp": 1700000000003, "url": "http://x/missing.png",
+    }})
+
+    entries = capture.entries()
+    for entry in entries:
+        print(f"{entry.level} {entry.source}: {entry.message!r}")
+    assert [entry.source for entry in entries] == ["console-api", "javascript", "network"]
+    assert entries[0].message == 'http://x/a.js 10:5 "boom" 3'
+    assert entries[0].level == "SEVERE"
+    assert entries[1].message.startswith("http://x/a.js 2:3 Uncaught TypeError: x is undefined")
+    assert entries[2].message == "http://x/missing.png - Failed to load resource"
+    assert all(entry.tab == "TAB1" for entry in entries)
+
+
+def test_entries_by_tab_and_clear():
+    """按标签页读取条目，清空后缓冲区为空"""
+    capture = ConsoleCapture()
+    first, second = FakeConnection(), FakeConnection()
+    capture.install(first, "TAB1")
+    capture.install(second, "TAB2")
+    first.emit("Runtime.consoleAPICalled", {"type": "log", "args": [{"type": "string", "value": "a"}], "timestamp": 2})
+    second.emit("Runtime.consoleAPICalled", {"type": "warning", "args": [{"type": "string", "value": "b"}], "timestamp": 1})
+
+    assert [entry.message for entry in capture.entries()] == ['"a"', '"b"']
+    assert [entry.level for entry in capture.entries("TAB2")] == ["WARNING"]
+    capture.clear()
+    assert len(capture) == 0
+
+
+def test_ring_buffer_keeps_errors_under_info_flood():
+    """普通日志刷屏时只淘汰普通日志，错误保留，序号单调递增"""
+    buffer = ConsoleRingBuffer(capacity=5, low_capacity=3)
+    buffer.append(1, "SEVERE", "javascript", "browser", None, "early error")
+    for i in range(100):
+        buffer.append(2 + i, "INFO", "console-api", "browser", None, f"info {i}")
+    buffer.append(200, "WARNING", "console-api", "browser", None, "late warning")
+
+    entries = list(buffer.entries())
+    print(f"缓冲区统计: {buffer.stats()}")
+    assert [entry.message for entry in entries] == ["early error", "info 97", "info 98", "info 99", "late warning"]
+    assert [entry.seq for entry in entries] == sorted(entry.seq for entry in entries)
+    assert buffer.stats()["dropped"] == 97
+    assert entries[0].to_dict()["level"] == "SEVERE"
+
+
+def test_latest_filters_before_limit():
+    """latest先过滤再从最新条目取limit条，级别计数随淘汰更新"""
+    buffer = ConsoleRingBuffer(capacity=100, low_capacity=10)
+    for i in range(50):
+        level = "SEVERE" if i % 5 == 0 else "INFO"
+        buffer.append(i, level, "console-api", "browser", "TAB1" if i % 2 else "TAB2", f"m{i}")
+
+    errors = buffer.latest(3, lambda entry: entry.level == "SEVERE", important_only=True)
+    assert [entry.message for entry in errors] == ["m35", "m40", "m45"]
+    newest = buffer.latest(4)
+    assert [entry.message for entry in newest] == ["m46", "m47", "m48", "m49"]
+    counts = buffer.level_counts()
+    print(f"级别计数: {counts}")
+    assert counts == {"SEVERE": 10, "INFO": 10}
+    assert buffer.level_counts("TAB1") == {"SEVERE": 5, "INFO": 5}
+
+
+def test_since_cursor_returns_only_new_entries():
+    """游标之后的条目按顺序分页返回，清空后序号继续递增"""
+    buffer = ConsoleRingBuffer(capacity=100)
+    for i in range(5):
+        buffer.append(i, "INFO", "console-api", "browser", None, f"m{i}")
+
+    page, cursor, has_more = buffer.since(0, limit=3)
+    assert [entry.message for entry in page] == ["m0", "m1", "m2"] and has_more
+    page, cursor, has_more = buffer.since(cursor, limit=3)
+    assert [entry.message for entry in page] == ["m3", "m4"] and not has_more
+    assert buffer.since(cursor) == ([], cursor, False)
+
+    buffer.clear()
+    buffer.append(9, "SEVERE", "javascript", "browser", None, "after clear")
+    page, next_cursor, _ = buffer.since(cursor)
+    assert [entry.seq for entry in page] == [cursor + 1] and next_cursor == cursor + 1
+
+
+def test_groups_fold_near_identical_messages():
+    """只有数字不同的消息归为一组，分组在写入时累计，多个标签页的同一消息合并"""
+    buffer = ConsoleRingBuffer(capacity=100, low_capacity=10)
+    for i in range(50):
+        buffer.append(1000 + i, "INFO", "console-api", "browser", "TAB1", f"批量日志消息 #{i}: 测试大量日志处理能力")
+    buffer.append(2000, "SEVERE", "javascript", "browser", "TAB1", "TypeError: x")
+    buffer.append(3000, "SEVERE", "javascript", "browser", "TAB2", "TypeError: x")
+
+    groups = buffer.groups()
+    print([(group.count, group.sample.message) for group in groups])
+    assert [group.count for group in groups] == [50, 2]
+    assert groups[0].sample.message == "批量日志消息 #0: 测试大量日志处理能力"
+    assert (groups[0].first_timestamp, groups[0].last_timestamp) == (1000, 1049)
+    assert (groups[1].first_timestamp, groups[1].last_timestamp) == (2000, 3000)
+    assert [group.count for group in buffer.groups("TAB2")] == [1]
+    assert [group.count for group in buffer.groups(since=51)] == [2]
+
+
+if __name__ == "__main__":
+    test_console_events_become_log_entries()
+    test_entries_by_tab_and_clear()
+    test_ring_buffer_keeps_errors_under_info_flood()
+    test_latest_filters_before_limit()
+    test_since_cursor_returns_only_new_entries()
+    test_groups_fold_near_identical_messages()
+    print("✅ 控制台日志捕获测试通过")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""控制台日志持久化存储测试"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from console_capture import ConsoleCapture
+from console_buffer import ConsoleEntry
+from console_store import ConsoleStore
+
+
+def fill(capture, now):
+    capture._on_frame_navigated("W1", {"frame": {"id": "W1", "url": "https://shop.test/checkout/pay"}})
+    capture._on_frame_navigated("W1", {"frame": {"id": "F2", "parentId": "W1", "url": "https://ads.test/frame"}})
+    for i in range(3):
+        capture.append("SEVERE", f"https://shop.test/app.js 1:{i} Uncaught TypeError: item {i} is undefined",
+                       "javascript", now - i * 1000, tab="W1")
+    capture.append("SEVERE", "Uncaught ReferenceError: x is not defined", "javascript", now, tab="W1")
+    capture.append("INFO", '"loaded"', "console-api", now, tab="W1")
+    capture._on_frame_navigated("W1", {"frameId": "W1", "url": "https://shop.test/cart"})
+    capture.append("SEVERE", "Uncaught TypeError: cart is undefined", "javascript", now, tab="W1")
+    # 两小时前的旧日志
+    capture.append("SEVERE", "Uncaught TypeError: old", "javascript", now - 2 * 3600 * 1000, tab="W1")
+
+
+def test_query_by_path_error_type_and_time():
+    """按页面路径、错误类型和时间范围查询，关闭后重新打开仍可查询"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history", "console.db")
+        store = ConsoleStore(path, flush_interval=0.05)
+        capture = ConsoleCapture(store=store, session_id="chrome_1")
+        now = int(time.time() * 1000)
+        fill(capture, now)
+
+        hour_ago = now - 3600 * 1000
+        rows = store.query(url="/checkout", error_type="TypeError", start_time=hour_ago)
+        print(rows)
+        assert len(rows) == 3
+        assert all(row["page_url"] == "https://shop.test/checkout/pay" and row["session_id"] == "chrome_1" for row in rows)
+        assert [row["seq"] for row in rows] == [1, 2, 3]
+        assert len(store.query(error_type="TypeError")) == 5
+        assert store.query(url="/cart")[0]["message"] == "Uncaught TypeError: cart is undefined"
+        assert store.query(level="info")[0]["message"] == '"loaded"'
+        store.close()
+
+        reopened = ConsoleStore(path)
+        grouped = reopened.query(url="https://shop.test/", level="ERROR", group_by_fingerprint=True)
+        print(grouped)
+        top = grouped[0]
+        assert top["count"] == 3 and top["error_type"] == "TypeError" and top["sessions"] == 1
+        assert top["last_timestamp"] == now and top["first_timestamp"] == now - 2000
+        assert top["message"].endswith("item 0 is undefined")
+        assert reopened.stats()["written"] == 0
+        reopened.close()
+
+
+def test_grouped_columns_come_from_latest_row():
+    """分组结果的消息、页面和会话取自时间最晚的一条，与写入顺序无关"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = ConsoleStore(os.path.join(directory, "console.db"), flush_interval=0.05)
+        now = int(time.time() * 1000)
+        # 写入顺序与时间顺序不同：最晚的一条在中间写入
+        for session_id, offset, page in (("a", 2000, "/first"), ("c", 0, "/latest"), ("b", 1000, "/middle")):
+            entry = ConsoleEntry(offset, now - offset, "SEVERE", "javascript", "javascript", "W1",
+                                 f"Uncaught TypeError: value {offset} is undefined")
+            store.add(session_id, entry, f"https://shop.test{page}")
+        grouped = store.query(group_by_fingerprint=True)
+        print(grouped)
+        assert len(grouped) == 1
+        top = grouped[0]
+        assert (top["session_id"], top["page_url"]) == ("c", "https://shop.test/latest")
+        assert top["message"] == "Uncaught TypeError: value 0 is undefined"
+        assert (top["count"], top["sessions"], top["first_timestamp"]) == (3, 3, now - 2000)
+        store.close()
+
+
+def test_level_filter_uses_stored_normalization():
+    """按DEBUG或SEVERE查询时与写入时一样标准化级别"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = ConsoleStore(os.path.join(directory, "console.db"), flush_interval=0.05)
+        now = int(time.time() * 1000)
+        store.add("chrome_1", ConsoleEntry(1, now, "DEBUG", "console-api", "browser", "W1", "debug line", None))
+        store.add("chrome_1", ConsoleEntry(2, now, "SEVERE", "javascript", "browser", "W1", "boom", None))
+        assert store.flush()
+        assert [row["message"] for row in store.query(level="DEBUG")] == ["debug line"]
+        assert [row["message"] for row in store.query(level="verbose")] == ["debug line"]
+        assert [row["message"] for row in store.query(level="SEVERE")] == ["boom"]
+        store.close()
+
+
+def test_close_does_not_block_on_full_queue():
+    """写入跟不上、队列已满时close不会一直阻塞"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = ConsoleStore(os.path.join(directory, "console.db"), batch_size=1, max_pending=2)
+        release = threading.Event()
+        write = store._write
+        store._write = lambda conn, batch: release.wait(5) and write(conn, batch)
+        entries = [ConsoleEntry(i, i, "INFO", "console-api", "browser", "W1", f"line {i}", None) for i in range(4)]
+        store.add("chrome_1", entries[0])
+        time.sleep(0.05)
+        for entry in entries[1:]:
+            store.add("chrome_1", entry)
+
+        started = time.monotonic()
+        threading.Timer(0.2, release.set).start()
+        store.close(timeout=2)
+        elapsed = time.monotonic() - started
+        print(f"关闭耗时: {elapsed:.3f}s, {store.stats()}")
+        assert elapsed < 1 and not store._writer.is_alive()
+        assert store.dropped == 3 and store.written == 1
+
+
+def test_capture_without_store_keeps_memory_only():
+    """未启用持久化时不记录页面URL，也不订阅Page事件"""
+    capture = ConsoleCapture()
+    capture.append("SEVERE", "boom", "javascript", 1, tab="W1")
+    assert capture.page_urls == {} and len(capture) == 1
+
+
+if __name__ == "__main__":
+    test_query_by_path_error_type_and_time()
+    test_grouped_columns_come_from_latest_row()
+    test_level_filter_uses_stored_normalization()
+    test_close_does_not_block_on_full_queue()
+    test_capture_without_store_keeps_memory_only()
+    print("✅ 控制台日志持久化测试通过")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""元素句柄缓存测试"""
+
+import os
+import sys
+
+import pytest
+from selenium.common.exceptions import (
+    ElementClickInterceptedException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+from selenium.webdriver.common.by import By
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from element_cache import ELEMENT_PROPERTIES_SCRIPT, ElementCache, wait_for, with_element
+
+
+class FakeElement:
+    def __init__(self, page):
+        self.page = page
+        self.document = page.document
+        self.clicks = 0
+
+    def _check(self):
+        if self.document != self.page.document:
+            raise StaleElementReferenceException("stale element reference")
+
+    def is_displayed(self):
+        self._check()
+        return True
+
+    def is_enabled(self):
+        self._check()
+        return self.page.enabled
+
+    def click(self):
+        self._check()
+        if self.page.overlay:
+            self.page.overlay -= 1
+            raise ElementClickInterceptedException("element click intercepted")
+        self.clicks += 1
+
+
+class FakeDriver:
+    """每次导航document加一，旧文档的元素全部失效"""
+
+    def __init__(self):
+        self.document = 0
+        self.finds = 0
+        self.scripts = 0
+        self.enabled = True
+        self.overlay = 0
+
+    def navigate(self):
+        self.document += 1
+
+    def find_element(self, by, selector):
+        self.finds += 1
+        return FakeElement(self)
+
+    def execute_script(self, script, element, text_chars):
+        assert script == ELEMENT_PROPERTIES_SCRIPT
+        self.scripts += 1
+        element._check()
+        return {"tag": "button", "text": "Submit", "visible": True, "enabled": self.enabled}
+
+
+def test_cached_element_reused_until_stale():
+    """同一页面重复点击只查找一次，页面跳转后自动重新查找"""
+    driver, cache = FakeDriver(), ElementCache()
+    for _ in range(3):
+        with_element(driver, cache, By.CSS_SELECTOR, "#submit", "clickable", 1, lambda element: element.click())
+    assert driver.finds == 1 and cache.counters["hits"] == 2
+
+    driver.navigate()
+    with_element(driver, cache, By.CSS_SELECTOR, "#submit", "clickable", 1, lambda element: element.click())
+    assert driver.finds == 2 and cache.counters["stale"] == 1
+
+    cache.invalidate()
+    assert len(cache) == 0 and cache.generation == 1
+    with_element(driver, cache, By.CSS_SELECTOR, "#submit", "clickable", 1, lambda element: element.click())
+    assert driver.finds == 3
+
+
+def test_cached_element_rechecked_before_action():
+    """缓存元素变为禁用时不点击它，而是重新等待；点击被遮挡时重新查找后再点击"""
+    driver, cache = FakeDriver(), ElementCache()
+    clicked = []
+    with_element(driver, cache, By.CSS_SELECTOR, "#submit", "clickable", 1, clicked.append)
+
+    driver.enabled = False
+    with pytest.raises(TimeoutException):
+        with_element(driver, cache, By.CSS_SELECTOR, "#submit", "clickable", 0.2, clicked.append)
+    assert len(clicked) == 1 and driver.finds > 1
+
+    driver.enabled = True
+    driver.overlay = 1
+    finds = driver.finds
+    element = with_element(driver, cache, By.CSS_SELECTOR, "#submit", "clickable", 1,
+                           lambda element: element.click() or element)
+    assert element.clicks == 1 and driver.finds == finds + 1 and driver.overlay == 0
+
+
+def test_wait_for_uses_single_property_script():
+    """缓存命中时wait_for只执行一次属性脚本，不再查找元素"""
+    driver, cache = FakeDriver(), ElementCache()
+    properties = wait_for(driver, cache, By.CSS_SELECTOR, "#submit", "visible", 1)
+    assert properties["tag"] == "button" and driver.finds == 1 and driver.scripts == 1
+    wait_for(driver, cache, By.CSS_SELECTOR, "#submit", "visible", 1)
+    assert driver.finds == 1 and driver.scripts == 2
+
+    driver.navigate()
+    wait_for(driver, cache, By.CSS_SELECTOR, "#submit", "presence", 1)
+    print(f"查找次数: {driver.finds}, 属性脚本次数: {driver.scripts}, 计数: {cache.counters}")
+    assert driver.finds == 2 and driver.scripts == 4 and cache.counters["stale"] == 1
+
+
+if __name__ == "__main__":
+    test_cached_element_reused_until_stale()
+    test_cached_element_rechecked_before_action()
+    test_wait_for_uses_single_property_script()
+    print("✅ 元素缓存测试通过")
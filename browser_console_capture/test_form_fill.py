@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""批量表单填写测试"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from form_fill import FILL_SCRIPT, native_keys_text, split_results
+
+# 最小DOM替身：记录每个元素上的事件，value通过原型上的setter写入
+DOM_HARNESS = """
+var events = [];
+function Element(id, tag, props) { this.id = id; this.tagName = tag.toUpperCase(); Object.assign(this, props); }
+Element.prototype.dispatchEvent = function (event) { events.push(this.id + ':' + event.type); return true; };
+Element.prototype.focus = function () { events.push(this.id + ':focus'); };
+Element.prototype.blur = function () { events.push(this.id + ':blur'); };
+Element.prototype.click = function () {
+  var el = this;
+  if (el.type === 'radio') {
+    Object.keys(elements).forEach(function (key) {
+      if (elements[key].type === 'radio' && elements[key].name === el.name) elements[key].checked = false;
+    });
+    el.checked = true;
+  } else {
+    el.checked = !el.checked;
+  }
+  ['click', 'input', 'change'].forEach(function (type) { events.push(el.id + ':' + type); });
+};
+function HTMLInputElement(id, props) { Element.call(this, id, 'input', props); }
+function HTMLTextAreaElement(id, props) { Element.call(this, id, 'textarea', props); }
+[HTMLInputElement, HTMLTextAreaElement].forEach(function (type) {
+  type.prototype = Object.create(Element.prototype);
+  Object.defineProperty(type.prototype, 'value', {
+    get: function () { return this._value || ''; },
+    set: function (value) { this._value = value; events.push(this.id + ':set'); }
+  });
+});
+function Select(id, multiple, options) {
+  var select = this;
+  Element.call(this, id, 'select', {multiple: multiple, options: options.map(function (option) {
+    var selected = !!option[2];
+    // 单选下拉框选中一项时取消其他选项，与浏览器一致
+    return {value: option[0], text: ' ' + option[1] + ' ',
+            get selected() { return selected; },
+            set selected(value) {
+              if (value && !select.multiple) select.options.forEach(function (other) { other.selected = false; });
+              selected = value;
+            }};
+  })});
+}
+Select.prototype = Object.create(Element.prototype);
+var elements = {
+  '#name': new HTMLInputElement('name', {type: 'text'}),
+  '#bio': new HTMLTextAreaElement('bio', {}),
+  '#agree': new HTMLInputElement('agree', {type: 'checkbox', checked: false}),
+  '#news': new HTMLInputElement('news', {type: 'checkbox', checked: true}),
+  '#plan-pro': new HTMLInputElement('plan-pro', {type: 'radio', name: 'plan', checked: false}),
+  '#plan-free': new HTMLInputElement('plan-free', {type: 'radio', name: 'plan', checked: true}),
+  '#country': new Select('country', false, [['us', 'United States', true], ['de', 'Germany']]),
+  '#tags': new Select('tags', true, [['a', 'Alpha', true], ['b', 'Beta'], ['c', 'Gamma']]),
+  '#bad-tags': new Select('bad-tags', true, [['a', 'Alpha', true], ['b', 'Beta']]),
+  '#locked': new HTMLInputElement('locked', {type: 'text', disabled: true}),
+  '#ro': new HTMLInputElement('ro', {type: 'text', readOnly: true}),
+  '#avatar': new HTMLInputElement('avatar', {type: 'file'}),
+  '#masked': new HTMLInputElement('masked', {type: 'text'})
+};
+global.HTMLInputElement = HTMLInputElement;
+global.HTMLTextAreaElement = HTMLTextAreaElement;
+global.document = {querySelector: function (selector) { return elements[selector] || null; }};
+var fields = JSON.parse(process.argv[2]);
+var results = new Function(process.argv[1])(fields, 'css', ['#masked']);
+var state = {};
+Object.keys(elements).forEach(function (key) {
+  var el = elements[key];
+  state[key] = el.options ? el.options.filter(function (o) { return o.selected; }).map(function (o) { return o.value; })
+                          : (el.type === 'checkbox' || el.type === 'radio') ? el.checked : el.value;
+});
+console.log(JSON.stringify({results: results, events: events, state: state}));
+"""
+
+
+def run_fill_script(fields):
+    output = subprocess.run(["node", "-e", DOM_HARNESS, FILL_SCRIPT, json.dumps(list(fields.items()))],
+                            capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def test_split_results_collects_native_fields():
+    """脚本标记为native的字段交给send_keys，其余保留脚本状态"""
+    fields = {"#name": "Eric", "#avatar": "/tmp/a.png", "#missing": "x", "#agree": True}
+    results = [{"status": "filled"}, {"status": "native"}, {"status": "missing"}, None]
+    report, native = split_results(fields, results)
+    assert native == ["#avatar"]
+    assert [entry["status"] for entry in report] == ["filled", "native", "missing", "error"]
+    assert report[0] == {"selector": "#name", "status": "filled"}
+
+
+def test_native_keys_text():
+    """多个文件路径用换行分隔，None输入为空字符串"""
+    assert native_keys_text(["/tmp/a.png", "/tmp/b.png"]) == "/tmp/a.png\n/tmp/b.png"
+    assert native_keys_text(42) == "42"
+    assert native_keys_text(None) == ""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="需要node运行页面脚本")
+def test_fill_script_sets_values_and_fires_events():
+    """文本框经原生setter赋值并触发input/change；复选框和单选框通过click切换；下拉框按值或显示文本选中"""
+    page = run_fill_script({
+        "#name": "Eric", "#bio": "hi", "#agree": True, "#news": "no", "#plan-pro": True,
+        "#country": "Germany", "#tags": ["b", "Gamma"], "#gone": "x",
+        "#locked": "x", "#ro": "x", "#avatar": "/tmp/a.png", "#masked": "123",
+    })
+    print(page)
+    statuses = [result["status"] for result in page["results"]]
+    assert statuses == ["filled"] * 7 + ["missing", "disabled", "readonly", "native", "native"]
+    state, events = page["state"], page["events"]
+    assert state["#name"] == "Eric" and state["#bio"] == "hi"
+    assert state["#agree"] is True and state["#news"] is False
+    assert state["#plan-pro"] is True and state["#plan-free"] is False
+    assert state["#country"] == ["de"] and state["#tags"] == ["b", "c"]
+    assert events[:4] == ["name:focus", "name:set", "name:input", "name:change"]
+    assert "agree:click" in events and "news:change" in events
+    assert "country:change" in events and "tags:input" in events
+    assert not any(event.split(":")[0] in ("locked", "ro", "avatar", "masked") for event in events)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="需要node运行页面脚本")
+def test_fill_script_unknown_option_leaves_select_untouched():
+    """多选框中有未知选项时不改变任何选中状态，也不触发事件"""
+    page = run_fill_script({"#bad-tags": ["b", "zzz"], "#country": "Atlantis"})
+    assert page["results"] == [{"status": "unknown_option", "options": ["zzz"]},
+                               {"status": "unknown_option", "options": ["Atlantis"]}]
+    assert page["state"]["#bad-tags"] == ["a"] and page["state"]["#country"] == ["us"]
+    assert page["events"] == []
+
+
+if __name__ == "__main__":
+    test_split_results_collects_native_fields()
+    test_native_keys_text()
+    test_fill_script_sets_values_and_fires_events()
+    test_fill_script_unknown_option_leaves_select_untouched()
+    print("✅ 表单填写测试通过")
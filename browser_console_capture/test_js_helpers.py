@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""JavaScript辅助函数注册表测试"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from js_helpers import CALL_SCRIPT, JSHelperError, JSHelperRegistry, definition_script
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+        self.closed = threading.Event()
+        self.identifiers = 0
+
+    def send(self, method, params=None):
+        self.sent.append((method, params))
+        if method == "Page.addScriptToEvaluateOnNewDocument":
+            self.identifiers += 1
+            return {"identifier": str(self.identifiers)}
+        if method == "Runtime.evaluate" and "syntax error" in params["expression"]:
+            return {"exceptionDetails": {"text": "Uncaught", "exception": {"description": "SyntaxError: Unexpected identifier"}}}
+        return {}
+
+
+class FakeDriver:
+    """模拟页面：导航后window.__mcpHelpers丢失"""
+
+    def __init__(self):
+        self.defined = set()
+        self.calls = []
+
+    def navigate(self):
+        self.defined.clear()
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_script(self, script, *args):
+        self.calls.append("define")
+        for name in ("count", "boom"):
+            if f'helpers["{name}"]' in script:
+                self.defined.add(name)
+
+    def execute_async_script(self, script, name, args):
+        assert script == CALL_SCRIPT
+        self.calls.append("call")
+        if name not in self.defined:
+            return {"missing": True}
+        if name == "boom":
+            return {"error": "Error: boom"}
+        return {"value": sum(args)}
+
+
+def test_cdp_install_and_redefine():
+    """定义安装到已有连接和之后的新连接，重新定义时移除旧脚本"""
+    registry = JSHelperRegistry()
+    first = FakeConnection()
+    registry.install(first, "W1")
+    assert registry.define(None, "count", "function (s) { return s.length; }") == 1
+    methods = [method for method, _ in first.sent]
+    assert methods == ["Runtime.evaluate", "Page.addScriptToEvaluateOnNewDocument"]
+
+    registry.define(None, "count", "function (s) { return s.length + 1; }")
+    assert ("Page.removeScriptToEvaluateOnNewDocument", {"identifier": "1"}) in first.sent
+
+    second = FakeConnection()
+    registry.install(second, "W2")
+    assert second.sent[1][1]["source"] == definition_script("count", "function (s) { return s.length + 1; }")
+
+    sent = len(first.sent)
+    with pytest.raises(JSHelperError):
+        registry.define(None, "bad", "syntax error here")
+    with pytest.raises(JSHelperError):
+        registry.define(None, "count", "syntax error here")
+    # 定义失败时不注册新文档脚本，也不移除之前可用的版本
+    assert [method for method, _ in first.sent[sent:]] == ["Runtime.evaluate", "Runtime.evaluate"]
+    assert registry.names() == {"count": len("function (s) { return s.length + 1; }")}
+    with pytest.raises(JSHelperError):
+        registry.define(None, "not-a-name", "function () {}")
+    assert list(registry.names()) == ["count"]
+
+
+def test_failed_define_restores_other_tabs():
+    """第二个标签页定义失败时，第一个标签页恢复为之前的版本"""
+
+    class BrokenConnection(FakeConnection):
+        def send(self, method, params=None):
+            if method == "Runtime.evaluate" and "v2" in params["expression"]:
+                self.sent.append((method, params))
+                return {"exceptionDetails": {"text": "Uncaught ReferenceError"}}
+            return super().send(method, params)
+
+    registry = JSHelperRegistry()
+    first, second = FakeConnection(), BrokenConnection()
+    registry.install(first, "W1")
+    registry.install(second, "W2")
+    registry.define(None, "count", "function () { return 'v1'; }")
+    with pytest.raises(JSHelperError):
+        registry.define(None, "count", "function () { return 'v2'; }")
+    scripts = [params["source"] for method, params in first.sent if method == "Page.addScriptToEvaluateOnNewDocument"]
+    assert scripts[-1] == definition_script("count", "function () { return 'v1'; }")
+    assert registry.names() == {"count": len("function () { return 'v1'; }")}
+
+
+def test_call_reinstalls_after_navigation_without_cdp():
+    """没有CDP时，导航后第一次调用重新发送定义，之后只发送调用脚本"""
+    registry = JSHelperRegistry()
+    driver = FakeDriver()
+    registry.define(driver, "count", "function () { return [].slice.call(arguments).length; }")
+    assert registry.call(driver, "count", [1, 2, 3]) == 6
+    driver.navigate()
+    assert registry.call(driver, "count", [4]) == 4
+    assert registry.call(driver, "count", [5]) == 5
+    assert driver.calls == ["define", "call", "call", "define", "call", "call"]
+    assert registry.counters == {"calls": 3, "reinstalls": 1}
+
+    registry.define(driver, "boom", "function () { throw new Error('boom'); }")
+    with pytest.raises(JSHelperError, match="boom"):
+        registry.call(driver, "boom")
+    with pytest.raises(JSHelperError, match="not defined"):
+        registry.call(driver, "missing")
+
+
+if __name__ == "__main__":
+    test_cdp_install_and_redefine()
+    test_failed_define_restores_other_tabs()
+    test_call_reinstalls_after_navigation_without_cdp()
+    print("✅ JavaScript辅助函数测试通过")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""浏览器启动选项测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from launch_options import (
+    build_chrome_options,
+    build_firefox_options,
+    normalize_overrides,
+    resolve_launch_settings,
+    resource_blocking_installer,
+)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, method, params=None):
+        self.sent.append((method, params))
+        return {}
+
+
+def test_disabled_features_use_real_settings():
+    """关闭CSS不再写入不存在的Chrome内容设置，Firefox不再设置失效的Flash偏好"""
+    overrides = normalize_overrides({"enable_css": False, "enable_plugins": False, "enable_images": False})
+    settings = resolve_launch_settings({}, overrides)
+    prefs = build_chrome_options(settings, True, "800,600", 9222).experimental_options["prefs"]
+    print(prefs)
+    assert prefs == {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.plugins": 2,
+    }
+    preferences = build_firefox_options(settings, True, "800,600").preferences
+    assert preferences["permissions.default.stylesheet"] == 2
+    assert "plugin.state.flash" not in preferences
+
+
+def test_resource_blocking_installed_per_tab():
+    """屏蔽样式表和字体的安装回调在每个标签页连接上生效"""
+    assert resource_blocking_installer(resolve_launch_settings({})) is None
+    install = resource_blocking_installer(resolve_launch_settings({}, normalize_overrides({"enable_fonts": False})))
+    for handle in ("W1", "W2"):
+        conn = FakeConnection()
+        install(conn, handle)
+        assert conn.sent[0] == ("Network.enable", None)
+        assert conn.sent[1][0] == "Network.setBlockedURLs" and "*.woff2" in conn.sent[1][1]["urls"]
+
+
+if __name__ == "__main__":
+    test_disabled_features_use_real_settings()
+    test_resource_blocking_installed_per_tab()
+    print("✅ 启动选项测试通过")
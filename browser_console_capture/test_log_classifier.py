@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""控制台日志分类测试：分类结果与原逐条分类逻辑一致"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_log_classifier import legacy_classify, synthetic_messages
+from log_classifier import classify_message, source_type_of
+
+EDGE_CASES = (
+    "",
+    "cat at foo (http://x/a.js:1:2)",
+    "Format at bar (http://x/b.js:10:20)",
+    "at (http://x/c.js:3:4)",
+    "TypeError:ReferenceError: mixed",
+    "ReferenceTypeError: nested",
+    "MyError: custom",
+    "Warning: deprecated console.warning",
+    "40404 console.assert console.log",
+    "console.error console.warn",
+    "SyntaxError: bad NetworkError: also",
+    "console.debug then Warning:",
+    "xat at y",
+)
+
+
+def test_matches_legacy_on_edge_cases():
+    """重叠标记等边界情况与原逻辑一致"""
+    for message in EDGE_CASES:
+        assert classify_message(message) == legacy_classify(message), message
+
+
+def test_matches_legacy_on_random_messages():
+    """随机拼接标记片段与原逻辑一致"""
+    fragments = ["at ", " at ", "Error:", "TypeError:", "ReferenceError:", "SyntaxError:", "NetworkError:",
+                 "404", "Warning:", "console.error", "console.warn", "console.info", "console.debug",
+                 "console.table", "console.trace", "console.assert", "console.log", "(http://x/a.js:5:6)",
+                 "x", " ", "4", "0", "c", "a", "t", "("]
+    rng = random.Random(12)
+    for _ in range(5000):
+        message = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 8)))
+        assert classify_message(message) == legacy_classify(message), repr(message)
+    for message in set(synthetic_messages(2000)):
+        assert classify_message(message) == legacy_classify(message), message
+
+
+def test_source_type():
+    assert source_type_of("console-api") == "console-api"
+    assert source_type_of("javascript") == "javascript"
+    assert source_type_of("network") == "network"
+    assert source_type_of("violation") == "other"
+
+
+if __name__ == "__main__":
+    test_matches_legacy_on_edge_cases()
+    test_matches_legacy_on_random_messages()
+    test_source_type()
+    print("✅ 日志分类测试通过")
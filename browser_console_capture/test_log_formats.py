@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""控制台日志响应格式测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from log_formats import MIN_MESSAGE_CHARS, compact_logs, fit_to_budget, payload_size
+
+
+def make_log(seq, message, level="INFO", source="console-api"):
+    return {"seq": seq, "level": level, "timestamp": 1700000000000 + seq, "source": source,
+            "error_type": None, "message": message}
+
+
+def test_compact_logs_dictionary_encodes_urls_and_sources():
+    """URL和来源移入表中按下标引用，时间戳为相对偏移"""
+    logs = [
+        make_log(1, 'http://x/app.js 10:5 "hello"'),
+        make_log(2, "http://x/app.js - Failed to load resource", source="network"),
+        make_log(3, "plain message"),
+    ]
+    compact = compact_logs(logs)
+    print(compact)
+    assert compact["urls"] == ["http://x/app.js"]
+    assert compact["sources"] == ["console-api", "network"]
+    columns = compact["columns"]
+    assert columns["url"] == [0, 0, None]
+    assert columns["loc"] == ["10:5", None, None]
+    assert columns["message"] == ['"hello"', "Failed to load resource", "plain message"]
+    assert columns["t"] == [0, 1, 2]
+
+
+def test_budget_truncates_longest_messages_first():
+    """超出预算时先把长消息截断到统一长度，短消息保持不变"""
+    logs = [make_log(i, "short") for i in range(5)] + [make_log(5, "x" * 5000), make_log(6, "y" * 3000)]
+    render = lambda entries: {"logs": entries}
+    response, budget = fit_to_budget(logs, render, 2000)
+    print(budget)
+    assert payload_size(response) <= 2000
+    assert budget["omitted_logs"] == 0 and budget["truncated_messages"] == 2
+    assert [entry["message"] for entry in response["logs"][:5]] == ["short"] * 5
+    assert response["logs"][5]["message"].startswith("x" * budget["message_max_chars"] + "…[+")
+
+
+def test_budget_drops_oldest_when_messages_are_minimal():
+    """消息截断到最短仍然放不下时丢弃最旧的日志"""
+    logs = [make_log(i, "z" * 500) for i in range(100)]
+    response, budget = fit_to_budget(logs, lambda entries: {"logs": entries}, 3000)
+    print(budget)
+    assert payload_size(response) <= 3000
+    assert budget["message_max_chars"] == MIN_MESSAGE_CHARS
+    assert budget["omitted_logs"] > 0
+    assert response["logs"][-1]["seq"] == 99
+    assert fit_to_budget(logs, lambda entries: {"logs": entries}, None)[1] is None
+
+
+if __name__ == "__main__":
+    test_compact_logs_dictionary_encodes_urls_and_sources()
+    test_budget_truncates_longest_messages_first()
+    test_budget_drops_oldest_when_messages_are_minimal()
+    print("✅ 日志响应格式测试通过")
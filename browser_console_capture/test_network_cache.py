@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""网络录制/回放缓存测试"""
+
+import base64
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from network_cache import NetworkCache, NetworkInterceptor, is_blocked_host
+
+
+class FakeConnection:
+    def __init__(self, body=None):
+        self.sent = []
+        self.handlers = {}
+        self.closed = threading.Event()
+        self.body = body or {"body": "hello", "base64Encoded": False}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def send(self, method, params=None):
+        self.sent.append((method, params))
+        if method == "Fetch.getResponseBody":
+            return self.body
+        return {}
+
+    def pause(self, params):
+        for handler in self.handlers["Fetch.requestPaused"]:
+            handler(params)
+
+
+def test_cache_key_and_blocked_hosts():
+    """缓存键区分方法、URL和请求体；屏蔽域名包含子域名"""
+    key = NetworkCache.key("get", "https://a.test/x")
+    assert key == NetworkCache.key("GET", "https://a.test/x")
+    assert key != NetworkCache.key("POST", "https://a.test/x")
+    assert NetworkCache.key("POST", "https://a.test/x", "a=1") != NetworkCache.key("POST", "https://a.test/x", "a=2")
+
+    assert is_blocked_host("https://ads.Tracker.com/p.js", ["tracker.com"])
+    assert is_blocked_host("https://tracker.com/", [".tracker.com"])
+    assert not is_blocked_host("https://nottracker.com/", ["tracker.com"])
+    assert not is_blocked_host("about:blank", ["tracker.com"])
+
+
+def test_record_then_replay_round_trip():
+    """录制的响应在回放时原样返回，不访问网络"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = NetworkCache(cache_dir)
+        interceptor = NetworkInterceptor([], cache)
+        conn = FakeConnection()
+        interceptor.install(conn, "W1")
+        interceptor.set_mode("record")
+        conn.pause({
+            "requestId": "1",
+            "request": {"url": "https://a.test/api", "method": "GET"},
+            "responseStatusCode": 200,
+            "responseHeaders": [{"name": "Content-Type", "value": "text/plain"},
+                                {"name": "Content-Encoding", "value": "gzip"}],
+        })
+        assert conn.sent[-1] == ("Fetch.continueRequest", {"requestId": "1"})
+        assert interceptor.counters["recorded"] == 1
+
+        interceptor.set_mode("replay")
+        conn.pause({"requestId": "2", "request": {"url": "https://a.test/api", "method": "GET"}})
+        method, params = conn.sent[-1]
+        print(params)
+        assert method == "Fetch.fulfillRequest" and params["responseCode"] == 200
+        assert base64.b64decode(params["body"]) == b"hello"
+        assert params["responseHeaders"] == [{"name": "Content-Type", "value": "text/plain"}]
+
+        interceptor.set_mode("replay", strict=True)
+        conn.pause({"requestId": "3", "request": {"url": "https://a.test/other", "method": "GET"}})
+        assert conn.sent[-1][0] == "Fetch.failRequest"
+
+
+def test_unexpected_error_still_continues_request():
+    """缓存写入等非CDP异常时仍然放行请求，页面不会卡住"""
+
+    class BrokenCache(NetworkCache):
+        def save(self, key, entry):
+            raise OSError("disk full")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        interceptor = NetworkInterceptor(["blocked.test"], BrokenCache(cache_dir))
+        conn = FakeConnection()
+        interceptor.install(conn, "W1")
+        interceptor.set_mode("record")
+        conn.pause({"requestId": "1", "request": {"url": "https://a.test/", "method": "GET"},
+                    "responseStatusCode": 200, "responseHeaders": []})
+        assert conn.sent[-1] == ("Fetch.continueRequest", {"requestId": "1"})
+
+        conn.pause({"requestId": "2", "request": {"url": "https://cdn.blocked.test/x.js"}})
+        assert conn.sent[-1] == ("Fetch.failRequest", {"requestId": "2", "errorReason": "BlockedByClient"})
+
+
+if __name__ == "__main__":
+    test_cache_key_and_blocked_hosts()
+    test_record_then_replay_round_trip()
+    test_unexpected_error_still_continues_request()
+    print("✅ 网络缓存测试通过")
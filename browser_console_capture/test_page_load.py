@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""页面加载完成策略测试"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from page_load import (
+    DOM_QUIET_SCRIPT,
+    READY_STATE_SCRIPT,
+    SCRIPT_TIMEOUT_MARGIN,
+    NetworkActivity,
+    wait_dom_quiet,
+    wait_ready_state,
+)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.handlers = {}
+        self.sent = []
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def send(self, method, params=None):
+        self.sent.append(method)
+        return {}
+
+    def emit(self, event, params):
+        for handler in self.handlers.get(event, []):
+            handler(params)
+
+
+def test_network_enabled_on_demand():
+    """Network域只在第一次等待网络空闲时启用一次"""
+    activity = NetworkActivity()
+    conn = FakeConnection()
+    activity.install(conn, "W1")
+    assert conn.sent == []
+    activity.ensure_enabled(conn, "W1")
+    activity.ensure_enabled(conn, "W1")
+    assert conn.sent == ["Network.enable"]
+
+
+def test_wait_idle_waits_for_inflight_requests():
+    """有请求进行中时不空闲，全部结束并保持idle_ms后完成"""
+    activity = NetworkActivity()
+    conn = FakeConnection()
+    activity.install(conn, "W1")
+    activity.ensure_enabled(conn, "W1")
+    conn.emit("Network.requestWillBeSent", {"requestId": "1"})
+    conn.emit("Network.requestWillBeSent", {"requestId": "2"})
+
+    def finish():
+        time.sleep(0.1)
+        conn.emit("Network.loadingFinished", {"requestId": "1"})
+        time.sleep(0.1)
+        conn.emit("Network.loadingFailed", {"requestId": "2"})
+
+    threading.Thread(target=finish).start()
+    started = time.monotonic()
+    activity.wait_idle("W1", 100, timeout=5, started_at=started)
+    elapsed = time.monotonic() - started
+    print(f"等待网络空闲: {elapsed:.3f}s")
+    assert 0.3 <= elapsed < 1 and activity.inflight("W1") == 0
+
+    conn.emit("Network.requestWillBeSent", {"requestId": "3"})
+    with pytest.raises(TimeoutException):
+        activity.wait_idle("W1", 100, timeout=0.2)
+
+
+def test_ready_state_follows_navigation():
+    """旧文档被卸载时在新文档上用剩余时间重新执行，脚本超时只设置一次"""
+
+    class Driver:
+        def __init__(self):
+            self.results = [WebDriverException("javascript error: document unloaded while waiting for result"),
+                            "interactive"]
+            self.calls = []
+            self.script_timeouts = []
+
+        def set_script_timeout(self, timeout):
+            self.script_timeouts.append(timeout)
+
+        def execute_async_script(self, script, *args):
+            self.calls.append((script, args))
+            result = self.results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+    driver = Driver()
+    assert wait_ready_state(driver, "interactive", 5) == "interactive"
+    assert [call[0] for call in driver.calls] == [READY_STATE_SCRIPT] * 2
+    assert [call[1][0] for call in driver.calls] == ["interactive"] * 2
+    assert 4000 < driver.calls[1][1][1] <= driver.calls[0][1][1] <= 5000
+    assert driver.script_timeouts == [5 + SCRIPT_TIMEOUT_MARGIN]
+
+    # 页面内计时到期返回false；其他WebDriver错误直接抛出
+    driver.results = [False]
+    with pytest.raises(TimeoutException):
+        wait_ready_state(driver, "complete", 0.5)
+    driver.results = [WebDriverException("no such window")]
+    with pytest.raises(WebDriverException, match="no such window"):
+        wait_ready_state(driver, "complete", 0.5)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="需要node运行页面脚本")
+def test_ready_state_script_times_out_in_page():
+    """readyState脚本自己按传入的毫秒数结束等待，不依赖WebDriver的脚本超时"""
+    harness = """
+    var listeners = [];
+    global.window = {};
+    global.document = {readyState: 'loading',
+                       addEventListener: function (type, fn) { listeners.push(fn); },
+                       removeEventListener: function () { listeners = []; }};
+    var script = new Function(process.argv[1]);
+    var started = Date.now(), results = [];
+    script('complete', 100, function (result) { results.push([result, Date.now() - started]); });
+    setTimeout(function () {
+      document.readyState = 'interactive';
+      listeners.slice().forEach(function (fn) { fn(); });
+      script('interactive', 1000, function (result) { results.push([result, 0]); });
+      console.log(JSON.stringify(results));
+    }, 200);
+    """
+    output = subprocess.run(["node", "-e", harness, READY_STATE_SCRIPT], capture_output=True, text=True, check=True)
+    (timed_out, elapsed), (reached, _) = json.loads(output.stdout)
+    print(f"页面内超时: {elapsed}ms")
+    assert timed_out is False and 90 <= elapsed < 200
+    assert reached == "interactive"
+
+
+def test_dom_quiet_reports_cap():
+    """DOM静止脚本按上限换算为毫秒传入，页面报告仍在变化时抛出超时"""
+
+    class Driver:
+        def __init__(self, result):
+            self.result = result
+            self.args = None
+
+        def set_script_timeout(self, timeout):
+            pass
+
+        def execute_async_script(self, script, *args):
+            assert script == DOM_QUIET_SCRIPT
+            self.args = args
+            return self.result
+
+    quiet = Driver(True)
+    wait_dom_quiet(quiet, 150, 1.5)
+    assert quiet.args[0] == 150 and 1400 < quiet.args[1] <= 1500
+    with pytest.raises(TimeoutException):
+        wait_dom_quiet(Driver(False), 150, 0.5)
+
+
+if __name__ == "__main__":
+    test_network_enabled_on_demand()
+    test_wait_idle_waits_for_inflight_requests()
+    test_ready_state_follows_navigation()
+    test_ready_state_script_times_out_in_page()
+    test_dom_quiet_reports_cap()
+    print("✅ 页面加载策略测试通过")
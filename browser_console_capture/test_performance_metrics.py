@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""页面性能指标汇总测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from performance_metrics import COLLECT_SCRIPT, OBSERVER_SCRIPT, collect, interaction_to_next_paint, summarize
+
+RAW = {
+    "url": "https://shop.test/",
+    "observed": ["navigation", "paint", "resource", "longtask", "largest-contentful-paint", "layout-shift", "event"],
+    "navigation": {
+        "type": "navigate", "redirectCount": 0, "startTime": 0, "redirectStart": 0, "redirectEnd": 0,
+        "domainLookupStart": 5, "domainLookupEnd": 25, "connectStart": 25, "connectEnd": 80,
+        "secureConnectionStart": 40, "responseStart": 150, "responseEnd": 210, "domInteractive": 400,
+        "domContentLoadedEventEnd": 450, "loadEventEnd": 900, "transferSize": 12000, "nextHopProtocol": "h2",
+    },
+    "paint": {"first-paint": 300.25, "first-contentful-paint": 320.5},
+    "lcp": {"time": 1200.04, "size": 5000, "url": "https://shop.test/hero.jpg", "element": "img#hero"},
+    "cls": 0.123456,
+    "layoutShifts": 3,
+    "longTasks": [{"start": 100, "duration": 200}, {"start": 500, "duration": 120}, {"start": 700, "duration": 40}],
+    "interactions": {"1": {"name": "click", "start": 1000, "duration": 64}, "2": {"name": "keydown", "start": 1100, "duration": 180}},
+    "interactionCount": 2,
+    "resources": [
+        {"name": "https://shop.test/app.js", "type": "script", "start": 200, "duration": 300, "transferSize": 50000},
+        {"name": "https://shop.test/app.css", "type": "link", "start": 200, "duration": 80, "transferSize": 8000},
+        {"name": "https://shop.test/hero.jpg", "type": "img", "start": 420, "duration": 500, "transferSize": 90000},
+    ],
+    "resourcesDropped": 0,
+}
+
+
+def test_summarize_phases_and_vitals():
+    """导航阶段、核心指标、长任务阻塞时间和资源统计"""
+    metrics = summarize(RAW, include_resources=True, resource_limit=2)
+    print(metrics)
+    navigation = metrics["navigation"]
+    assert navigation["dns_ms"] == 20 and navigation["connect_ms"] == 55 and navigation["tls_ms"] == 40
+    assert navigation["ttfb_ms"] == 150 and navigation["load_ms"] == 900 and navigation["redirect_ms"] is None
+    vitals = metrics["vitals"]
+    assert vitals["first_contentful_paint_ms"] == 320.5 and vitals["largest_contentful_paint_ms"] == 1200.0
+    assert vitals["cumulative_layout_shift"] == 0.1235 and vitals["interaction_to_next_paint_ms"] == 180
+    # 只统计FCP之后的长任务超过50ms的部分
+    assert vitals["total_blocking_time_ms"] == 70
+    assert metrics["long_tasks"] == {"count": 3, "total_ms": 360, "max_ms": 200}
+    assert metrics["resources"]["transfer_bytes"] == 148000
+    assert metrics["resources"]["by_type"]["img"] == {"count": 1, "transfer_bytes": 90000}
+    assert [entry["type"] for entry in metrics["resources"]["entries"]] == ["img", "script"]
+
+
+def test_inp_ignores_one_outlier_per_fifty_interactions():
+    assert interaction_to_next_paint([]) is None
+    assert interaction_to_next_paint([10, 30, 20]) == 30
+    assert interaction_to_next_paint([1000] + [40] * 59 + [300]) == 300
+
+
+def test_collect_injects_observer_when_missing():
+    """页面中没有观察器时现场注入后再读取"""
+
+    class Driver:
+        def __init__(self):
+            self.scripts = []
+            self.installed = False
+
+        def execute_script(self, script, *args):
+            self.scripts.append(script)
+            if script == OBSERVER_SCRIPT:
+                self.installed = True
+                return None
+            return dict(RAW) if self.installed else None
+
+    driver = Driver()
+    assert collect(driver)["late_injection"] is True
+    assert driver.scripts == [COLLECT_SCRIPT, OBSERVER_SCRIPT, COLLECT_SCRIPT]
+    assert collect(driver)["late_injection"] is False and len(driver.scripts) == 4
+
+
+if __name__ == "__main__":
+    test_summarize_phases_and_vitals()
+    test_inp_ignores_one_outlier_per_fifty_interactions()
+    test_collect_injects_observer_when_missing()
+    print("✅ 性能指标测试通过")
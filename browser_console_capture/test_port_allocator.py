@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Chrome远程调试端口分配器测试"""
+
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from port_allocator import PortAllocator
+
+
+def test_allocate_unique_ports():
+    """同时存活的会话分配到不同端口"""
+    allocator = PortAllocator(19222, 19231)
+    ports = [allocator.allocate() for _ in range(3)]
+    print(f"分配的端口: {ports}")
+    assert len(set(ports)) == 3
+    assert allocator.in_use() == set(ports)
+
+
+def test_release_and_reuse():
+    """释放后的端口可以再次分配"""
+    allocator = PortAllocator(19240, 19241)
+    first = allocator.allocate()
+    second = allocator.allocate()
+    try:
+        allocator.allocate()
+        assert False, "端口耗尽时应抛出异常"
+    except RuntimeError as e:
+        print(f"端口耗尽: {e}")
+    allocator.release(first)
+    assert allocator.allocate() == first
+    assert second != first
+
+
+def test_skip_busy_port():
+    """跳过被其他进程占用的端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen(1)
+        busy_port = busy.getsockname()[1]
+        allocator = PortAllocator(busy_port, busy_port + 1)
+        port = allocator.allocate()
+        print(f"占用端口: {busy_port}，分配端口: {port}")
+        assert port == busy_port + 1
+
+
+if __name__ == "__main__":
+    test_allocate_unique_ports()
+    test_release_and_reuse()
+    test_skip_busy_port()
+    print("✅ 端口分配器测试通过")
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""MCP工具层测试：会话解析、执行通道和批量步骤（使用驱动替身，不启动浏览器）"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# server在导入时按config.json创建日志文件，放到临时目录中
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp())
+try:
+    import server
+finally:
+    os.chdir(_cwd)
+
+
+class StubSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        if handle not in self.driver.window_handles:
+            raise Exception(f"no such window: {handle}")
+        self.driver.current_window_handle = handle
+
+    def new_window(self, kind="tab"):
+        handle = f"W{len(self.driver.window_handles) + 1}"
+        self.driver.window_handles.append(handle)
+        self.driver.current_window_handle = handle
+
+
+class StubDriver:
+    """只实现工具用到的WebDriver接口"""
+
+    def __init__(self):
+        self.current_url = "about:blank"
+        self.title = "Stub"
+        self.window_handles = ["W1"]
+        self.current_window_handle = "W1"
+        self.capabilities = {"browserName": "chrome"}
+        self.switch_to = StubSwitch(self)
+        self.scripts = []
+
+    def get(self, url):
+        self.current_url = url
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+        return None
+
+    def get_window_size(self):
+        return {"width": 800, "height": 600}
+
+    def get_log(self, log_type):
+        return []
+
+    def find_element(self, by, selector):
+        raise NoSuchElementException(f"no such element: {selector}")
+
+
+def add_session(session_id, streaming=False):
+    driver = StubDriver()
+    console = server.ConsoleCapture()
+    console.streaming = streaming
+    server.state["drivers"][session_id] = driver
+    server.state["sessions"][session_id] = {
+        "profile": ("chrome", True, "800,600", ()),
+        "debug_port": None,
+        "lock": threading.RLock(),
+        "cdp": None,
+        "network": None,
+        "activity": None,
+        "helpers": server.JSHelperRegistry(),
+        "elements": server.ElementCache(),
+        "console": console,
+    }
+    server.state["current_session"] = session_id
+    return driver
+
+
+def remove_sessions():
+    server.state["drivers"].clear()
+    server.state["sessions"].clear()
+    server.state["current_session"] = None
+
+
+def test_resolve_session_errors_and_fallback():
+    """未知会话和没有会话时报错；未指定会话时使用当前会话，当前会话失效时取第一个"""
+    remove_sessions()
+    with pytest.raises(Exception, match="No browser session active"):
+        server.resolve_session()
+    first = add_session("s1")
+    second = add_session("s2")
+    try:
+        with pytest.raises(Exception, match="Browser session not found: missing"):
+            server.resolve_session("missing")
+        assert server.resolve_session() == ("s2", second)
+        assert server.resolve_session("s1") == ("s1", first)
+        server.state["current_session"] = "closed"
+        assert server.resolve_session() == ("s1", first)
+        assert server.state["current_session"] == "s1"
+    finally:
+        remove_sessions()
+
+
+def test_session_scope_switches_tab_and_detects_closed_session():
+    """指定tab时临时切换并在结束后切回；等待锁期间会话被关闭时报错"""
+    driver = add_session("s1")
+    driver.window_handles.append("W2")
+    try:
+        with server.session_scope("s1", tab="1") as (session_id, scoped):
+            assert session_id == "s1" and scoped.current_window_handle == "W2"
+        assert driver.current_window_handle == "W1"
+        with pytest.raises(Exception, match="Tab not found"):
+            with server.session_scope("s1", tab="5"):
+                pass
+
+        lock = server.state["sessions"]["s1"]["lock"]
+        entered = threading.Event()
+        errors = []
+
+        def waiter():
+            entered.set()
+            try:
+                with server.session_scope("s1"):
+                    pass
+            except Exception as e:
+                errors.append(str(e))
+
+        with lock:
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            entered.wait(1)
+            time.sleep(0.05)
+            # 持锁期间会话被关闭并由新驱动替换
+            server.state["drivers"]["s1"] = StubDriver()
+        thread.join(2)
+        assert errors == ["Browser session closed: s1"]
+    finally:
+        remove_sessions()
+
+
+def test_tab_tools_with_stub_driver():
+    """打开、切换和关闭标签页；不能关闭最后一个标签页；切换后元素缓存失效"""
+    driver = add_session("s1")
+    open_tab = server._implementation(server.open_tab)
+    switch_tab = server._implementation(server.switch_tab)
+    close_tab = server._implementation(server.close_tab)
+    elements = server.state["sessions"]["s1"]["elements"]
+    try:
+        opened = open_tab(url="https://a.test/", switch=False, session_id="s1")
+        assert opened["success"] and opened["handle"] == "W2" and opened["index"] == 1
+        assert driver.current_window_handle == "W1"
+
+        assert switch_tab("1", session_id="s1").startswith("Switched to tab W2")
+        assert driver.current_window_handle == "W2" and elements.generation == 1
+        assert switch_tab("W9", session_id="s1") == "Error switching tab: Tab not found: W9"
+
+        assert close_tab(session_id="s1").startswith("Closed tab W2. Active tab: W1")
+        assert driver.window_handles == ["W1"] and elements.generation == 2
+        assert close_tab(session_id="s1").startswith("Error closing tab: cannot close the last tab")
+    finally:
+        remove_sessions()
+
+
+def test_run_steps_result_shape_and_stop_on_error():
+    """未知动作失败；stop_on_error决定是否继续；每一步报告序号、动作、结果和耗时"""
+    add_session("s1")
+    run_steps = server._implementation(server.run_steps)
+    steps = [
+        {"action": "get_page_info"},
+        {"action": "no_such_tool"},
+        {"action": "get_page_info", "include_html": False},
+    ]
+    try:
+        stopped = run_steps(steps, session_id="s1")
+        assert not stopped["success"] and stopped["failed_step"] == 1
+        assert (stopped["completed"], stopped["skipped"]) == (1, 1)
+        first, failed = stopped["steps"]
+        assert set(first) == {"index", "action", "ok", "duration_ms", "result"}
+        assert first["ok"] and first["result"].startswith("URL: about:blank")
+        assert not failed["ok"] and failed["result"].startswith("Unsupported action: no_such_tool")
+
+        continued = run_steps(steps, stop_on_error=False, session_id="s1")
+        assert [step["ok"] for step in continued["steps"]] == [True, False, True]
+        assert continued["failed_step"] == 1 and continued["skipped"] == 0 and not continued["success"]
+
+        invalid = run_steps([{"action": "get_page_info", "bogus": 1}, {"action": "get_page_info", "session_id": "s2"}],
+                            stop_on_error=False, session_id="s1")
+        assert invalid["steps"][0]["result"].startswith("Error: invalid parameters for get_page_info")
+        assert invalid["steps"][1]["result"].startswith("Error: steps run in the session given to run_steps")
+
+        ok = run_steps([{"action": "get_page_info"}], session_id="s1")
+        assert ok["success"] and ok["failed_step"] is None and ok["session_id"] == "s1"
+        assert run_steps([], session_id="missing") == {
+            "success": False, "error": "Browser session not found: missing", "steps": []}
+    finally:
+        remove_sessions()
+
+
+def test_run_steps_schema_requires_only_steps():
+    """run_steps的参数全部显式声明，客户端不需要传kwargs"""
+    schema = next(tool.inputSchema for tool in asyncio.run(server.mcp.list_tools()) if tool.name == "run_steps")
+    assert schema["required"] == ["steps"] and "kwargs" not in schema["properties"]
+
+
+def test_run_steps_stops_at_wait_timeout():
+    """等待元素超时算作失败：stop_on_error停止执行并报告failed_step"""
+    add_session("s1")
+    run_steps = server._implementation(server.run_steps)
+    try:
+        result = run_steps([
+            {"action": "wait_for_element", "selector": "#never", "timeout": 0},
+            {"action": "get_page_info"},
+        ], session_id="s1")
+        assert result["steps"][0]["result"] == "Element wait timeout: #never"
+        assert not result["steps"][0]["ok"] and result["failed_step"] == 0
+        assert not result["success"] and result["skipped"] == 1 and len(result["steps"]) == 1
+    finally:
+        remove_sessions()
+
+
+def test_start_browser_releases_driver_on_error(monkeypatch):
+    """会话建立失败时把已租出的驱动交还给池关闭"""
+
+    class FakePool:
+        def __init__(self):
+            self.released = []
+
+        def acquire(self, profile):
+            return StubDriver(), False
+
+        def release(self, driver, reusable=True):
+            self.released.append((driver, reusable))
+            return False
+
+    def broken_attach(session, driver):
+        raise RuntimeError("cdp setup failed")
+
+    pool = FakePool()
+    monkeypatch.setattr(server, "browser_pool", pool)
+    monkeypatch.setattr(server, "_attach_cdp", broken_attach)
+    remove_sessions()
+    result = server._implementation(server.start_browser)(current_user={})
+    assert result == "Error starting browser: cdp setup failed"
+    assert len(pool.released) == 1 and pool.released[0][1] is False
+    assert server.state["sessions"] == {} and server.state["drivers"] == {}
+
+
+def test_buffered_console_read_skips_session_lane():
+    """推送模式下读取日志不排在同一会话的长时间调用之后"""
+    add_session("s1", streaming=True)
+    try:
+        assert server._console_read_is_buffered({"session_id": "s1"})
+        assert not server._console_read_is_buffered({"session_id": "s1", "tab": "0"})
+        assert not server._console_read_is_buffered({"session_id": "s1", "include_performance": True})
+        assert not server._console_read_is_buffered({"session_id": "missing"})
+
+        release = threading.Event()
+
+        def slow_navigation(session_id=None):
+            with server.session_scope(session_id):
+                release.wait(5)
+            return "navigated"
+
+        slow = server.offload()(slow_navigation)
+        logs = server.get_console_logs
+
+        async def scenario():
+            navigation = asyncio.ensure_future(slow(session_id="s1"))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            result = await asyncio.wait_for(logs(session_id="s1"), 2)
+            elapsed = time.monotonic() - started
+            release.set()
+            return result, elapsed, await navigation
+
+        result, elapsed, navigated = asyncio.run(scenario())
+        print(f"页面加载进行中读取日志: {elapsed:.3f}s")
+        assert result["success"] and elapsed < 1 and navigated == "navigated"
+    finally:
+        remove_sessions()
+
+
+if __name__ == "__main__":
+    test_resolve_session_errors_and_fallback()
+    test_session_scope_switches_tab_and_detects_closed_session()
+    test_tab_tools_with_stub_driver()
+    test_run_steps_result_shape_and_stop_on_error()
+    test_run_steps_schema_requires_only_steps()
+    test_run_steps_stops_at_wait_timeout()
+    test_buffered_console_read_skips_session_lane()
+    print("✅ 工具层测试通过")
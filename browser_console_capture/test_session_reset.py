@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""浏览器会话重置测试"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from session_reset import reset_browser_state
+
+
+class Switch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class CdpDriver:
+    """两个标签页：第一个经重定向到达并嵌入跨源iframe，第二个通过链接点击打开"""
+
+    TABS = {
+        "W1": {
+            "history": [{"url": "https://shop.test/cart", "userTypedURL": "https://short.link/abc"}],
+            "frames": {"frame": {"url": "https://shop.test/cart", "securityOrigin": "https://shop.test"},
+                       "childFrames": [{"frame": {"url": "https://pay.example/widget",
+                                                  "securityOrigin": "https://pay.example"}}]},
+        },
+        "W2": {
+            "history": [{"url": "https://docs.test/help"}, {"url": "about:blank"}],
+            "frames": {"frame": {"url": "https://docs.test/help", "securityOrigin": "https://docs.test"}},
+        },
+    }
+
+    def __init__(self):
+        self.window_handles = ["W1", "W2"]
+        self.current_window_handle = "W2"
+        self.switch_to = Switch(self)
+        self.commands = []
+        self.scripts = []
+        self.visited = []
+
+    @property
+    def current_url(self):
+        return self.TABS[self.current_window_handle]["history"][0]["url"]
+
+    def execute_cdp_cmd(self, method, params):
+        self.commands.append((method, params))
+        tab = self.TABS[self.current_window_handle]
+        if method == "Page.getNavigationHistory":
+            return {"currentIndex": 0, "entries": tab["history"]}
+        if method == "Page.getFrameTree":
+            return {"frameTree": tab["frames"]}
+        return {}
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def execute_script(self, script, *args):
+        self.scripts.append(script)
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def get_log(self, log_type):
+        return []
+
+
+def test_clears_every_origin_in_history_and_frames():
+    """未经工具导航的源（重定向、链接、iframe）同样被清除"""
+    driver = CdpDriver()
+    result = reset_browser_state(driver, origins=["https://login.test"])
+    print(result)
+    cleared = sorted(params["origin"] for method, params in driver.commands if method == "Storage.clearDataForOrigin")
+    expected = ["https://docs.test", "https://login.test", "https://pay.example", "https://shop.test", "https://short.link"]
+    assert cleared == expected and result["cleared_origins"] == expected
+    assert result["kind"] == "cdp" and result["closed_tabs"] == ["W2"]
+    assert driver.window_handles == ["W1"] and driver.current_window_handle == "W1"
+    assert ("Network.clearBrowserCookies", {}) in driver.commands
+    assert driver.visited == ["about:blank"]
+
+
+if __name__ == "__main__":
+    test_clears_every_origin_in_history_and_frames()
+    print("✅ 会话重置测试通过")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""调用栈解析与Source Map缓存测试"""
+
+import base64
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from console_buffer import ConsoleEntry
+from source_maps import SourceMap, SourceMapResolver, decode_vlq
+from stack_frames import entry_frames, parse_stack, resolve_frames
+
+SOURCE_MAP = {
+    "version": 3,
+    "sources": ["src/app.ts"],
+    "names": ["handleClick"],
+    # 第0行: 列0 -> app.ts 0:0，列4 -> app.ts 0:4 (handleClick)；第1行: 列0 -> app.ts 1:4
+    "mappings": "AAAA,IAAIA;AACA",
+}
+
+
+class FakeServer:
+    """按URL返回脚本和Source Map，并记录请求次数"""
+
+    def __init__(self):
+        self.requests = []
+        self.files = {
+            "http://x/static/app.min.js": ("var a=1;\n//# sourceMappingURL=app.min.js.map\n", {}),
+            "http://x/static/app.min.js.map": (json.dumps(SOURCE_MAP), {}),
+            "http://x/static/plain.js": ("var b=2;\n", {}),
+        }
+
+    def fetch(self, url, timeout):
+        self.requests.append(url)
+        return self.files[url]
+
+
+def test_decode_vlq_and_lookup():
+    """VLQ解码，源码行列跨生成行相对累计"""
+    assert decode_vlq("IAAIA") == [4, 0, 0, 4, 0]
+    assert decode_vlq("D") == [-1]
+    assert decode_vlq("gB") == [16]
+    source_map = SourceMap(SOURCE_MAP, "http://x/static/app.min.js.map")
+    assert source_map.lookup(0, 6) == {"source": "http://x/static/src/app.ts", "line": 1, "column": 5, "name": "handleClick"}
+    assert source_map.lookup(1, 0)["line"] == 2 and source_map.lookup(1, 0)["column"] == 5
+    assert source_map.lookup(5, 0) is None
+
+
+def test_parse_stack_formats():
+    """解析V8与Firefox格式的调用栈，CDP调用栈直接转换"""
+    v8 = ("http://x/app.js 3:9 Uncaught TypeError: boom\n"
+          "    at handle (http://x/static/app.min.js:1:7)\n"
+          "    at async http://x/static/app.min.js:2:1\n"
+          "    at <anonymous>")
+    frames = parse_stack(v8)
+    print(frames)
+    assert [(f["function"], f["line"], f["column"]) for f in frames] == [("handle", 1, 7), ("", 2, 1)]
+    gecko = "handle@http://x/static/app.min.js:1:7\n@http://x/static/app.min.js:2:1"
+    assert [f["function"] for f in parse_stack(gecko)] == ["handle", ""]
+    assert parse_stack("plain message") == []
+
+    entry = ConsoleEntry(1, 0, "SEVERE", "javascript", "browser", None, "boom",
+                         (("handle", "http://x/static/app.min.js", 0, 6),))
+    assert entry_frames(entry) == [{"function": "handle", "url": "http://x/static/app.min.js", "line": 1, "column": 7}]
+
+
+def test_resolver_fetches_each_map_once():
+    """同一脚本的Source Map只下载一次，新的解析器实例从磁盘缓存读取"""
+    server = FakeServer()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        resolver = SourceMapResolver(cache_dir, fetch=server.fetch)
+        frames = [{"function": "a", "url": "http://x/static/app.min.js", "line": 1, "column": 7},
+                  {"function": "b", "url": "http://x/static/plain.js", "line": 1, "column": 1}]
+        for _ in range(3):
+            resolve_frames([dict(frame) for frame in frames], resolver)
+        resolved = resolve_frames(frames, resolver)
+        print(resolved, server.requests)
+        assert resolved[0]["original"]["name"] == "handleClick"
+        assert resolved[1]["original"] is None
+        assert server.requests == ["http://x/static/app.min.js", "http://x/static/app.min.js.map", "http://x/static/plain.js"]
+
+        fresh = SourceMapResolver(cache_dir, fetch=server.fetch)
+        assert fresh.resolve("http://x/static/app.min.js", 1, 0)["line"] == 2
+        assert fresh.counters["disk_hits"] == 1 and len(server.requests) == 3
+
+
+def test_disk_cache_is_size_bounded():
+    """磁盘缓存超出上限时删除最久未使用的Source Map"""
+    server = FakeServer()
+    inline = base64.b64encode(json.dumps(SOURCE_MAP).encode()).decode()
+    for index in range(5):
+        server.files[f"http://x/{index}.js"] = (f"//# sourceMappingURL=data:application/json;base64,{inline}", {})
+    with tempfile.TemporaryDirectory() as cache_dir:
+        resolver = SourceMapResolver(cache_dir, max_bytes=600, fetch=server.fetch)
+        for index in range(5):
+            assert resolver.resolve(f"http://x/{index}.js", 0, 0) is not None
+        stats = resolver.stats()
+        print(stats)
+        assert stats["disk_bytes"] <= 600 and 0 < stats["disk_files"] < 5
+
+
+def test_large_inline_map():
+    """内联Source Map超过几KB时仍能从注释开头找到"""
+    large = dict(SOURCE_MAP, sourcesContent=["x" * 20000])
+    inline = base64.b64encode(json.dumps(large).encode()).decode()
+    assert len(inline) > 20000
+    server = FakeServer()
+    server.files["http://x/big.js"] = (f"var c=3;\n//# sourceMappingURL=data:application/json;base64,{inline}\n", {})
+    with tempfile.TemporaryDirectory() as cache_dir:
+        resolver = SourceMapResolver(cache_dir, fetch=server.fetch)
+        assert resolver.resolve("http://x/big.js", 0, 4)["name"] == "handleClick"
+
+
+def test_slow_download_does_not_block_other_scripts():
+    """一个脚本的Source Map下载很慢时，其他脚本的解析不被阻塞"""
+    server = FakeServer()
+    release = threading.Event()
+
+    def fetch(url, timeout):
+        if url.startswith("http://slow/"):
+            release.wait(5)
+        return server.fetch(url.replace("http://slow/", "http://x/static/"), timeout)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        resolver = SourceMapResolver(cache_dir, fetch=fetch)
+        slow = threading.Thread(target=resolver.get, args=("http://slow/app.min.js",))
+        slow.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        assert resolver.resolve("http://x/static/app.min.js", 0, 4)["name"] == "handleClick"
+        elapsed = time.monotonic() - started
+        release.set()
+        slow.join()
+        print(f"慢下载进行中解析其他脚本: {elapsed:.3f}s")
+        assert elapsed < 1
+
+
+def test_transient_failures_are_retried():
+    """网络错误和5xx不缓存，下次解析时重新下载；404和解析失败按没有Source Map缓存"""
+    server = FakeServer()
+    server.files["http://x/static/broken.js"] = ("//# sourceMappingURL=broken.js.map", {})
+    server.files["http://x/static/broken.js.map"] = ("{not json", {})
+    failures = {"http://x/static/app.min.js.map": requests.ConnectionError("connection reset")}
+
+    def fetch(url, timeout):
+        if url in failures:
+            server.requests.append(url)
+            raise failures.pop(url)
+        if url == "http://x/static/gone.js":
+            server.requests.append(url)
+            response = requests.Response()
+            response.status_code = 404
+            raise requests.HTTPError("404 Not Found", response=response)
+        return server.fetch(url, timeout)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        resolver = SourceMapResolver(cache_dir, fetch=fetch)
+        assert resolver.resolve("http://x/static/app.min.js", 0, 4) is None
+        assert resolver.resolve("http://x/static/app.min.js", 0, 4)["name"] == "handleClick"
+        assert server.requests.count("http://x/static/app.min.js.map") == 2
+
+        for url in ("http://x/static/gone.js", "http://x/static/broken.js"):
+            assert resolver.get(url) is None and resolver.get(url) is None
+            assert server.requests.count(url) == 1
+        assert resolver.counters["failures"] == 3
+
+
+def test_blocked_domains_are_not_fetched():
+    """脚本或Source Map地址属于屏蔽域名时不发起请求"""
+    server = FakeServer()
+    server.files["http://x/static/tracked.js"] = ("//# sourceMappingURL=https://cdn.tracker.test/t.map", {})
+    with tempfile.TemporaryDirectory() as cache_dir:
+        resolver = SourceMapResolver(cache_dir, fetch=server.fetch, blocked_domains=["tracker.test"])
+        assert resolver.resolve("https://ads.tracker.test/a.js", 0, 0) is None
+        assert resolver.resolve("http://x/static/tracked.js", 0, 0) is None
+        assert server.requests == ["http://x/static/tracked.js"] and resolver.counters["blocked"] == 2
+
+
+if __name__ == "__main__":
+    test_decode_vlq_and_lookup()
+    test_parse_stack_formats()
+    test_resolver_fetches_each_map_once()
+    test_disk_cache_is_size_bounded()
+    test_large_inline_map()
+    test_slow_download_does_not_block_other_scripts()
+    test_transient_failures_are_retried()
+    test_blocked_domains_are_not_fetched()
+    print("✅ 调用栈与Source Map测试通过")